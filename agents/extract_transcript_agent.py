@@ -1,61 +1,46 @@
-import os
-from typing import Dict, Any, List
-from langchain_openai import AzureChatOpenAI
-from langchain.agents import create_openai_functions_agent, AgentExecutor
-from langchain import hub
-from tools.youtube_trancript import create_youtube_transcript_tool
-from dotenv import load_dotenv
-import re
+import asyncio
+from typing import Dict, Any
+from tools.youtube_trancript import create_youtube_transcript_tool, youtube_transcript_function
+from tools.run_progress import mark_completed
+from tools.config import load_config
+from tools.llm import get_chat_model, get_agent_prompt
+from tools.async_utils import run_sync
 import json
 
 
-load_dotenv(override=True)
+load_config()
 
 
 
 def extract_transcripts_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    """Node function that extracts transcripts from video URLs."""
-    llm = AzureChatOpenAI(
-        azure_endpoint=os.getenv("AZURE_API_BASE"),
-        api_key=os.getenv("AZURE_API_KEY"),
-        api_version=os.getenv("AZURE_API_VERSION"),
-        azure_deployment=os.getenv("LLM_DEPLOYMENT_NAME")     
-    )
+    """Synchronous version of extract_transcripts_node_async."""
+    return run_sync(extract_transcripts_node_async(state))
 
-    tools = [create_youtube_transcript_tool()]
-    prompt = hub.pull("hwchase17/openai-functions-agent")
-    agent = create_openai_functions_agent(llm, tools, prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, return_intermediate_steps=True)
-
-    transcript_input = {
-        "input": f"""
-        Use the youtube_transcript tool to extract transcripts from these video URLs:
-        Video URLs: {state.get('video_urls', [])}
-        Language preference: {state.get('language', 'en')}
-        
-        Extract clean, complete transcripts from all videos.
-        """
-    }
+async def extract_transcripts_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Node function that extracts transcripts from video URLs.
 
+    By default the transcript tool is called directly with the state's URLs.
+    Set `use_agent` in the state to route the call through the LLM agent instead.
+    The transcript client is blocking, so the fetches run on the tool's own
+    thread pool while the event loop stays free.
+    """
     try:
-        result = agent_executor.invoke(transcript_input)
-        
-        # Extract transcripts from intermediate steps
-        transcripts = {}
-        
-        if 'intermediate_steps' in result:
-            for step in result['intermediate_steps']:
-                if len(step) >= 2:
-                    tool_output = step[1]
-                    if isinstance(tool_output, str):
-                        try:
-                            json_data = json.loads(tool_output)
-                            if 'transcripts' in json_data:
-                                transcripts.update(json_data['transcripts'])
-                        except json.JSONDecodeError:
-                            continue
+        if state.get('use_agent'):
+            transcripts = await _extract_with_agent(state)
+        else:
+            tool_output = await asyncio.to_thread(
+                youtube_transcript_function,
+                state.get('video_urls', []),
+                language=state.get('language', 'en'),
+            )
+            transcript_data = json.loads(tool_output)
+            transcripts = transcript_data.get('transcripts', {})
+            if transcript_data.get('cache_hits'):
+                print(f"Reused {transcript_data['cache_hits']} cached transcripts")
         
         print(f"Extracted {len(transcripts)} transcripts")
+        await asyncio.to_thread(mark_completed, state.get('run_id'), "transcript", list(transcripts))
         
         return {
             "transcripts": transcripts,
@@ -68,4 +53,43 @@ def extract_transcripts_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "transcripts": {},
             "current_step": "transcript_failed",
             "errors": state.get('errors', []) + [str(e)]
-        }
\ No newline at end of file
+        }
+
+async def _extract_with_agent(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Run transcript extraction through an LLM agent and collect the tool outputs."""
+    from langchain.agents import create_openai_functions_agent, AgentExecutor
+    llm = get_chat_model()
+
+    tools = [create_youtube_transcript_tool()]
+    prompt = get_agent_prompt()
+    agent = create_openai_functions_agent(llm, tools, prompt)
+    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, return_intermediate_steps=True)
+
+    transcript_input = {
+        "input": f"""
+        Use the youtube_transcript tool to extract transcripts from these video URLs:
+        Video URLs: {state.get('video_urls', [])}
+        Language preference: {state.get('language', 'en')}
+        
+        Extract clean, complete transcripts from all videos.
+        """
+    }
+
+    result = await agent_executor.ainvoke(transcript_input)
+    
+    # Extract transcripts from intermediate steps
+    transcripts = {}
+    
+    if 'intermediate_steps' in result:
+        for step in result['intermediate_steps']:
+            if len(step) >= 2:
+                tool_output = step[1]
+                if isinstance(tool_output, str):
+                    try:
+                        json_data = json.loads(tool_output)
+                        if 'transcripts' in json_data:
+                            transcripts.update(json_data['transcripts'])
+                    except json.JSONDecodeError:
+                        continue
+
+    return transcripts
@@ -1,75 +1,38 @@
 import os
+import re
+import asyncio
 import sqlite3
-from typing import Dict, Any, List
-from langchain_openai import AzureChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from dotenv import load_dotenv
+from typing import Dict, Any, List, Optional
+from langchain_core.prompts import ChatPromptTemplate
+from tools.config import load_config
+from tools.llm import get_chat_model
+from tools.llm_batch import LLMRateLimiter, run_llm_batch, count_tokens
+from tools.embedding_index import semantic_search
+from tools.database import get_connection, transaction
+from tools.compression import decode_text
+from tools.async_utils import run_sync
 
-load_dotenv(override=True)
+load_config()
 
+# Token budget for the source text of one report prompt (summaries or partial syntheses).
+REPORT_GROUP_TOKENS = int(os.getenv("REPORT_GROUP_TOKENS", "12000"))
+# How many partial syntheses are merged per reduce call.
+REPORT_FAN_IN = int(os.getenv("REPORT_FAN_IN", "6"))
+# Most summaries retrieved for one report, best BM25 matches first.
+REPORT_TOP_K = int(os.getenv("REPORT_TOP_K", "50"))
+# BM25 column weights for summaries_fts: video_title, summary, query, topic_focus.
+FTS_COLUMN_WEIGHTS = (2.0, 1.0, 4.0, 2.0)
+# Rank constant for reciprocal rank fusion of keyword and semantic results.
+RRF_K = 60
+# Words too common to say anything about a summary's relevance; left out of full-text queries.
+FTS_STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how",
+    "in", "into", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "using",
+    "what", "when", "where", "which", "why", "with", "you", "your",
+}
 
-
-
-
-
-def fetch_summaries_from_db(query: str, topic_focus: str) -> List[Dict]:
-    """Fetch relevant summaries from database."""
-    try:
-        conn = sqlite3.connect("youtube_research.db")
-        cursor = conn.cursor()
-        
-        # Fetch summaries related to current query/topic
-        cursor.execute("""
-            SELECT video_url, video_title, summary, topic_focus, created_at
-            FROM summaries 
-            WHERE query = ? OR topic_focus LIKE ?
-            ORDER BY created_at DESC
-        """, (query, f"%{topic_focus}%"))
-        
-        results = cursor.fetchall()
-        conn.close()
-        
-        summaries = []
-        for row in results:
-            summaries.append({
-                'video_url': row[0],
-                'video_title': row[1], 
-                'summary': row[2],
-                'topic_focus': row[3],
-                'created_at': row[4]
-            })
-        
-        return summaries
-        
-    except Exception as e:
-        print(f"Error fetching summaries: {str(e)}")
-        return []
-
-def final_report_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    """Node function that creates comprehensive final report from stored summaries."""
-    
-    llm = AzureChatOpenAI(
-        azure_endpoint=os.getenv("AZURE_API_BASE"),
-        api_key=os.getenv("AZURE_API_KEY"),
-        api_version=os.getenv("AZURE_API_VERSION"),
-        azure_deployment=os.getenv("LLM_DEPLOYMENT_NAME")
-    )
-    
-    query = state.get('query', '')
-    topic_focus = state.get('topic_focus', '')
-    
-    # Fetch summaries from database
-    stored_summaries = fetch_summaries_from_db(query, topic_focus)
-    
-    if not stored_summaries:
-        return {
-            "final_report": "No summaries found in database to create report.",
-            "current_step": "report_failed",
-            "errors": state.get('errors', []) + ["No stored summaries available"]
-        }
-    
-    # Create comprehensive report prompt
-    report_prompt = ChatPromptTemplate.from_template("""
+# Final report prompt
+REPORT_PROMPT = ChatPromptTemplate.from_template("""
     You are an expert research analyst. Create a comprehensive, detailed guide based on multiple YouTube video summaries.
     
     Original Query: {query}
@@ -110,43 +73,295 @@ def final_report_node(state: Dict[str, Any]) -> Dict[str, Any]:
     ## Conclusion
     [Final thoughts and next steps]
     """)
+
+# Map step: synthesize one token-budgeted group of summaries
+PARTIAL_REPORT_PROMPT = ChatPromptTemplate.from_template("""
+    You are an expert research analyst. Synthesize the following YouTube video summaries into a dense set of research notes.
+    
+    Original Query: {query}
+    Topic Focus: {topic_focus}
     
+    Instructions:
+    1. Keep every distinct insight, recommendation and example
+    2. Group related points by theme and merge duplicates
+    3. Attribute points to their videos by title and URL
+    4. Do not write an introduction or conclusion
+    
+    Video Summaries:
+    {summaries_text}
+    """)
+
+# Reduce step: merge several partial syntheses into one
+MERGE_REPORT_PROMPT = ChatPromptTemplate.from_template("""
+    You are an expert research analyst. Merge the following research notes, each covering a different set of YouTube videos, into one consolidated set of notes.
+    
+    Original Query: {query}
+    Topic Focus: {topic_focus}
+    
+    Instructions:
+    1. Keep every distinct insight, recommendation and example
+    2. Merge points that appear in several notes and keep all their video attributions
+    3. Keep video titles and URLs attached to the points they support
+    4. Do not write an introduction or conclusion
+    
+    Research Notes:
+    {notes_text}
+    """)
+
+
+
+
+
+def _fts_terms(text: str) -> List[str]:
+    words = re.findall(r"\w+", (text or "").lower())
+    return [f'"{w}"' for w in dict.fromkeys(words) if len(w) > 1 and w not in FTS_STOPWORDS]
+
+def _fts_match_expressions(*texts: str) -> List[str]:
+    """
+    Turn free text into FTS5 queries, strictest first.
+
+    Every word of every text, then every word of each text on its own, then
+    any word at all. Stopwords and single characters are dropped, so they
+    neither narrow the strict queries nor let the last one match everything.
+    """
+    per_text = [_fts_terms(text) for text in texts]
+    terms = list(dict.fromkeys(term for text_terms in per_text for term in text_terms))
+    expressions = [" AND ".join(terms)] + [" AND ".join(t) for t in per_text if t] + [" OR ".join(terms)]
+    return [e for e in dict.fromkeys(expressions) if e]
+
+def fetch_summaries_from_db(query: str, topic_focus: str, limit: int = REPORT_TOP_K) -> List[Dict]:
+    """
+    Fetch the summaries most relevant to the query and topic from database.
+
+    Ranks rows by BM25 over the summaries_fts index and keeps the best `limit`.
+    Summaries matching every word of the query and topic come first, then
+    those matching every word of either one; summaries matching only some
+    words fill the remaining places. Falls back to
+    matching the query and topic with LIKE when the index is unavailable.
+    """
     try:
-        # Prepare summaries text
-        summaries_text = ""
-        for i, summary in enumerate(stored_summaries, 1):
-            summaries_text += f"\n--- Video {i}: {summary['video_title']} ---\n"
-            summaries_text += f"URL: {summary['video_url']}\n"
-            summaries_text += f"Summary: {summary['summary']}\n"
+        cursor = get_connection().cursor()
+
+        matches = _fts_match_expressions(query, topic_focus)
+        try:
+            if not matches:
+                raise sqlite3.OperationalError("no search terms")
+            results, seen = [], set()
+            for match in matches:
+                cursor.execute(f"""
+                    SELECT s.video_url, s.video_title, s.summary, s.topic_focus, s.created_at
+                    FROM summaries_fts
+                    JOIN summaries s ON s.id = summaries_fts.rowid
+                    WHERE summaries_fts MATCH ?
+                    ORDER BY bm25(summaries_fts, {", ".join(map(str, FTS_COLUMN_WEIGHTS))})
+                    LIMIT ?
+                """, (match, limit))
+                for row in cursor.fetchall():
+                    if row[0] not in seen and len(results) < limit:
+                        seen.add(row[0])
+                        results.append(row)
+                if len(results) >= limit:
+                    break
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable ({str(e)}), falling back to LIKE")
+            cursor.execute("""
+                SELECT video_url, video_title, summary, topic_focus, created_at
+                FROM summaries 
+                WHERE query = ? OR topic_focus LIKE ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            """, (query, f"%{topic_focus}%", limit))
+            results = cursor.fetchall()
         
-        # Format the prompt
-        formatted_prompt = report_prompt.format(
-            query=query,
-            topic_focus=topic_focus,
-            num_sources=len(stored_summaries),
-            summaries_text=summaries_text #[:20000]  # Limit for token constraints
-        )
+        summaries = []
+        for row in results:
+            summaries.append({
+                'video_url': row[0],
+                'video_title': row[1], 
+                'summary': decode_text(row[2]),
+                'topic_focus': row[3],
+                'created_at': row[4]
+            })
         
-        print(f"Generating final report from {len(stored_summaries)} summaries...")
+        return summaries
         
-        # Generate comprehensive report
-        response = llm.invoke(formatted_prompt)
-        final_report = response.content
+    except Exception as e:
+        print(f"Error fetching summaries: {str(e)}")
+        return []
 
-        # Save report to DB
-        conn = sqlite3.connect("youtube_research.db")
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
+def fetch_summaries_by_urls(video_urls: List[str]) -> Dict[str, Dict]:
+    """Fetch stored summaries by video_url."""
+    if not video_urls:
+        return {}
+    placeholders = ",".join("?" * len(video_urls))
+    rows = get_connection().execute(f"""
+        SELECT video_url, video_title, summary, topic_focus, created_at
+        FROM summaries WHERE video_url IN ({placeholders})
+    """, video_urls).fetchall()
+    return {
+        row[0]: {'video_url': row[0], 'video_title': row[1], 'summary': decode_text(row[2]), 'topic_focus': row[3], 'created_at': row[4]}
+        for row in rows
+    }
+
+def retrieve_summaries(query: str, topic_focus: str, limit: int = REPORT_TOP_K) -> List[Dict]:
+    """
+    Retrieve the summaries most relevant to the research, from this and earlier runs.
+
+    Merges BM25 keyword matches with semantically similar summaries from the
+    embedding index by reciprocal rank fusion, so summaries stored under
+    differently worded queries are found too. Without an embedding deployment
+    this is the keyword search alone.
+    """
+    keyword_results = fetch_summaries_from_db(query, topic_focus, limit)
+    try:
+        semantic_results = semantic_search(" ".join(filter(None, [query, topic_focus])), limit)
+    except Exception as e:
+        print(f"Semantic search unavailable: {str(e)}")
+        semantic_results = []
+    if not semantic_results:
+        return keyword_results
+
+    by_url = {summary['video_url']: summary for summary in keyword_results}
+    missing = [url for url, _ in semantic_results if url not in by_url]
+    by_url.update(fetch_summaries_by_urls(missing))
+
+    scores: Dict[str, float] = {}
+    for ranking in ([s['video_url'] for s in keyword_results], [url for url, _ in semantic_results]):
+        for rank, url in enumerate(ranking):
+            scores[url] = scores.get(url, 0.0) + 1.0 / (RRF_K + rank + 1)
+    ranked = sorted((url for url in scores if url in by_url), key=lambda url: -scores[url])
+    print(f"Retrieved {len(keyword_results)} keyword and {len(semantic_results)} semantic matches "
+          f"({len(missing)} found only semantically)")
+    return [by_url[url] for url in ranked[:limit]]
+
+def _format_summary(index: int, summary: Dict[str, Any]) -> str:
+    return (f"\n--- Video {index}: {summary['video_title']} ---\n"
+            f"URL: {summary['video_url']}\n"
+            f"Summary: {summary['summary']}\n")
+
+def _pack_groups(blocks: List[str], budget: int, max_items: int = 0) -> List[List[str]]:
+    """Greedily pack text blocks, in order, into groups of at most `budget` tokens (and `max_items` blocks)."""
+    groups, current, current_tokens = [], [], 0
+    for block in blocks:
+        tokens = count_tokens(block)
+        if current and (current_tokens + tokens > budget or (max_items and len(current) >= max_items)):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+async def generate_report(
+    llm: Any,
+    stored_summaries: List[Dict],
+    query: str,
+    topic_focus: str,
+    group_tokens: int = REPORT_GROUP_TOKENS,
+    fan_in: int = REPORT_FAN_IN,
+    limiter: Optional[LLMRateLimiter] = None,
+) -> str:
+    """
+    Generate the final report, map-reducing when the summaries exceed one prompt's budget.
+
+    Summaries that fit in `group_tokens` go into a single report prompt. Otherwise
+    they are packed into token-budgeted groups that are synthesized in parallel
+    (map), and the partial syntheses are merged `fan_in` at a time (reduce)
+    until they fit in the final report prompt. The number of sequential LLM
+    rounds grows with log(number of summaries). Pass a shared `limiter` to keep
+    several reports under one set of LLM limits.
+    """
+    limiter = limiter or LLMRateLimiter()
+    blocks = [_format_summary(i, summary) for i, summary in enumerate(stored_summaries, 1)]
+    fan_in = max(2, fan_in)
+
+    if sum(count_tokens(block) for block in blocks) > group_tokens:
+        groups = _pack_groups(blocks, group_tokens)
+        print(f"Map: synthesizing {len(groups)} groups of summaries in parallel...")
+        prompts = [
+            PARTIAL_REPORT_PROMPT.format(query=query, topic_focus=topic_focus, summaries_text="".join(group))
+            for group in groups
+        ]
+        blocks = _collect_notes(await run_llm_batch(llm, prompts, limiter=limiter), "Partial synthesis")
+
+        level = 1
+        while len(blocks) > 1 and (len(blocks) > fan_in or sum(count_tokens(b) for b in blocks) > group_tokens):
+            groups = _pack_groups(blocks, group_tokens, max_items=fan_in)
+            if len(groups) == len(blocks):
+                # Each note alone fills the budget; merging by count is the only way to shrink.
+                groups = [blocks[i:i + fan_in] for i in range(0, len(blocks), fan_in)]
+            print(f"Reduce level {level}: merging {len(blocks)} syntheses into {len(groups)}...")
+            prompts = [
+                MERGE_REPORT_PROMPT.format(query=query, topic_focus=topic_focus, notes_text="".join(group))
+                for group in groups
+            ]
+            blocks = _collect_notes(await run_llm_batch(llm, prompts, limiter=limiter), "Merged notes")
+            level += 1
+
+    # Format the prompt
+    formatted_prompt = REPORT_PROMPT.format(
+        query=query,
+        topic_focus=topic_focus,
+        num_sources=len(stored_summaries),
+        summaries_text="".join(blocks)
+    )
+    response = await limiter.call(llm, formatted_prompt)
+    return response.content
+
+def _collect_notes(responses: List[Any], label: str) -> List[str]:
+    """Turn LLM responses into labelled note blocks, dropping failures unless all failed."""
+    notes = []
+    for i, response in enumerate(responses, 1):
+        if isinstance(response, Exception):
+            print(f"Error generating {label.lower()} {i}: {str(response)}")
+            continue
+        notes.append(f"\n--- {label} {i} ---\n{response.content}\n")
+    if not notes:
+        raise RuntimeError(f"All {label.lower()} requests failed: {responses[0]}")
+    return notes
+
+def save_report(report_name: str, report: str) -> None:
+    """Save a report to the final_report table, replacing an earlier report of the same name."""
+    try:
+        with transaction() as conn:
+            conn.execute("""
                 INSERT OR REPLACE INTO final_report (report_name, report)
                 VALUES (?, ?)
-            """, (topic_focus, final_report))
-            conn.commit()
-            print("✓ Final report saved to database")
-        except Exception as e:
-            print(f"Error saving final report: {e}")
-        finally:
-            conn.close()
+            """, (report_name, report))
+        print("✓ Final report saved to database")
+    except Exception as e:
+        print(f"Error saving final report: {e}")
+
+def final_report_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Synchronous version of final_report_node_async."""
+    return run_sync(final_report_node_async(state))
+
+async def final_report_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Node function that creates comprehensive final report from stored summaries."""
+    
+    llm = get_chat_model()
+    
+    query = state.get('query', '')
+    topic_focus = state.get('topic_focus', '')
+    
+    # Fetch summaries from database (and embed the query), off the event loop
+    stored_summaries = await asyncio.to_thread(retrieve_summaries, query, topic_focus)
+    
+    if not stored_summaries:
+        return {
+            "final_report": "No summaries found in database to create report.",
+            "current_step": "report_failed",
+            "errors": state.get('errors', []) + ["No stored summaries available"]
+        }
+    
+    try:
+        print(f"Generating final report from {len(stored_summaries)} summaries...")
+        
+        # Generate comprehensive report
+        final_report = await generate_report(llm, stored_summaries, query, topic_focus)
+
+        await asyncio.to_thread(save_report, topic_focus, final_report)
         
         print("✓ Comprehensive final report generated")
         
@@ -0,0 +1,206 @@
+import os
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+from tools.config import load_config
+from tools.llm import get_chat_model
+from tools.youtube_trancript import fetch_transcript_for_url, extract_video_id, DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT
+from tools.run_progress import mark_completed, completed_videos
+from tools.llm_batch import LLMRateLimiter, DEFAULT_MAX_CONCURRENCY
+from agents.summary_agent import summarize_transcripts
+from agents.store_agents import create_database, store_summaries
+from tools.embedding_index import index_summaries
+from tools.channel_index import commit_sync_marks
+from tools.async_utils import run_sync
+
+load_config()
+
+# Capacity of the queues between stages; a full queue makes the upstream stage wait.
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+# Most summaries the store stage writes in one transaction.
+STORE_BATCH_SIZE = 50
+
+
+def stream_videos_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Synchronous version of stream_videos_node_async."""
+    return run_sync(stream_videos_node_async(state))
+
+
+async def stream_videos_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Node function that streams each video through transcript -> summary -> store.
+
+    Replaces the extract_transcript, summarize and store barriers in streaming
+    mode: a video's summary starts as soon as its transcript arrives, and it is
+    stored as soon as it is summarized. When resuming a run, videos already
+    stored by that run are skipped.
+    """
+    if not state.get('video_urls'):
+        await asyncio.to_thread(commit_sync_marks, state.get('sync_marks', []), [])
+        return {
+            "transcripts": {},
+            "summaries": {},
+            "storage_results": {"status": "failed", "message": "No videos to process"},
+            "current_step": "storage_failed",
+            "errors": state.get('errors', []) + ["No video URLs available for processing"]
+        }
+
+    try:
+        return await _stream_videos(state)
+    except Exception as e:
+        print(f"Error in stream_videos_node: {str(e)}")
+        return {
+            "transcripts": {},
+            "summaries": {},
+            "storage_results": {"status": "failed", "message": str(e)},
+            "current_step": "storage_failed",
+            "errors": state.get('errors', []) + [str(e)]
+        }
+
+
+async def _stream_videos(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the three stages as worker pools joined by bounded queues.
+
+    Each stage has its own concurrency (transcript threads, LLM slots, one
+    database writer), so total time is set by the slowest stage rather than
+    the sum of all of them.
+    """
+    run_id = state.get('run_id')
+    already_stored = await asyncio.to_thread(completed_videos, run_id, "store")
+    video_urls = [url for url in state.get('video_urls', []) if extract_video_id(url) not in already_stored]
+    if already_stored:
+        print(f"Resuming: skipping {len(state.get('video_urls', [])) - len(video_urls)} videos already stored in run {run_id}")
+    language = state.get('language', 'en')
+    query = state.get('query', 'unknown_query')
+    topic_focus = state.get('topic_focus', 'general content')
+    store_topic_focus = state.get('topic_focus', 'general')
+
+    llm = get_chat_model()
+    limiter = LLMRateLimiter()
+    await asyncio.to_thread(create_database)
+
+    transcript_workers = max(1, min(DEFAULT_MAX_WORKERS, len(video_urls)))
+    summary_workers = max(1, min(DEFAULT_MAX_CONCURRENCY, len(video_urls)))
+
+    url_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    summary_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    store_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    transcripts: Dict[str, Dict[str, Any]] = {}
+    summaries: Dict[str, Dict[str, Any]] = {}
+    errors: List[str] = []
+    stored_count = 0
+    stored_ids = set(already_stored)
+    loop = asyncio.get_running_loop()
+    # Fetch threads get their own pool: one stuck past its timeout cannot be
+    # interrupted, and in the default executor it would hold up asyncio.run's shutdown.
+    fetch_executor = ThreadPoolExecutor(max_workers=transcript_workers, thread_name_prefix="stream_transcript")
+
+    async def feed_urls():
+        for url in dict.fromkeys(video_urls):
+            await url_queue.put(url)
+        for _ in range(transcript_workers):
+            await url_queue.put(None)
+
+    async def transcript_worker():
+        while (url := await url_queue.get()) is not None:
+            try:
+                # The fetch thread cannot be interrupted; on timeout its result is dropped.
+                fetch = functools.partial(contextvars.copy_context().run, fetch_transcript_for_url, url, language)
+                outcome = await asyncio.wait_for(loop.run_in_executor(fetch_executor, fetch), DEFAULT_TIMEOUT)
+            except asyncio.TimeoutError:
+                outcome = {'error': f"Timed out after {DEFAULT_TIMEOUT:.0f}s: {url}"}
+            if 'error' in outcome:
+                errors.append(outcome['error'])
+                continue
+            outcome.pop('from_cache', None)
+            transcripts[outcome['video_id']] = outcome
+            await asyncio.to_thread(mark_completed, run_id, "transcript", [outcome['video_id']])
+            await summary_queue.put((outcome['video_id'], outcome))
+
+    async def summary_worker():
+        while (item := await summary_queue.get()) is not None:
+            video_key, transcript = item
+            try:
+                result = await summarize_transcripts({video_key: transcript}, topic_focus, llm, limiter)
+            except Exception as e:
+                errors.append(f"Error summarizing video {video_key}: {str(e)}")
+                continue
+            if video_key in result:
+                summaries[video_key] = result[video_key]
+                if not result[video_key].get('error'):
+                    await asyncio.to_thread(mark_completed, run_id, "summary", [video_key])
+                    await store_queue.put((video_key, result[video_key]))
+
+    async def store_worker():
+        nonlocal stored_count
+        while (item := await store_queue.get()) is not None:
+            batch = dict([item])
+            # Write whatever else is already waiting in the same transaction.
+            while len(batch) < STORE_BATCH_SIZE and not store_queue.empty():
+                queued = store_queue.get_nowait()
+                if queued is None:
+                    await store_queue.put(None)
+                    break
+                batch[queued[0]] = queued[1]
+            # A failed batch is reported and skipped; the worker keeps draining the queue.
+            try:
+                count, store_errors = await asyncio.to_thread(store_summaries, batch, query, store_topic_focus)
+            except Exception as e:
+                errors.append(f"Error storing {len(batch)} summaries: {str(e)}")
+                continue
+            stored_count += count
+            errors.extend(store_errors)
+            if not count:
+                continue
+            stored_ids.update(extract_video_id(key) or key for key in batch)
+            try:
+                await asyncio.to_thread(index_summaries, batch)
+            except Exception as e:
+                errors.append(f"Error embedding summaries: {str(e)}")
+            try:
+                await asyncio.to_thread(mark_completed, run_id, "store", batch.keys())
+            except Exception as e:
+                errors.append(f"Error recording progress for {len(batch)} stored summaries: {str(e)}")
+            print(f"✓ Stored {count} summaries ({stored_count} so far)")
+
+    async def close_after(workers, queue: asyncio.Queue, consumers: int):
+        await asyncio.gather(*workers)
+        for _ in range(consumers):
+            await queue.put(None)
+
+    try:
+        await asyncio.gather(
+            feed_urls(),
+            close_after([transcript_worker() for _ in range(transcript_workers)], summary_queue, summary_workers),
+            close_after([summary_worker() for _ in range(summary_workers)], store_queue, 1),
+            store_worker(),
+        )
+    finally:
+        fetch_executor.shutdown(wait=False, cancel_futures=True)
+
+    print(f"Streamed {len(video_urls)} videos: {len(transcripts)} transcripts, "
+          f"{len([s for s in summaries.values() if not s.get('error')])} summaries, {stored_count} stored")
+
+    # Incremental sync marks move only over videos that are now stored.
+    await asyncio.to_thread(commit_sync_marks, state.get('sync_marks', []), stored_ids)
+
+    # A resumed run whose remaining videos were all stored before still succeeded.
+    stored_count_total = stored_count + len(already_stored)
+    result = {
+        "transcripts": transcripts,
+        "summaries": summaries,
+        "storage_results": {
+            "status": "success" if stored_count_total else "failed",
+            "stored_count": stored_count,
+            "skipped_count": len(already_stored),
+            "errors": errors
+        },
+        "current_step": "storage_completed" if stored_count_total else "storage_failed"
+    }
+    if errors:
+        result["errors"] = state.get('errors', []) + errors
+    return result
@@ -1,30 +1,98 @@
-import os
-from typing import Dict, Any, List
-from langchain_openai import AzureChatOpenAI
-from langchain.agents import create_openai_functions_agent, AgentExecutor
-from langchain import hub
-from tools.youtube_search_tool import create_youtube_tool_sync
-from dotenv import load_dotenv
+import asyncio
+from typing import Dict, Any, List, Tuple
+from tools.youtube_search_tool import create_youtube_tool_sync, youtube_search_function_async
+from tools.video_store import save_videos
+from tools.config import load_config
+from tools.llm import get_chat_model, get_agent_prompt
+from tools.async_utils import run_sync
 import re
 import json
 
-load_dotenv(override=True)
+load_config()
 
-def search_video_node(state: Dict[str, Any]) -> Dict[str, Any]: 
+def search_video_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Synchronous version of search_video_node_async."""
+    return run_sync(search_video_node_async(state))
+
+async def search_video_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Node function that searches for YouTube videos.
+
+    By default the search tool is called directly with the state's parameters.
+    Set `use_agent` in the state to route the call through the LLM agent instead.
     """
-    llm = AzureChatOpenAI(
-        azure_endpoint=os.getenv("AZURE_API_BASE"),
-        api_key=os.getenv("AZURE_API_KEY"),
-        api_version=os.getenv("AZURE_API_VERSION"),
-        azure_deployment=os.getenv("LLM_DEPLOYMENT_NAME")     
-    )
+    try:
+        source_errors = []
+        sync_marks = []
+        if state.get('use_agent'):
+            video_urls, video_metadata = await _search_with_agent(state)
+        else:
+            tool_output = await youtube_search_function_async(
+                query=state.get('query', ''),
+                channels=state.get('channels') or None,
+                max_results_per_query=state.get('max_results_per_query', 5),
+                incremental=state.get('incremental_sync', False),
+            )
+            search_data = json.loads(tool_output)
+            if search_data.get('error'):
+                raise RuntimeError(search_data['error'])
+            video_urls = search_data.get('video_urls', [])
+            video_metadata = search_data.get('videos', [])
+            sync_marks = search_data.get('sync_marks', [])
+            source_errors = [
+                f"Search failed for {e['source_query']} ({e['source_type']}): {e['error']}"
+                for e in search_data.get('source_errors', [])
+            ]
+
+        # Remove duplicates while keeping search order
+        video_urls = list(dict.fromkeys(video_urls))
+
+        # Record metadata so summaries get real titles and later runs know these videos.
+        try:
+            await asyncio.to_thread(save_videos, video_metadata)
+        except Exception as e:
+            print(f"Error saving video metadata: {str(e)}")
+        
+        print(f"Extracted {len(video_urls)} video URLs")
+        
+        result = {
+            "video_urls": video_urls,
+            "video_metadata": video_metadata,
+            "sync_marks": sync_marks,
+            "current_step": "search_completed"
+        }
+        if source_errors:
+            result["errors"] = state.get('errors', []) + source_errors
+        return result
+
+    except Exception as e:
+        print(f"Error in search_video_node: {str(e)}")
+        return {
+            "video_urls": [],
+            "video_metadata": [],
+            "current_step": "search_failed",
+            "errors": state.get('errors', []) + [str(e)]
+        }
+
+def _parse_search_output(tool_output: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Parse the search tool's JSON output into video URLs and metadata."""
+    try:
+        json_data = json.loads(tool_output)
+    except json.JSONDecodeError:
+        # Fallback to regex
+        return re.findall(r'https://www\.youtube\.com/watch\?v=[\w-]+', tool_output), []
+    return json_data.get('video_urls', []), json_data.get('videos', [])
+
+async def _search_with_agent(state: Dict[str, Any]) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Run the search through an LLM agent and collect the tool outputs."""
+    # langchain.agents is slow to import and only agent mode needs it.
+    from langchain.agents import create_openai_functions_agent, AgentExecutor
+    llm = get_chat_model()
 
     tools = [create_youtube_tool_sync()]
 
     # Create agent with system prompt
-    prompt = hub.pull("hwchase17/openai-functions-agent")
+    prompt = get_agent_prompt()
     agent = create_openai_functions_agent(llm, tools, prompt)
     agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, return_intermediate_steps=True)
 
@@ -40,54 +108,25 @@ def search_video_node(state: Dict[str, Any]) -> Dict[str, Any]:
         """
     }
 
-    try: 
-        result = agent_executor.invoke(search_input)
-        
-        # FIXED: Extract URLs from intermediate steps (tool outputs)
-        video_urls = []
-        video_metadata = []
-        
-        # Check intermediate steps for tool outputs
-        if 'intermediate_steps' in result:
-            for step in result['intermediate_steps']:
-                if len(step) >= 2:
-                    tool_output = step[1]  # Second element is tool output
-                    if isinstance(tool_output, str):
-                        try:
-                            # Parse JSON from tool output
-                            json_data = json.loads(tool_output)
-                            if 'video_urls' in json_data:
-                                video_urls.extend(json_data['video_urls'])
-                            if 'videos' in json_data:
-                                video_metadata.extend(json_data['videos'])
-                        except json.JSONDecodeError:
-                            # Fallback to regex
-                            youtube_urls = re.findall(r'https://www\.youtube\.com/watch\?v=[\w-]+', tool_output)
-                            video_urls.extend(youtube_urls)
-        
-        # Fallback: parse from final output if no intermediate steps
-        if not video_urls:
-            output = result.get("output", "")
-            youtube_urls = re.findall(r'https://www\.youtube\.com/watch\?v=[\w-]+', output)
-            video_urls.extend(youtube_urls)
-            
-        # Remove duplicates
-        video_urls = list(set(video_urls))
-        
-        print(f"Extracted {len(video_urls)} video URLs")
-        
-        return {
-            "video_urls": video_urls,
-            "video_metadata": video_metadata,
-            "current_step": "search_completed"
-        }
-
-    except Exception as e:
-        print(f"Error in search_video_node: {str(e)}")
-        return {
-            "video_urls": [],
-            "video_metadata": [],
-            "current_step": "search_failed",
-            "errors": state.get('errors', []) + [str(e)]
-        }
+    result = await agent_executor.ainvoke(search_input)
+    
+    # Extract URLs from intermediate steps (tool outputs)
+    video_urls = []
+    video_metadata = []
+    
+    if 'intermediate_steps' in result:
+        for step in result['intermediate_steps']:
+            if len(step) >= 2:
+                tool_output = step[1]  # Second element is tool output
+                if isinstance(tool_output, str):
+                    urls, videos = _parse_search_output(tool_output)
+                    video_urls.extend(urls)
+                    video_metadata.extend(videos)
+    
+    # Fallback: parse from final output if no intermediate steps
+    if not video_urls:
+        output = result.get("output", "")
+        youtube_urls = re.findall(r'https://www\.youtube\.com/watch\?v=[\w-]+', output)
+        video_urls.extend(youtube_urls)
 
+    return video_urls, video_metadata
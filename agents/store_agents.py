@@ -1,101 +1,133 @@
-import sqlite3
-import os
-import json
-from typing import Dict, Any
-from datetime import datetime
+import asyncio
+from typing import Dict, Any, List, Iterable, Tuple
+from tools.database import get_connection, transaction, video_id_from_url, watch_url, update_summaries_fts, summary_fts_entries
+from tools.compression import encode_text, decode_text
+from tools.run_progress import mark_completed
+from tools.embedding_index import index_summaries
+from tools.channel_index import commit_sync_marks
 
 def create_database():
-    """Create SQLite database and tables if they don't exist."""
-    db_path = "youtube_research.db"
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Create summaries table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS summaries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_url TEXT UNIQUE NOT NULL,
-            video_title TEXT NOT NULL,
-            summary TEXT NOT NULL,
-            topic_focus TEXT NOT NULL,
-            query TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            original_length INTEGER,
-            summary_length INTEGER
-        )
-    """)
+    """Make sure the database schema is up to date. Migrations run once per process."""
+    get_connection()
+
+def get_cached_summaries(cache_keys: Iterable[str]) -> Dict[str, str]:
+    """Return cached summary text for the given cache keys that are present."""
+    cache_keys = list(cache_keys)
+    if not cache_keys:
+        return {}
+
+    conn = get_connection()
+    found = {}
+    # Stay well below SQLite's bound-parameter limit
+    for i in range(0, len(cache_keys), 500):
+        batch = cache_keys[i:i + 500]
+        placeholders = ",".join("?" * len(batch))
+        for cache_key, summary in conn.execute(
+            f"SELECT cache_key, summary FROM summary_cache WHERE cache_key IN ({placeholders})",
+            batch
+        ):
+            found[cache_key] = decode_text(summary)
+    return found
 
+def save_cached_summaries(entries: List[Dict[str, str]]) -> None:
+    """Store summaries in the cache. Each entry needs cache_key, video_url and summary."""
+    if not entries:
+        return
 
+    with transaction() as conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO summary_cache (cache_key, video_url, summary)
+            VALUES (:cache_key, :video_url, :summary)
+        """, [{**entry, 'summary': encode_text(entry['summary'])} for entry in entries])
 
-    # final_report table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS final_report (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            report_name TEXT UNIQUE NOT NULL,
-            report TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+def store_summaries(summaries: Dict[str, Dict[str, Any]], query: str, topic_focus: str) -> Tuple[int, List[str]]:
+    """
+    Write successful summaries to the summaries table in one transaction. Returns (stored_count, errors).
+
+    Titles come from the videos table when the summary entry has none. Rows are
+    keyed by the video's canonical watch URL, whether `summaries` is keyed by URL or id.
+    The full-text index is updated in the same transaction.
+    """
+    # Skip summaries that have an error; keyed by canonical watch URL
+    successful = {watch_url(video_url): summary_data for video_url, summary_data in summaries.items()
+             if not summary_data.get('error')}
+    rows = [
+        (
+            video_url,
+            video_id_from_url(video_url),
+            summary_data.get('video_title'),
+            video_id_from_url(video_url),
+            encode_text(summary_data.get('summary', '')),
+            topic_focus,
+            query,
+            summary_data.get('original_transcript_length', 0),
+            summary_data.get('summary_length', 0)
         )
-    """)
-    
-    conn.commit()
-    conn.close()
+        for video_url, summary_data in successful.items()
+    ]
+    if not rows:
+        return 0, []
+
+    try:
+        with transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO videos (video_id) VALUES (?)", [(row[1],) for row in rows])
+            # The contentless full-text index needs the values rows were indexed with to drop them.
+            indexed = summary_fts_entries(conn, "video_url", successful)
+            # Insert or update summaries. An upsert keeps the row id, so the video's
+            # full-text entry is replaced under the same rowid below.
+            conn.executemany("""
+                INSERT INTO summaries 
+                (video_url, video_id, video_title, summary, topic_focus, query, original_length, summary_length)
+                VALUES (?, ?, COALESCE(?, (SELECT title FROM videos WHERE video_id = ?), 'Unknown Title'), ?, ?, ?, ?, ?)
+                ON CONFLICT(video_url) DO UPDATE SET
+                    video_id = excluded.video_id,
+                    video_title = excluded.video_title,
+                    summary = excluded.summary,
+                    topic_focus = excluded.topic_focus,
+                    query = excluded.query,
+                    created_at = CURRENT_TIMESTAMP,
+                    original_length = excluded.original_length,
+                    summary_length = excluded.summary_length
+            """, rows)
+            update_summaries_fts(conn, indexed, summary_fts_entries(conn, "video_url", successful))
+    except Exception as e:
+        return 0, [f"Error storing {len(rows)} summaries: {str(e)}"]
+    return len(rows), []
 
 def storage_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """Node function that stores summaries in SQLite database."""
     
     try:
-        # Create database if it doesn't exist
-        create_database()
-        
         summaries = state.get('summaries', {})
         query = state.get('query', 'unknown_query')
         topic_focus = state.get('topic_focus', 'general')
         
         if not summaries:
+            # Uploads a sync skipped on purpose (topic filter) still let its mark move on.
+            commit_sync_marks(state.get('sync_marks', []), [])
             return {
                 "storage_results": {"status": "failed", "message": "No summaries to store"},
                 "current_step": "storage_failed",
                 "errors": state.get('errors', []) + ["No summaries available for storage"]
             }
         
-        conn = sqlite3.connect("youtube_research.db")
-        cursor = conn.cursor()
-        
-        stored_count = 0
-        errors = []
-        
-        for video_url, summary_data in summaries.items():
-            try:
-                # Skip if summary has error
-                if summary_data.get('error'):
-                    continue
-                
-                # Insert or replace summary
-                cursor.execute("""
-                    INSERT OR REPLACE INTO summaries 
-                    (video_url, video_title, summary, topic_focus, query, original_length, summary_length)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    video_url,
-                    summary_data.get('video_title', 'Unknown Title'),
-                    summary_data.get('summary', ''),
-                    topic_focus,
-                    query,
-                    summary_data.get('original_transcript_length', 0),
-                    summary_data.get('summary_length', 0)
-                ))
-                
-                stored_count += 1
-                
-            except Exception as e:
-                errors.append(f"Error storing {video_url}: {str(e)}")
-                continue
-        
-        conn.commit()
-        conn.close()
+        stored_count, errors = store_summaries(summaries, query, topic_focus)
+        stored_urls = [key for key, s in summaries.items() if not s.get('error')] if stored_count else []
         
         print(f"✓ Stored {stored_count} summaries in database")
+
+        # Incremental sync marks move only over videos that are now stored.
+        commit_sync_marks(state.get('sync_marks', []), [video_id_from_url(url) for url in stored_urls])
+
+        # The embedding index is an optimization for retrieval; a failure here must not fail storage.
+        try:
+            embedded = index_summaries(summaries)
+            if embedded:
+                print(f"✓ Embedded {embedded} summaries")
+        except Exception as e:
+            errors.append(f"Error embedding summaries: {str(e)}")
+
+        mark_completed(state.get('run_id'), "store", [key for key, s in summaries.items() if not s.get('error')])
         
         return {
             "storage_results": {
@@ -113,3 +145,12 @@ def storage_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "current_step": "storage_failed",
             "errors": state.get('errors', []) + [str(e)]
         }
+
+async def storage_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async version of storage_node.
+
+    SQLite writes are blocking, so the node runs on a worker thread (with its
+    own connection) instead of stalling the event loop.
+    """
+    return await asyncio.to_thread(storage_node, state)
@@ -1,24 +1,31 @@
 import os
+import asyncio
+import hashlib
 from typing import Dict, Any
-from langchain_openai import AzureChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from dotenv import load_dotenv
-import json
+from langchain_core.prompts import ChatPromptTemplate
+from tools.config import load_config
+from tools.llm import get_chat_model
+from tools.llm_batch import LLMRateLimiter
+from tools.text_chunking import chunk_text
+from agents.store_agents import get_cached_summaries, save_cached_summaries
+from tools.run_progress import mark_completed
+from tools.database import video_id_from_url
+from tools import metrics
+from tools.async_utils import run_sync
 
-load_dotenv(override=True)
+load_config()
 
-def create_summary_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    """Node function that creates clean summaries from transcripts."""
-    
-    llm = AzureChatOpenAI(
-        azure_endpoint=os.getenv("AZURE_API_BASE"),
-        api_key=os.getenv("AZURE_API_KEY"),
-        api_version=os.getenv("AZURE_API_VERSION"),
-        azure_deployment=os.getenv("LLM_DEPLOYMENT_NAME")
-    )
-    
-    # Create a prompt template for summarization
-    summary_prompt = ChatPromptTemplate.from_template("""
+# Bump whenever SUMMARY_PROMPT or the way transcripts are fed to it changes,
+# so cached summaries produced by the old prompt are not reused.
+SUMMARY_PROMPT_VERSION = "2"
+
+# Transcripts longer than this many tokens are summarized chunk by chunk and then combined.
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+# Tokens of trailing sentences repeated at the start of the next chunk.
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv("SUMMARY_CHUNK_OVERLAP_TOKENS", "200"))
+
+# Prompt template for summarization
+SUMMARY_PROMPT = ChatPromptTemplate.from_template("""
     You are an expert content summarizer. Your task is to create clean, well-structured summaries of YouTube video transcripts.
     
     Topic Focus: {topic_focus}
@@ -54,9 +61,89 @@ def create_summary_node(state: Dict[str, Any]) -> Dict[str, Any]:
     ### Relevance to Topic:
     [How this content relates to the topic focus]
     """)
+
+# Prompt template for one part of a long transcript
+CHUNK_SUMMARY_PROMPT = ChatPromptTemplate.from_template("""
+    You are an expert content summarizer. Below is part {chunk_number} of {chunk_count} of a YouTube video transcript.
+    
+    Topic Focus: {topic_focus}
+    
+    Instructions:
+    1. Remove filler words, repetitions, and unclear segments
+    2. Capture every important point, insight, and example in this part
+    3. Focus on content relevant to: {topic_focus}
+    4. Keep key quotes verbatim when they add value
+    5. Do not add an introduction or conclusion; other parts are summarized separately
+    
+    Video URL: {video_url}
+    
+    Transcript Part {chunk_number}/{chunk_count}:
+    {transcript_text}
+    
+    Provide concise notes for this part as bullet points, followed by any important quotes.
+    """)
+
+# Prompt template that merges the part notes of a long transcript into one summary
+COMBINE_SUMMARY_PROMPT = ChatPromptTemplate.from_template("""
+    You are an expert content summarizer. The notes below were written for consecutive parts of one YouTube video transcript.
+    Parts overlap slightly, so the same point may appear twice.
+    
+    Topic Focus: {topic_focus}
+    
+    Instructions:
+    1. Merge the notes into a single summary of the whole video, in order
+    2. Remove duplicated points caused by the overlap
+    3. Preserve all important information and key insights
+    4. Focus on content relevant to: {topic_focus}
+    5. Create a readable, professional summary
+    
+    Video URL: {video_url}
+    
+    Part Notes:
+    {chunk_summaries}
+    
+    Please provide a well-structured summary in the following format:
+    
+    ## Video Summary
+    
+    ### Key Points:
+    - [Main points in bullet format]
+    
+    ### Detailed Summary:
+    [Organized narrative summary with clear paragraphs]
+    
+    ### Important Quotes:
+    [Any significant quotes that add value]
+    
+    ### Relevance to Topic:
+    [How this content relates to the topic focus]
+    """)
+
+def summary_cache_key(transcript_text: str, topic_focus: str) -> str:
+    """Hash everything that determines a summary: transcript, topic, prompt version and model."""
+    digest = hashlib.sha256()
+    for part in (transcript_text, topic_focus, SUMMARY_PROMPT_VERSION, os.getenv("LLM_DEPLOYMENT_NAME", "")):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def create_summary_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Synchronous version of create_summary_node_async."""
+    return run_sync(create_summary_node_async(state))
+
+async def create_summary_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Node function that creates clean summaries from transcripts.
+
+    Summaries already produced for the same transcript, topic, prompt version
+    and model are read from the summary cache. The remaining transcripts are
+    summarized concurrently under the LLM rate limits from tools.llm_batch;
+    each video succeeds or fails on its own.
+    """
+    
+    llm = get_chat_model()
     
     transcripts = state.get('transcripts', {})
-    summaries = {}
     topic_focus = state.get('topic_focus', 'general content')
     
     if not transcripts:
@@ -69,55 +156,12 @@ def create_summary_node(state: Dict[str, Any]) -> Dict[str, Any]:
     
     try:
         print(f"Creating summaries for {len(transcripts)} transcripts...")
+
+        summaries = await summarize_transcripts(transcripts, topic_focus, llm, LLMRateLimiter())
         
-        for video_url, transcript_data in transcripts.items():
-            try:
-                # Extract transcript text
-                if isinstance(transcript_data, dict):
-                    transcript_text = transcript_data.get('transcript', '')
-                   # video_title = transcript_data.get('title', 'Unknown Title')
-                else:
-                    transcript_text = str(transcript_data)
-                    #video_title = 'Unknown Title'
-                
-                if not transcript_text or len(transcript_text.strip()) < 50:
-                    print(f"Skipping video {video_url} - insufficient transcript content")
-                    continue
-                
-                # Format the prompt
-                formatted_prompt = summary_prompt.format(
-                    topic_focus=topic_focus,
-                  #  video_title=video_title,
-                    video_url=video_url,
-                    transcript_text=transcript_text[:15000]  # Limit length to avoid token limits
-                )
-                
-                # Generate summary
-                print(f"Generating summary for: {video_url}")
-                response = llm.invoke(formatted_prompt)
-                
-                summaries[video_url] = {
-              #      'video_title': video_title,
-                    'video_url': video_url,
-                    'summary': response.content,
-                    'original_transcript_length': len(transcript_text),
-                    'summary_length': len(response.content),
-                    'topic_focus': topic_focus
-                }
-                
-                print(f"✓ Summary created for: {video_url}")
-                
-            except Exception as e:
-                print(f"Error summarizing video {video_url}: {str(e)}")
-                summaries[video_url] = {
-               #     'video_title': video_title,
-                    'video_url': video_url,
-                    'summary': f"Error creating summary: {str(e)}",
-                    'error': True
-                }
-                continue
-        
-        print(f"Successfully created {len([s for s in summaries.values() if not s.get('error')])} summaries")
+        completed = [key for key, s in summaries.items() if not s.get('error')]
+        print(f"Successfully created {len(completed)} summaries")
+        await asyncio.to_thread(mark_completed, state.get('run_id'), "summary", completed)
         
         return {
             "summaries": summaries,
@@ -130,4 +174,116 @@ def create_summary_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "summaries": {},
             "current_step": "summary_failed", 
             "errors": state.get('errors', []) + [str(e)]
-        }
\ No newline at end of file
+        }
+
+async def summarize_transcripts(
+    transcripts: Dict[str, Any],
+    topic_focus: str,
+    llm: Any,
+    limiter: LLMRateLimiter,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Summarize transcripts keyed by video, reusing cached summaries where possible.
+
+    Returns one entry per summarizable transcript; failed videos get an entry
+    with 'error': True. Transcripts too short to summarize are skipped.
+    """
+    summaries = {}
+    candidates = []  # (video_url, transcript_text, cache_key)
+    for video_url, transcript_data in transcripts.items():
+        # Extract transcript text
+        if isinstance(transcript_data, dict):
+            transcript_text = transcript_data.get('transcript', '')
+        else:
+            transcript_text = str(transcript_data)
+        
+        if not transcript_text or len(transcript_text.strip()) < 50:
+            print(f"Skipping video {video_url} - insufficient transcript content")
+            continue
+
+        candidates.append((video_url, transcript_text, summary_cache_key(transcript_text, topic_focus)))
+
+    # The cache lives in SQLite; keep its queries off the event loop.
+    cached = await asyncio.to_thread(get_cached_summaries, [key for _, _, key in candidates])
+    pending = []
+    for video_url, transcript_text, cache_key in candidates:
+        metrics.record_cache("summary", cache_key in cached, "database")
+        if cache_key in cached:
+            summaries[video_url] = _summary_entry(video_url, transcript_text, cached[cache_key], topic_focus)
+            summaries[video_url]['cached'] = True
+        else:
+            pending.append((video_url, transcript_text, cache_key))
+
+    if cached:
+        print(f"Reused {len(summaries)} cached summaries")
+
+    responses = await asyncio.gather(
+        *(_summarize_text(llm, limiter, video_url, transcript_text, topic_focus)
+          for video_url, transcript_text, _ in pending),
+        return_exceptions=True
+    )
+
+    new_cache_entries = []
+    for (video_url, transcript_text, cache_key), response in zip(pending, responses):
+        if isinstance(response, Exception):
+            print(f"Error summarizing video {video_url}: {str(response)}")
+            summaries[video_url] = {
+                'video_url': video_url,
+                'summary': f"Error creating summary: {str(response)}",
+                'error': True
+            }
+            continue
+
+        summaries[video_url] = _summary_entry(video_url, transcript_text, response, topic_focus)
+        new_cache_entries.append({'cache_key': cache_key, 'video_url': video_url, 'summary': response})
+        print(f"✓ Summary created for: {video_url}")
+
+    await asyncio.to_thread(save_cached_summaries, new_cache_entries)
+    return summaries
+
+async def _summarize_text(
+    llm: Any,
+    limiter: LLMRateLimiter,
+    video_url: str,
+    transcript_text: str,
+    topic_focus: str,
+) -> str:
+    """
+    Summarize one transcript in full.
+
+    Transcripts that fit SUMMARY_CHUNK_TOKENS take a single call. Longer ones
+    are split into overlapping chunks that are summarized concurrently and
+    then merged by one combine call.
+    """
+    with metrics.timed_video(video_id_from_url(video_url), "summary"):
+        chunks = chunk_text(transcript_text, SUMMARY_CHUNK_TOKENS, SUMMARY_CHUNK_OVERLAP_TOKENS)
+        if len(chunks) <= 1:
+            prompt = SUMMARY_PROMPT.format(topic_focus=topic_focus, video_url=video_url, transcript_text=transcript_text)
+            return (await limiter.call(llm, prompt)).content
+
+        print(f"Summarizing {video_url} in {len(chunks)} chunks")
+        responses = await asyncio.gather(*(
+            limiter.call(llm, CHUNK_SUMMARY_PROMPT.format(
+                topic_focus=topic_focus,
+                video_url=video_url,
+                chunk_number=i,
+                chunk_count=len(chunks),
+                transcript_text=chunk
+            ))
+            for i, chunk in enumerate(chunks, 1)
+        ))
+        chunk_summaries = "\n\n".join(
+            f"Part {i}/{len(chunks)}:\n{response.content}" for i, response in enumerate(responses, 1)
+        )
+        prompt = COMBINE_SUMMARY_PROMPT.format(topic_focus=topic_focus, video_url=video_url, chunk_summaries=chunk_summaries)
+        return (await limiter.call(llm, prompt)).content
+
+def _summary_entry(video_url: str, transcript_text: str, summary: str, topic_focus: str) -> Dict[str, Any]:
+    """Build the per-video entry stored in state['summaries']."""
+    return {
+        'video_url': video_url,
+        'summary': summary,
+        'original_transcript_length': len(transcript_text),
+        'summary_length': len(summary),
+        'topic_focus': topic_focus
+    }
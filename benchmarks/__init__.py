@@ -0,0 +1 @@
+"""Offline benchmarks for the research pipeline; run with `python -m benchmarks.run`."""
@@ -0,0 +1,285 @@
+"""
+Offline stand-ins for the services the pipeline calls.
+A fake YouTube Data API (aiohttp), a fake YouTubeTranscriptApi and a fake chat
+model / embeddings client, each with configurable latency and error rate.
+"""
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+from langchain_core.messages import AIMessage
+
+_WORDS = (
+    "agent agents tool tools memory planner graph node state workflow prompt model "
+    "retrieval vector database tutorial example python langchain langgraph call "
+    "function output input chain step loop error retry cache stream token context"
+).split()
+
+
+def _video_id(n: int) -> str:
+    return f"bv{n:09d}"
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(count))
+
+
+class FakeYouTubeDataAPI:
+    """
+    Local HTTP server answering search.list, channels.list and playlistItems.list.
+
+    Search results are numbered per query, so a query asking for N results gets
+    N distinct videos. Runs on its own thread and event loop, because the nodes
+    under test call asyncio.run themselves.
+    """
+
+    def __init__(self, latency: float = 0.01, error_rate: float = 0.0, uploads_per_channel: int = 200, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.uploads_per_channel = uploads_per_channel
+        self.calls: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._query_offsets: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        endpoint = request.match_info["endpoint"]
+        params = dict(request.query)
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        await asyncio.sleep(self.latency)
+        if self._rng.random() < self.error_rate:
+            return web.json_response({"error": {"message": "backendError"}}, status=503)
+
+        if endpoint == "search" and params.get("type") == "channel":
+            return web.json_response({"items": [{"id": {"channelId": "UC" + params["q"].lstrip("@")}}]})
+        if endpoint == "search":
+            count = int(params.get("maxResults", 5))
+            offset = self._query_offsets.setdefault(params["q"], len(self._query_offsets) * 1_000_000)
+            return web.json_response({"items": [
+                {
+                    "id": {"videoId": _video_id(offset + i)},
+                    "snippet": {
+                        "title": f"{params['q']} part {i}",
+                        "channelTitle": "Benchmark Channel",
+                        "publishedAt": f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}Z",
+                    },
+                }
+                for i in range(count)
+            ]})
+        if endpoint == "channels":
+            return web.json_response({"items": [
+                {"id": params["id"], "contentDetails": {"relatedPlaylists": {"uploads": "UU" + params["id"][2:]}}}
+            ]})
+        if endpoint == "playlistItems":
+            count = int(params.get("maxResults", 50))
+            start = int(params.get("pageToken") or 0)
+            end = min(start + count, self.uploads_per_channel)
+            body: Dict[str, Any] = {"items": [
+                {
+                    "snippet": {
+                        "title": f"{_WORDS[k % len(_WORDS)]} tutorial {k}",
+                        "channelTitle": "Benchmark Channel",
+                        "publishedAt": f"2024-01-01T{23 - k // 60 % 24:02d}:{59 - k % 60:02d}:00Z",
+                        "resourceId": {"videoId": _video_id(9_000_000 + k)},
+                        "description": "",
+                    }
+                }
+                for k in range(start, end)
+            ]}
+            if end < self.uploads_per_channel:
+                body["nextPageToken"] = str(end)
+            return web.json_response(body)
+        return web.json_response({}, status=404)
+
+    def start(self) -> "FakeYouTubeDataAPI":
+        ready = threading.Event()
+
+        async def serve():
+            app = web.Application()
+            app.router.add_get("/youtube/v3/{endpoint}", self._handle)
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            self.base_url = f"http://127.0.0.1:{port}/youtube/v3"
+            ready.set()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-youtube-api", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+@dataclass
+class _FakeSnippet:
+    text: str
+
+
+@dataclass
+class _FakeTranscript:
+    video_id: str
+    language_code: str
+    is_generated: bool
+    words: int
+    latency: float
+
+    def fetch(self) -> List[_FakeSnippet]:
+        time.sleep(self.latency)
+        rng = random.Random(self.video_id)
+        # Caption lines of about ten words, sentences ending every few lines.
+        lines = []
+        for i in range(0, self.words, 10):
+            line = _words(rng, min(10, self.words - i))
+            lines.append(_FakeSnippet(line + ("." if i % 40 == 30 else "")))
+        return lines
+
+
+class _FakeTranscriptList:
+    def __init__(self, transcript: _FakeTranscript):
+        self._transcript = transcript
+
+    def find_manually_created_transcript(self, languages: List[str]) -> _FakeTranscript:
+        if self._transcript.language_code in languages and not self._transcript.is_generated:
+            return self._transcript
+        raise LookupError("no manual transcript")
+
+    def find_generated_transcript(self, languages: List[str]) -> _FakeTranscript:
+        if self._transcript.language_code in languages and self._transcript.is_generated:
+            return self._transcript
+        raise LookupError("no generated transcript")
+
+    def __iter__(self):
+        return iter([self._transcript])
+
+
+class FakeTranscriptApi:
+    """
+    Drop-in for youtube_transcript_api.YouTubeTranscriptApi.
+
+    `FakeTranscriptApi.configure(...)` sets the behaviour of every instance,
+    since get_video_transcript constructs a new client per video.
+    """
+
+    words = 3000
+    list_latency = 0.01
+    fetch_latency = 0.02
+    error_rate = 0.0
+    calls = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, words: int, list_latency: float, fetch_latency: float, error_rate: float) -> None:
+        cls.words, cls.list_latency, cls.fetch_latency, cls.error_rate = words, list_latency, fetch_latency, error_rate
+        cls.calls = 0
+
+    def __init__(self, proxy_config: Any = None, http_client: Any = None) -> None:
+        self.http_client = http_client
+
+    def list(self, video_id: str) -> _FakeTranscriptList:
+        with self._lock:
+            type(self).calls += 1
+        time.sleep(self.list_latency)
+        rng = random.Random(hashlib.sha256(video_id.encode()).digest())
+        if rng.random() < self.error_rate:
+            raise RuntimeError(f"Transcripts are disabled for {video_id}")
+        return _FakeTranscriptList(_FakeTranscript(
+            video_id=video_id,
+            language_code="en",
+            is_generated=rng.random() < 0.5,
+            words=self.words,
+            latency=self.fetch_latency,
+        ))
+
+
+@dataclass
+class FakeChatModel:
+    """
+    Async/sync chat model with fixed latency, a failure rate, and call accounting.
+
+    Raised errors look like rate limits when `rate_limit_errors` is set, so the
+    limiter's retry path is exercised.
+    """
+
+    latency: float = 0.05
+    error_rate: float = 0.0
+    output_words: int = 250
+    rate_limit_errors: bool = False
+    seed: int = 0
+    calls: int = 0
+    failures: int = 0
+    prompt_chars: int = 0
+    _rng: random.Random = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    def _respond(self, prompt: Any) -> AIMessage:
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(str(prompt))
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.failures += 1
+            words = _words(self._rng, self.output_words)
+        if failed:
+            if self.rate_limit_errors:
+                raise RuntimeError("Error code: 429 - Rate limit reached. Please retry after 1 second.")
+            raise RuntimeError("Fake model failure")
+        return AIMessage(content=f"## Video Summary\n\n### Key Points:\n- {words}")
+
+    async def ainvoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+    def invoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        time.sleep(self.latency)
+        return self._respond(prompt)
+
+
+class FakeEmbeddings:
+    """Deterministic bag-of-words embeddings, so semantic retrieval has something meaningful to rank."""
+
+    def __init__(self, dim: int = 256, latency: float = 0.01):
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % self.dim] += 1.0
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._embed(text)
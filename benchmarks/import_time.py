@@ -0,0 +1,146 @@
+"""
+Startup benchmark for the main.py subcommands.
+
+Runs `python main.py <command> --imports-only` in fresh interpreters, which
+imports exactly what the command needs and exits, and reports the median and
+best wall time above a bare interpreter start, plus the slowest top-level
+imports from `python -X importtime`.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --commands report search --repeat 10
+    python -m benchmarks.import_time --save-baseline import_baseline.json
+    python -m benchmarks.import_time --baseline import_baseline.json   # exits 1 on regression
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main_commands() -> Dict[str, List[str]]:
+    """
+    Map every main.py subcommand, read from its parser, to the arguments that only import its modules.
+
+    Required positional arguments (the batch specs file) get a placeholder;
+    --imports-only returns before they are used.
+    """
+    sys.path.insert(0, REPO_ROOT)
+    from main import build_parser
+
+    subparsers = next(action for action in build_parser()._actions if isinstance(action, argparse._SubParsersAction))
+    commands = {}
+    for name, subparser in subparsers.choices.items():
+        placeholders = [
+            "-" for action in subparser._actions
+            if not action.option_strings and action.nargs is None
+        ]
+        commands[name] = [name, *placeholders, "--imports-only"]
+    return commands
+
+
+COMMANDS = main_commands()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Import time of each main.py subcommand")
+    parser.add_argument("--commands", nargs="+", choices=list(COMMANDS), default=list(COMMANDS))
+    parser.add_argument("--repeat", type=int, default=5, help="interpreter starts per command")
+    parser.add_argument("--top", type=int, default=5, help="slowest top-level imports to list per command")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --save-baseline")
+    parser.add_argument("--save-baseline", help="save these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown versus the baseline before a command counts as a regression")
+    return parser.parse_args(argv)
+
+
+def _time_process(argv: List[str]) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, *argv], cwd=REPO_ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def _slowest_imports(command: str, top: int) -> List[Dict[str, Any]]:
+    """Top-level modules (imported directly by main.py's command) with the largest cumulative import time."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "main.py", *COMMANDS[command]],
+        cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # One space of indentation marks a module imported directly, not by another module.
+        if cumulative.strip().isdigit() and name.startswith(" ") and not name.startswith("  "):
+            seconds = int(cumulative) / 1e6
+            if seconds >= 0.01:  # skip the interpreter's own startup modules
+                modules.append({"module": name.strip(), "seconds": seconds})
+    return sorted(modules, key=lambda m: m["seconds"], reverse=True)[:top]
+
+
+def measure(command: str, repeat: int, interpreter_seconds: float, top: int) -> Dict[str, Any]:
+    times = [_time_process(["main.py", *COMMANDS[command]]) - interpreter_seconds for _ in range(repeat)]
+    return {
+        "command": command,
+        "median_seconds": round(statistics.median(times), 3),
+        "best_seconds": round(min(times), 3),
+        "slowest_imports": _slowest_imports(command, top),
+    }
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"{'command':<18}{'median s':>10}{'best s':>9}  slowest imports")
+    for result in results:
+        slowest = ", ".join(f"{m['module']} {m['seconds']:.2f}" for m in result["slowest_imports"])
+        print(f"{result['command']:<18}{result['median_seconds']:>10.2f}{result['best_seconds']:>9.2f}  {slowest}")
+
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return one message per command whose best time regressed beyond the tolerance."""
+    regressions = []
+    for result in results:
+        before = baseline.get(result["command"])
+        # Best-of-N is the least noisy number; ignore differences below 50ms.
+        if before and result["best_seconds"] > max(before["best_seconds"] * (1 + tolerance), before["best_seconds"] + 0.05):
+            regressions.append(f"{result['command']}: {result['best_seconds']:.2f}s vs {before['best_seconds']:.2f}s baseline")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    interpreter_seconds = min(_time_process(["-c", "pass"]) for _ in range(args.repeat))
+    print(f"Bare interpreter start: {interpreter_seconds:.3f}s (subtracted below)")
+
+    results = [measure(command, args.repeat, interpreter_seconds, args.top) for command in args.commands]
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({result["command"]: result for result in results}, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
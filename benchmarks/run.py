@@ -0,0 +1,356 @@
+"""
+Offline benchmark for the research pipeline.
+
+Drives create_workflow() end to end, or each node in turn, against the local
+stand-ins in benchmarks/fakes.py, and reports per-stage latency, throughput,
+LLM call counts and peak traced memory.
+
+    python -m benchmarks.run                                  # 10/100/1000 videos, batch workflow
+    python -m benchmarks.run --mode nodes --sizes 100
+    python -m benchmarks.run --mode async                    # the graph through app.astream
+    python -m benchmarks.run --streaming --llm-latency 0.2 --llm-error-rate 0.05
+    python -m benchmarks.run --save-baseline bench_baseline.json
+    python -m benchmarks.run --baseline bench_baseline.json  # exits 1 on regression
+
+Every size runs in a fresh subprocess with its own temporary database and
+caches, so runs are cold and independent of each other.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+from unittest import mock
+
+DEFAULT_SIZES = [10, 100, 1000]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark for the YouTube research pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="videos per run")
+    parser.add_argument("--mode", choices=["workflow", "async", "nodes"], default="workflow",
+                        help="run the compiled graph (sync or with app.astream), or call each node function in turn")
+    parser.add_argument("--streaming", action="store_true", help="benchmark the streaming workflow")
+    parser.add_argument("--api-latency", type=float, default=0.01, help="seconds per Data API request")
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--transcript-latency", type=float, default=0.02, help="seconds per transcript fetch")
+    parser.add_argument("--transcript-error-rate", type=float, default=0.0)
+    parser.add_argument("--transcript-words", type=int, default=3000)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per chat completion")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate-limit-errors", action="store_true",
+                        help="make LLM failures look like 429s so they are retried")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="skip memory tracing (it slows runs down)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --save-baseline")
+    parser.add_argument("--save-baseline", help="save these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown versus the baseline before a run counts as a regression")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def _initial_state(size: int) -> Dict[str, Any]:
+    return {
+        "query": "AI agents tutorial",
+        "channels": [],
+        "max_results_per_query": size,
+        "language": "en",
+        "topic_focus": "AI agents",
+        "use_agent": False,
+        "incremental_sync": False,
+        "video_urls": [],
+        "video_metadata": [],
+        "transcripts": {},
+        "summaries": {},
+        "storage_results": {},
+        "final_report": "",
+        "current_step": "starting",
+        "errors": [],
+        "metrics": {}
+    }
+
+
+class _StageTimer:
+    """Collects wall time, traced peak memory and LLM calls for consecutive stages."""
+
+    def __init__(self, llm, trace_memory: bool):
+        self.llm = llm
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._started = time.perf_counter()
+        self._llm_calls = 0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._llm_calls = self.llm.calls
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+    def finish(self, stage: str) -> None:
+        elapsed = time.perf_counter() - self._started
+        entry = self.stages.setdefault(stage, {"seconds": 0.0, "llm_calls": 0, "peak_mb": 0.0})
+        entry["seconds"] += elapsed
+        entry["llm_calls"] += self.llm.calls - self._llm_calls
+        if self.trace_memory:
+            entry["peak_mb"] = max(entry["peak_mb"], tracemalloc.get_traced_memory()[1] / 2**20)
+        self.start()
+
+
+def _run_workflow(args: argparse.Namespace, state: Dict[str, Any], timer: _StageTimer) -> Dict[str, Any]:
+    from graph.workflow import create_workflow
+    app = create_workflow(streaming=args.streaming)
+    final_state = dict(state)
+    timer.start()
+    # With stream_mode="updates" each node's update arrives as soon as it finishes.
+    for update in app.stream(state, stream_mode="updates"):
+        for node, values in update.items():
+            timer.finish(node)
+            final_state.update(values or {})
+    return final_state
+
+
+def _run_workflow_async(args: argparse.Namespace, state: Dict[str, Any], timer: _StageTimer) -> Dict[str, Any]:
+    from graph.workflow import create_workflow
+    app = create_workflow(streaming=args.streaming)
+    final_state = dict(state)
+
+    async def run() -> None:
+        timer.start()
+        async for update in app.astream(state, stream_mode="updates"):
+            for node, values in update.items():
+                timer.finish(node)
+                final_state.update(values or {})
+
+    asyncio.run(run())
+    return final_state
+
+
+def _run_nodes(args: argparse.Namespace, state: Dict[str, Any], timer: _StageTimer) -> Dict[str, Any]:
+    from agents.search_agent import search_video_node
+    from agents.extract_transcript_agent import extract_transcripts_node
+    from agents.summary_agent import create_summary_node
+    from agents.store_agents import storage_node
+    from agents.final_report_agent import final_report_node
+    from agents.pipeline_agent import stream_videos_node
+    from tools.metrics import instrument_node
+
+    if args.streaming:
+        nodes = [("search", search_video_node), ("stream_videos", stream_videos_node), ("final_report", final_report_node)]
+    else:
+        nodes = [
+            ("search", search_video_node),
+            ("extract_transcript", extract_transcripts_node),
+            ("summarize", create_summary_node),
+            ("store", storage_node),
+            ("final_report", final_report_node),
+        ]
+    state = dict(state)
+    timer.start()
+    for name, node in nodes:
+        state.update(instrument_node(name, node)(state))
+        timer.finish(name)
+    return state
+
+
+def run_single(args: argparse.Namespace, size: int) -> Dict[str, Any]:
+    """Run one benchmark in this process. Expects to be started in an empty working directory."""
+    from benchmarks.fakes import FakeYouTubeDataAPI, FakeTranscriptApi, FakeChatModel, FakeEmbeddings
+    from tools.config import disable_dotenv
+
+    # load_config would let a developer's .env override the settings below.
+    disable_dotenv()
+    api = FakeYouTubeDataAPI(latency=args.api_latency, error_rate=args.api_error_rate).start()
+    os.environ["YOUTUBE_API_BASE_URL"] = api.base_url
+    os.environ["YOUTUBE_API_KEY"] = "benchmark"
+    # Benchmark the pipeline, not the default Azure quota.
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+    FakeTranscriptApi.configure(
+        words=args.transcript_words,
+        list_latency=args.transcript_latency / 2,
+        fetch_latency=args.transcript_latency / 2,
+        error_rate=args.transcript_error_rate,
+    )
+    llm = FakeChatModel(latency=args.llm_latency, error_rate=args.llm_error_rate,
+                        rate_limit_errors=args.llm_rate_limit_errors)
+    embeddings = FakeEmbeddings()
+
+    # Modules read their configuration at import time, so import them only now.
+    import graph.workflow  # noqa: F401  imports every node module outside the timed run
+    import langchain_openai
+    import youtube_transcript_api
+    import tools.llm
+    import tools.embedding_index
+    from tools.metrics import summarize_metrics
+
+    trace_memory = not args.no_tracemalloc
+    if trace_memory:
+        tracemalloc.start()
+    timer = _StageTimer(llm, trace_memory)
+    output = io.StringIO()
+    started = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            # Every node gets its chat model from the shared registry in tools.llm.
+            stack.enter_context(mock.patch.object(langchain_openai, "AzureChatOpenAI", lambda **kwargs: llm))
+            stack.callback(tools.llm.reset_clients)
+            tools.llm.reset_clients()
+            stack.enter_context(mock.patch.object(youtube_transcript_api, "YouTubeTranscriptApi", FakeTranscriptApi))
+            stack.enter_context(mock.patch.object(tools.embedding_index, "get_embeddings", lambda: embeddings))
+            if not args.verbose:
+                stack.enter_context(contextlib.redirect_stdout(output))
+            run = {"nodes": _run_nodes, "async": _run_workflow_async}.get(args.mode, _run_workflow)
+            final_state = run(args, _initial_state(size), timer)
+    finally:
+        total_seconds = time.perf_counter() - started
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20 if trace_memory else None
+        api.stop()
+
+    stored = (final_state.get("storage_results") or {}).get("stored_count", 0)
+    run_metrics = summarize_metrics(final_state.get("metrics", {}))
+    return {
+        "size": size,
+        "mode": args.mode,
+        "streaming": args.streaming,
+        "total_seconds": round(total_seconds, 3),
+        "videos_per_second": round(stored / total_seconds, 2) if total_seconds else None,
+        "videos_found": len(final_state.get("video_urls", [])),
+        "transcripts": len(final_state.get("transcripts", {})),
+        "summaries": len([s for s in final_state.get("summaries", {}).values() if not s.get("error")]),
+        "stored": stored,
+        "llm_calls": llm.calls,
+        "llm_failures": llm.failures,
+        "data_api_calls": sum(api.calls.values()),
+        "transcript_api_calls": FakeTranscriptApi.calls,
+        "embedding_calls": embeddings.calls,
+        "llm_prompt_tokens": run_metrics["llm_prompt_tokens"],
+        "llm_completion_tokens": run_metrics["llm_completion_tokens"],
+        "cache_hit_rates": run_metrics["cache_hit_rates"],
+        "peak_mb": round(peak_mb, 1) if peak_mb is not None else None,
+        "errors": len(final_state.get("errors", [])),
+        "final_step": final_state.get("current_step"),
+        "stages": {
+            name: {key: round(value, 3) if isinstance(value, float) else value for key, value in stage.items()}
+            for name, stage in timer.stages.items()
+        },
+    }
+
+
+def _run_in_subprocess(argv: List[str], size: int) -> Dict[str, Any]:
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory(prefix="yt-bench-") as workdir:
+        result_file = os.path.join(workdir, "result.json")
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")]))}
+        for name in ("YOUTUBE_RESEARCH_DB", "TRANSCRIPT_CACHE_PATH"):
+            env.pop(name, None)  # keep the run inside its temporary directory
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", *argv, "--single", str(size), "--result-file", result_file],
+            cwd=workdir, env=env,
+        )
+        if completed.returncode != 0 or not os.path.exists(result_file):
+            raise RuntimeError(f"Benchmark run for {size} videos failed (exit code {completed.returncode})")
+        with open(result_file) as f:
+            return json.load(f)
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return f"{result['mode']}{'-streaming' if result['streaming'] else ''}-{result['size']}"
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"{'run':<24}{'total s':>9}{'videos/s':>10}{'stored':>8}{'LLM calls':>11}{'API calls':>11}{'peak MB':>9}")
+    for result in results:
+        print(f"{_key(result):<24}{result['total_seconds']:>9.2f}{result['videos_per_second'] or 0:>10.1f}"
+              f"{result['stored']:>8}{result['llm_calls']:>11}{result['data_api_calls']:>11}"
+              f"{result['peak_mb'] if result['peak_mb'] is not None else '-':>9}")
+        for name, stage in result["stages"].items():
+            print(f"    {name:<20}{stage['seconds']:>9.2f}{'':>10}{'':>8}{stage['llm_calls']:>11}{'':>11}"
+                  f"{stage['peak_mb'] if result['peak_mb'] is not None else '-':>9}")
+
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return one message per regression: slower beyond the tolerance, or more LLM or API calls."""
+    regressions = []
+    for result in results:
+        before = baseline.get(_key(result))
+        if not before:
+            continue
+        if result["total_seconds"] > before["total_seconds"] * (1 + tolerance):
+            regressions.append(f"{_key(result)}: {result['total_seconds']:.2f}s vs {before['total_seconds']:.2f}s baseline")
+        for counter in ("llm_calls", "data_api_calls", "transcript_api_calls"):
+            if result[counter] > before.get(counter, result[counter]):
+                regressions.append(f"{_key(result)}: {counter} {result[counter]} vs {before[counter]} baseline")
+        for name, stage in result["stages"].items():
+            before_stage = before.get("stages", {}).get(name)
+            # Ignore stages too short to time reliably.
+            if before_stage and before_stage["seconds"] > 0.05 and \
+                    stage["seconds"] > before_stage["seconds"] * (1 + tolerance):
+                regressions.append(f"{_key(result)} {name}: {stage['seconds']:.2f}s vs {before_stage['seconds']:.2f}s baseline")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.single is not None:
+        result = run_single(args, args.single)
+        with open(args.result_file, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    child_argv = _child_argv(args)
+    results = []
+    for size in args.sizes:
+        print(f"Running {args.mode}{' (streaming)' if args.streaming else ''} benchmark with {size} videos...")
+        results.append(_run_in_subprocess(child_argv, size))
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({_key(result): result for result in results}, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+def _child_argv(args: argparse.Namespace) -> List[str]:
+    """Options each benchmark run needs; sizes, output and baseline handling stay in the parent."""
+    argv = [
+        "--mode", args.mode,
+        "--api-latency", str(args.api_latency),
+        "--api-error-rate", str(args.api_error_rate),
+        "--transcript-latency", str(args.transcript_latency),
+        "--transcript-error-rate", str(args.transcript_error_rate),
+        "--transcript-words", str(args.transcript_words),
+        "--llm-latency", str(args.llm_latency),
+        "--llm-error-rate", str(args.llm_error_rate),
+    ]
+    for flag in ("streaming", "llm_rate_limit_errors", "no_tracemalloc", "verbose"):
+        if getattr(args, flag):
+            argv.append("--" + flag.replace("_", "-"))
+    return argv
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+Batch research: many query specs in one process.
+Every spec is searched, then each unique video is transcribed once and summarized
+once per topic focus, however many specs found it, on shared clients, caches and
+one global concurrency cap. Each video is stored once; each spec then gets a
+report over its own videos.
+"""
+
+import os
+import re
+import json
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+from tools.config import load_config
+from tools.async_utils import run_sync
+
+load_config()
+
+# Upper bound on concurrent transcript fetches, LLM requests and searches across the whole batch.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+SPEC_DEFAULTS = {
+    "channels": [],
+    "max_results_per_query": 5,
+    "language": "en",
+    "topic_focus": "general content",
+}
+
+
+def load_specs(path: str) -> List[Dict[str, Any]]:
+    """
+    Read query specs from a JSON list or a JSON-lines file.
+
+    A spec takes the workflow's input fields (query, channels,
+    max_results_per_query, language, topic_focus) plus an optional unique
+    `name` for its report; missing fields get SPEC_DEFAULTS.
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        raw_specs = json.loads(text)
+    else:
+        raw_specs = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return normalize_specs(raw_specs)
+
+
+def normalize_specs(raw_specs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill in defaults and names, and reject specs that cannot be searched."""
+    specs, names = [], set()
+    for i, raw in enumerate(raw_specs, 1):
+        if not raw.get("query") and not raw.get("channels"):
+            raise ValueError(f"Spec {i} needs a query or channels: {raw}")
+        spec = {**SPEC_DEFAULTS, "query": "", **raw}
+        spec["name"] = spec.get("name") or spec["query"] or ",".join(spec["channels"])
+        if spec["name"] in names:
+            raise ValueError(f"Spec {i} repeats the name {spec['name']!r}; give it a distinct 'name'")
+        names.add(spec["name"])
+        specs.append(spec)
+    return specs
+
+
+def _report_filename(name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", name).strip("_") or "report"
+
+
+# ----- PHASES -----
+# Each phase takes the batch state and returns its updates, like a graph node,
+# so run_batch can instrument them with tools.metrics.
+
+def search_phase(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Search every spec on one pooled session, at most max_concurrency searches at a time."""
+    from tools.youtube_search_tool import youtube_search_function_async, create_youtube_session
+    from tools.video_store import save_videos
+    from tools.youtube_trancript import extract_video_id
+
+    specs = state["specs"]
+    semaphore = asyncio.Semaphore(state["max_concurrency"])
+
+    async def search_all() -> List[str]:
+        async with create_youtube_session(state["max_concurrency"]) as session:
+            async def search(spec):
+                async with semaphore:
+                    return await youtube_search_function_async(
+                        query=spec["query"],
+                        channels=spec["channels"] or None,
+                        max_results_per_query=spec["max_results_per_query"],
+                        session=session,
+                        incremental=spec.get("incremental_sync", False),
+                    )
+            return await asyncio.gather(*(search(spec) for spec in specs))
+
+    results, errors, videos, sync_marks = {}, [], {}, []
+    for spec, tool_output in zip(specs, run_sync(search_all())):
+        search_data = json.loads(tool_output)
+        sync_marks.extend(search_data.get("sync_marks", []))
+        if search_data.get("error"):
+            errors.append(f"Search failed for {spec['name']}: {search_data['error']}")
+        video_ids = []
+        for video in search_data.get("videos", []):
+            video_id = video.get("video_id") or extract_video_id(video.get("url"))
+            if video_id and video_id not in video_ids:
+                video_ids.append(video_id)
+                videos.setdefault(video_id, video)
+        results[spec["name"]] = {"video_ids": video_ids}
+
+    try:
+        save_videos(videos.values())
+    except Exception as e:
+        print(f"Error saving video metadata: {str(e)}")
+
+    found = sum(len(result["video_ids"]) for result in results.values())
+    print(f"Searched {len(specs)} specs: {found} videos, {len(videos)} unique")
+    return {"results": results, "videos": videos, "sync_marks": sync_marks, "errors": state["errors"] + errors}
+
+
+def transcript_phase(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Fetch each unique (video, language) transcript once, over one global worker pool."""
+    from tools.youtube_trancript import fetch_transcripts_concurrently
+
+    wanted: Dict[str, List[str]] = {}  # language -> unique video ids
+    for spec in state["specs"]:
+        ids = wanted.setdefault(spec["language"], [])
+        ids.extend(i for i in state["results"][spec["name"]]["video_ids"] if i not in ids)
+
+    transcripts, errors = {}, []
+    for language, video_ids in wanted.items():
+        urls = [state["videos"][video_id]["url"] for video_id in video_ids]
+        for outcome in fetch_transcripts_concurrently(urls, language, max_workers=state["max_concurrency"]):
+            if "error" in outcome:
+                errors.append(outcome["error"])
+            else:
+                outcome.pop("from_cache", None)
+                transcripts[(outcome["video_id"], language)] = outcome
+
+    print(f"Fetched {len(transcripts)} unique transcripts ({len(errors)} failed)")
+    return {"transcripts": transcripts, "errors": state["errors"] + errors}
+
+
+def summary_phase(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Summarize each unique (video, language, topic focus) once, all under one shared LLM limiter."""
+    from agents.summary_agent import summarize_transcripts
+    from tools.llm import get_chat_model
+    from tools.llm_batch import LLMRateLimiter
+
+    # Summaries are keyed by watch URL, like everywhere else in the pipeline.
+    groups: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (language, topic_focus) -> {video_url: transcript}
+    url_to_id = {}
+    for spec in state["specs"]:
+        group = groups.setdefault((spec["language"], spec["topic_focus"]), {})
+        for video_id in state["results"][spec["name"]]["video_ids"]:
+            transcript = state["transcripts"].get((video_id, spec["language"]))
+            if transcript:
+                url = state["videos"][video_id]["url"]
+                url_to_id[url] = video_id
+                group[url] = transcript
+
+    llm = get_chat_model()
+    limiter = LLMRateLimiter(max_concurrency=state["max_concurrency"])
+
+    async def summarize_all():
+        return await asyncio.gather(*(
+            summarize_transcripts(transcripts, topic_focus, llm, limiter)
+            for (_, topic_focus), transcripts in groups.items()
+        ))
+
+    summaries = {}
+    for (language, topic_focus), group_summaries in zip(groups, run_sync(summarize_all())):
+        for video_url, summary in group_summaries.items():
+            summaries[(url_to_id[video_url], language, topic_focus)] = summary
+
+    failed = sum(1 for summary in summaries.values() if summary.get("error"))
+    print(f"Summarized {len(summaries)} unique video/topic pairs ({failed} failed)")
+    return {"summaries": summaries}
+
+
+def store_phase(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Store one summary per video, and embed the new ones.
+
+    The summaries table holds a single row per video, so a video summarized for
+    several topic focuses is stored with the first spec that found it; the other
+    topics' summaries are only used for their specs' reports.
+    """
+    from agents.store_agents import store_summaries
+    from tools.embedding_index import index_summaries
+    from tools.channel_index import commit_sync_marks
+    from tools.database import video_id_from_url
+
+    stored, errors, seen, stored_ids = 0, [], set(), set()
+    for spec in state["specs"]:
+        own = {}
+        for video_id in state["results"][spec["name"]]["video_ids"]:
+            summary = state["summaries"].get((video_id, spec["language"], spec["topic_focus"]))
+            if summary and not summary.get("error") and video_id not in seen:
+                seen.add(video_id)
+                own[summary["video_url"]] = summary
+        if own:
+            count, store_errors = store_summaries(own, spec["query"], spec["topic_focus"])
+            stored += count
+            if count:
+                stored_ids.update(video_id_from_url(url) for url in own)
+            errors.extend(store_errors)
+            try:
+                index_summaries(own)
+            except Exception as e:
+                errors.append(f"Error embedding summaries: {str(e)}")
+
+    # Incremental sync marks move only over videos that are now stored.
+    commit_sync_marks(state["sync_marks"], stored_ids)
+
+    print(f"✓ Stored {stored} summaries in database")
+    return {"stored_count": stored, "errors": state["errors"] + errors}
+
+
+def report_phase(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Write one report per spec from that spec's own summaries, all under one shared LLM limiter."""
+    from agents.final_report_agent import generate_report, save_report
+    from tools.llm import get_chat_model
+    from tools.llm_batch import LLMRateLimiter
+
+    llm = get_chat_model()
+    limiter = LLMRateLimiter(max_concurrency=state["max_concurrency"])
+    jobs = []
+    for spec in state["specs"]:
+        own = []
+        for video_id in state["results"][spec["name"]]["video_ids"]:
+            summary = state["summaries"].get((video_id, spec["language"], spec["topic_focus"]))
+            if summary and not summary.get("error"):
+                own.append({
+                    "video_url": state["videos"][video_id]["url"],
+                    "video_title": state["videos"][video_id].get("title") or "Unknown Title",
+                    "summary": summary["summary"],
+                })
+        jobs.append((spec, own))
+
+    async def report_all():
+        return await asyncio.gather(*(
+            generate_report(llm, own, spec["query"], spec["topic_focus"], limiter=limiter)
+            for spec, own in jobs if own
+        ), return_exceptions=True)
+
+    results = {name: dict(result) for name, result in state["results"].items()}
+    errors = []
+    reports = iter(run_sync(report_all()))
+    for spec, own in jobs:
+        result = results[spec["name"]]
+        result["sources_used"] = len(own)
+        if not own:
+            result["report"] = ""
+            errors.append(f"No summaries for {spec['name']}; no report generated")
+            continue
+        report = next(reports)
+        if isinstance(report, Exception):
+            result["report"] = ""
+            errors.append(f"Error generating report for {spec['name']}: {str(report)}")
+            continue
+        result["report"] = report
+        save_report(spec["name"], report)
+
+    return {"results": results, "errors": state["errors"] + errors}
+
+
+BATCH_PHASES = [
+    ("search", search_phase),
+    ("extract_transcript", transcript_phase),
+    ("summarize", summary_phase),
+    ("store", store_phase),
+    ("final_report", report_phase),
+]
+
+
+def run_batch(specs: List[Dict[str, Any]], max_concurrency: Optional[int] = None,
+              output_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run many research specs in one process.
+
+    Returns {'results': {spec name: {'video_ids', 'report', 'sources_used'}},
+    'unique_videos', 'errors', 'metrics'}. With `output_dir`, each report is
+    also written there as <name>.md.
+    """
+    from tools.metrics import instrument_node
+
+    state: Dict[str, Any] = {
+        "specs": normalize_specs(specs),
+        "max_concurrency": max(1, max_concurrency or BATCH_MAX_CONCURRENCY),
+        "errors": [],
+        "metrics": {},
+    }
+    for name, phase in BATCH_PHASES:
+        state.update(instrument_node(name, phase)(state))
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        for name, result in state["results"].items():
+            if result.get("report"):
+                with open(os.path.join(output_dir, _report_filename(name) + ".md"), "w", encoding="utf-8") as f:
+                    f.write(result["report"])
+
+    return {
+        "results": state["results"],
+        "unique_videos": len(state["videos"]),
+        "errors": state["errors"],
+        "metrics": state["metrics"],
+    }
@@ -0,0 +1,85 @@
+"""
+Checkpointing for resumable workflow runs.
+Graph checkpoints live in youtube_research.db next to the research data.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, List, Optional
+from langgraph.checkpoint.sqlite import SqliteSaver
+from tools.database import DB_PATH, BUSY_TIMEOUT_MS, connect
+
+
+def create_checkpointer(db_path: str = DB_PATH) -> SqliteSaver:
+    """Create a SQLite checkpointer that stores graph checkpoints in the research database."""
+    # SqliteSaver serializes access to its connection itself.
+    conn = connect(db_path, check_same_thread=False)
+    return SqliteSaver(conn)
+
+
+@asynccontextmanager
+async def open_async_checkpointer(db_path: str = DB_PATH) -> AsyncIterator[Any]:
+    """
+    Open the checkpointer for runs started with app.ainvoke/astream.
+
+    SqliteSaver only works with the sync graph API; this uses the same tables
+    through aiosqlite, so sync and async runs can resume each other.
+    """
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    async with aiosqlite.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000) as conn:
+        await conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        await conn.execute("PRAGMA journal_mode = WAL")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        yield AsyncSqliteSaver(conn)
+
+
+def find_resume_point(app: Any, config: Dict[str, Any]) -> Optional[Any]:
+    """
+    Find the checkpoint an interrupted or failed run should resume from.
+
+    Returns the snapshot to resume from, or None when the thread has no
+    checkpoints or its last run completed cleanly. A run that was
+    interrupted resumes at its latest checkpoint. A run in which a node
+    reported a '*_failed' step resumes from the checkpoint just before the
+    first such node, so the failed stage runs again while earlier stages are kept.
+    """
+    latest = app.get_state(config)
+    if not latest.values:
+        return None
+    if latest.next:
+        return latest
+    if not str(latest.values.get('current_step', '')).endswith('_failed'):
+        return None
+
+    # Walk back to the start of the latest run, then forward to its first failure.
+    chain = [latest]
+    while chain[-1].parent_config and (chain[-1].metadata or {}).get('source') != 'input':
+        chain.append(app.get_state(chain[-1].parent_config))
+    return _before_first_failure(chain)
+
+
+async def afind_resume_point(app: Any, config: Dict[str, Any]) -> Optional[Any]:
+    """Async version of find_resume_point, for graphs compiled with the async checkpointer."""
+    latest = await app.aget_state(config)
+    if not latest.values:
+        return None
+    if latest.next:
+        return latest
+    if not str(latest.values.get('current_step', '')).endswith('_failed'):
+        return None
+
+    chain = [latest]
+    while chain[-1].parent_config and (chain[-1].metadata or {}).get('source') != 'input':
+        chain.append(await app.aget_state(chain[-1].parent_config))
+    return _before_first_failure(chain)
+
+
+def _before_first_failure(chain: List[Any]) -> Optional[Any]:
+    """Given one run's snapshots, newest first, return the one just before its first failed node."""
+    previous = None
+    for snapshot in reversed(chain):
+        if str(snapshot.values.get('current_step', '')).endswith('_failed'):
+            return previous
+        previous = snapshot
+    return None
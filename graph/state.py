@@ -1,4 +1,4 @@
-from typing import TypedDict, List, Dict, Optional, Any
+from typing import TypedDict, List, Dict, Any
 
 class YouTubeResearchState(TypedDict):  
     
@@ -8,10 +8,14 @@ class YouTubeResearchState(TypedDict):
     max_results_per_query: int
     language: str
     topic_focus: str
+    use_agent: bool  # route search/transcript tool calls through an LLM agent
+    incremental_sync: bool  # only process channel uploads newer than the last run
+    run_id: str  # checkpoint thread id; per-video progress is recorded under it
     
     # Data flow between agents
     video_urls: List[str]
     video_metadata: List[Dict[str, Any]]
+    sync_marks: List[Dict[str, Any]]  # incremental sync marks, committed once their videos are stored
     transcripts: Dict[str, Dict[str, Any]]
     summaries: Dict[str, Dict[str, Any]]
     storage_results: Dict[str, Any]
@@ -20,3 +24,4 @@ class YouTubeResearchState(TypedDict):
     # Processing status
     current_step: str
     errors: List[str]
+    metrics: Dict[str, Any]  # cumulative run metrics recorded by tools.metrics (timings, calls, tokens, cache hits)
@@ -1,24 +1,63 @@
 # Updated graph/workflow.py
 from langgraph.graph import StateGraph, END
-from typing import Dict, Any
+from langchain_core.runnables import RunnableLambda
+from typing import Dict, Any, Callable, Awaitable
 from graph.state import YouTubeResearchState
-from agents.search_agent import search_video_node
-from agents.extract_transcript_agent import extract_transcripts_node
-from agents.summary_agent import create_summary_node
-from agents.store_agents import storage_node
-from agents.final_report_agent import final_report_node
-
-def create_workflow():
-    """Create the workflow for YouTube multi-agent system."""
+from agents.search_agent import search_video_node, search_video_node_async
+from agents.extract_transcript_agent import extract_transcripts_node, extract_transcripts_node_async
+from agents.summary_agent import create_summary_node, create_summary_node_async
+from agents.store_agents import storage_node, storage_node_async
+from agents.final_report_agent import final_report_node, final_report_node_async
+from agents.pipeline_agent import stream_videos_node, stream_videos_node_async
+from tools.metrics import instrument_node
+
+def graph_node(name: str, node: Callable[[Dict[str, Any]], Dict[str, Any]],
+               node_async: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]) -> RunnableLambda:
+    """An instrumented graph node that runs `node` under app.invoke and `node_async` under app.ainvoke/astream."""
+    return RunnableLambda(instrument_node(name, node), afunc=instrument_node(name, node_async), name=name)
+
+def create_workflow(streaming: bool = False, checkpointer=None):
+    """
+    Create the workflow for YouTube multi-agent system.
+
+    With `streaming=True`, transcript extraction, summarization and storage run
+    as one pipelined stage (search -> stream_videos -> final_report), so each
+    video is stored as soon as it is summarized instead of waiting for the
+    whole batch at every step.
+
+    Pass a checkpointer (see graph.checkpoint.create_checkpointer) to make runs
+    resumable; the graph is then invoked with a thread_id in its config.
+    Runs started with app.ainvoke/astream need the async checkpointer from
+    graph.checkpoint.open_async_checkpointer.
+
+    Every node has a sync and an async version: app.invoke keeps the original
+    behaviour, while app.ainvoke/astream run all nodes on the caller's event
+    loop, so the pipeline can be embedded in async services.
+
+    Every node is wrapped with tools.metrics.instrument_node, so the final
+    state carries the run's timings, call counts, tokens and cache hit rates
+    in state['metrics'].
+    """
     
     workflow = StateGraph(YouTubeResearchState)
+
+    if streaming:
+        workflow.add_node("search", graph_node("search", search_video_node, search_video_node_async))
+        workflow.add_node("stream_videos", graph_node("stream_videos", stream_videos_node, stream_videos_node_async))
+        workflow.add_node("final_report", graph_node("final_report", final_report_node, final_report_node_async))
+
+        workflow.set_entry_point("search")
+        workflow.add_edge("search", "stream_videos")
+        workflow.add_edge("stream_videos", "final_report")
+        workflow.add_edge("final_report", END)
+        return workflow.compile(checkpointer=checkpointer)
     
     # Add nodes/agents
-    workflow.add_node("search", search_video_node)
-    workflow.add_node("extract_transcript", extract_transcripts_node)
-    workflow.add_node("summarize", create_summary_node)
-    workflow.add_node("store", storage_node)
-    workflow.add_node("final_report", final_report_node)
+    workflow.add_node("search", graph_node("search", search_video_node, search_video_node_async))
+    workflow.add_node("extract_transcript", graph_node("extract_transcript", extract_transcripts_node, extract_transcripts_node_async))
+    workflow.add_node("summarize", graph_node("summarize", create_summary_node, create_summary_node_async))
+    workflow.add_node("store", graph_node("store", storage_node, storage_node_async))
+    workflow.add_node("final_report", graph_node("final_report", final_report_node, final_report_node_async))
     
     # Set entry point
     workflow.set_entry_point("search")
@@ -30,4 +69,4 @@ def create_workflow():
     workflow.add_edge("store", "final_report")
     workflow.add_edge("final_report", END)
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
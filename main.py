@@ -1,42 +1,398 @@
-from graph.workflow import create_workflow
-from graph.state import YouTubeResearchState
+"""
+Command line entry point.
 
-def run_youtube_research():
-    """
-    Main function to run the YouTube research workflow.
-    """
-    app = create_workflow()
-    
-    initial_state = {
-        "query": "AI agents tutorial",
-        "channels": ["@LangChain"],
-        "max_results_per_query": 1,
-        "language": "en",
-       # "topic_focus": "AI agents",
+    python main.py                                   # full research run with the default inputs
+    python main.py run --query "AI agents tutorial" --channels @LangChain --streaming
+    python main.py run --async                       # every node on one event loop (app.ainvoke)
+    python main.py search --query "AI agents tutorial" --max-results 5
+    python main.py transcripts https://www.youtube.com/watch?v=...
+    python main.py summarize https://www.youtube.com/watch?v=...
+    python main.py report --query "AI agents tutorial"
+    python main.py batch specs.jsonl --output-dir reports/
+    python main.py train-dictionary                  # zstd dictionary for stored summaries
+
+Each subcommand imports only the modules it uses, so short jobs such as
+regenerating a report from the database start without loading LangGraph or the
+YouTube clients.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_QUERY = "AI agents tutorial"
+DEFAULT_CHANNELS = ["@LangChain"]
+
+
+def make_run_id(state: dict) -> str:
+    """Derive a stable run id from the research inputs, so re-running the same research resumes it."""
+    key = {k: state.get(k) for k in ("query", "channels", "max_results_per_query", "language", "topic_focus")}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def make_initial_state(
+    query: str = DEFAULT_QUERY,
+    channels: Optional[List[str]] = None,
+    max_results_per_query: int = 1,
+    language: str = "en",
+    topic_focus: Optional[str] = None,
+    use_agent: bool = False,
+    incremental_sync: bool = False,
+) -> Dict[str, Any]:
+    """Build the workflow's input state; topic_focus is left out when not given, so nodes use their defaults."""
+    state = {
+        "query": query,
+        "channels": DEFAULT_CHANNELS if channels is None else channels,
+        "max_results_per_query": max_results_per_query,
+        "language": language,
+        "use_agent": use_agent,
+        "incremental_sync": incremental_sync,
         "video_urls": [],
         "video_metadata": [],
+        "sync_marks": [],
         "transcripts": {},
         "summaries": {},
         "storage_results": {},
         "final_report": "",
         "current_step": "starting",
-        "errors": []
+        "errors": [],
+        "metrics": {}
     }
-    
+    if topic_focus:
+        state["topic_focus"] = topic_focus
+    return state
+
+def _prepare_run(run_id: Optional[str], initial_state: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    initial_state = dict(initial_state or make_initial_state())
+    initial_state["run_id"] = run_id or make_run_id(initial_state)
+    return initial_state, {"configurable": {"thread_id": initial_state["run_id"]}}
+
+def _print_resume(run_id: str, resume_point: Any, streaming: bool) -> None:
+    print(f"Resuming run {run_id} at {', '.join(resume_point.next)} "
+          f"(after '{resume_point.values.get('current_step', 'start')}')")
+    # Only the streaming node skips single videos; the batch nodes rerun whole stages.
+    if not streaming:
+        return
+    from tools.run_progress import get_progress
+    progress = get_progress(run_id)
+    print(f"Skipping completed work: "
+          f"{progress.get('transcript', 0)} transcripts, "
+          f"{progress.get('summary', 0)} summaries, "
+          f"{progress.get('store', 0)} stored videos")
+
+def _start_fresh(run_id: str) -> None:
+    # run_id is derived from the inputs, so a finished or abandoned run with the same
+    # inputs left progress behind that would otherwise make this run skip its videos.
+    from tools.run_progress import clear_progress
+    clear_progress(run_id)
+
+def _finish_run(final_state: Dict[str, Any], run_id: str) -> Dict[str, Any]:
+    from tools.metrics import summarize_metrics, export_metrics
+    print("Workflow completed!")
+    print(f"Video URLs found: {final_state.get('video_urls', [])}")
+    print(f"Current step: {final_state.get('current_step', 'unknown')}")
+    run_metrics = final_state.get('metrics', {})
+    print(f"Run metrics: {json.dumps(summarize_metrics(run_metrics), indent=2)}")
+    export_metrics(run_metrics, run_id=run_id)
+    return final_state
+
+def run_youtube_research(streaming: bool = False, run_id: str = None, resume: bool = True,
+                         initial_state: Optional[Dict[str, Any]] = None):
+    """
+    Main function to run the YouTube research workflow.
+
+    With `streaming=True` each video flows through transcript -> summary -> store
+    on its own instead of waiting for the whole batch at every step.
+
+    Runs are checkpointed in youtube_research.db under `run_id` (derived from
+    the inputs when omitted). With `resume=True`, an interrupted or failed run
+    continues from its last completed stage instead of starting over. A run
+    that starts over (finished before, or resume=False) forgets the per-video
+    progress recorded under the same run_id.
+
+    Timings, API calls, LLM tokens/cost and cache hit rates are printed at the
+    end and appended to METRICS_JSONL_PATH / written to METRICS_PROMETHEUS_PATH
+    when those are set.
+
+    From async code use arun_youtube_research or astream_youtube_research instead.
+    """
+    from graph.workflow import create_workflow
+    from graph.checkpoint import create_checkpointer, find_resume_point
+
+    app = create_workflow(streaming=streaming, checkpointer=create_checkpointer())
+    initial_state, config = _prepare_run(run_id, initial_state)
+
     print("Starting YouTube Research Workflow...")
-    
+
     try:
-        final_state = app.invoke(initial_state)
-        print("Workflow completed!")
-        print(f"Video URLs found: {final_state.get('video_urls', [])}")
-        print(f"Current step: {final_state.get('current_step', 'unknown')}")
-        return final_state
+        resume_point = find_resume_point(app, config) if resume else None
+        if resume_point is not None:
+            _print_resume(initial_state["run_id"], resume_point, streaming)
+            final_state = app.invoke(None, resume_point.config)
+        else:
+            _start_fresh(initial_state["run_id"])
+            final_state = app.invoke(initial_state, config)
+        return _finish_run(final_state, initial_state["run_id"])
     except Exception as e:
         print(f"Workflow failed: {str(e)}")
+        print(f"Re-run with run_id={initial_state['run_id']} to resume from the last completed stage.")
         return None
 
-if __name__ == "__main__":
-    result = run_youtube_research()
+@asynccontextmanager
+async def _async_app(streaming: bool, resume: bool, initial_state: Dict[str, Any],
+                     config: Dict[str, Any]) -> AsyncIterator[Tuple[Any, Any, Dict[str, Any]]]:
+    """Compile the graph with the async checkpointer; yields (app, graph input, config), resuming when possible."""
+    import asyncio
+    from graph.workflow import create_workflow
+    from graph.checkpoint import open_async_checkpointer, afind_resume_point
+
+    async with open_async_checkpointer() as checkpointer:
+        app = create_workflow(streaming=streaming, checkpointer=checkpointer)
+        resume_point = await afind_resume_point(app, config) if resume else None
+        if resume_point is not None:
+            await asyncio.to_thread(_print_resume, initial_state["run_id"], resume_point, streaming)
+            yield app, None, resume_point.config
+        else:
+            await asyncio.to_thread(_start_fresh, initial_state["run_id"])
+            yield app, initial_state, config
+
+async def arun_youtube_research(streaming: bool = False, run_id: str = None, resume: bool = True,
+                                initial_state: Optional[Dict[str, Any]] = None):
+    """
+    Async version of run_youtube_research, built on app.ainvoke.
+
+    Every node runs on the caller's event loop, so searches, LLM calls and
+    embedding requests share one loop and its pooled clients. Safe to await
+    from async services; checkpoints and resume work as in the sync version.
+    """
+    initial_state, config = _prepare_run(run_id, initial_state)
+
+    print("Starting YouTube Research Workflow...")
 
+    try:
+        async with _async_app(streaming, resume, initial_state, config) as (app, run_input, run_config):
+            final_state = await app.ainvoke(run_input, run_config)
+        return _finish_run(final_state, initial_state["run_id"])
+    except Exception as e:
+        print(f"Workflow failed: {str(e)}")
+        print(f"Re-run with run_id={initial_state['run_id']} to resume from the last completed stage.")
+        return None
+
+async def astream_youtube_research(streaming: bool = False, run_id: str = None, resume: bool = True,
+                                   initial_state: Optional[Dict[str, Any]] = None,
+                                   ) -> AsyncIterator[Dict[str, Dict[str, Any]]]:
+    """
+    Run the workflow with app.astream and yield {node name: state update} as each node finishes.
+
+    Unlike arun_youtube_research, errors propagate to the caller; metrics are
+    in the update of each node under 'metrics'.
+    """
+    initial_state, config = _prepare_run(run_id, initial_state)
+    async with _async_app(streaming, resume, initial_state, config) as (app, run_input, run_config):
+        async for update in app.astream(run_input, run_config, stream_mode="updates"):
+            yield update
+
+def run_nodes(nodes: List[Tuple[str, Callable[[Dict[str, Any]], Dict[str, Any]]]],
+              state: Dict[str, Any]) -> Dict[str, Any]:
+    """Run graph nodes one after another outside the graph, with the same metrics as a workflow run."""
+    from tools.metrics import instrument_node, summarize_metrics, export_metrics
+
+    state = dict(state)
+    state.setdefault("run_id", make_run_id(state))
+    for name, node in nodes:
+        state.update(instrument_node(name, node)(state))
+    print(f"Run metrics: {json.dumps(summarize_metrics(state['metrics']), indent=2)}")
+    export_metrics(state["metrics"], run_id=state["run_id"])
+    return state
+
+
+# ----- SUBCOMMANDS -----
+# Every command imports its modules first and stops there with --imports-only,
+# which is how benchmarks/import_time.py measures each command's startup.
+
+def _state_from_args(args: argparse.Namespace) -> Dict[str, Any]:
+    return make_initial_state(
+        query=args.query,
+        channels=args.channels,
+        max_results_per_query=args.max_results,
+        language=args.language,
+        topic_focus=args.topic_focus,
+        use_agent=args.use_agent,
+        incremental_sync=args.incremental_sync,
+    )
+
+def _search_or_urls(args: argparse.Namespace, nodes: list) -> Tuple[list, Dict[str, Any]]:
+    """Start from the URLs given on the command line, or search for them first."""
+    state = _state_from_args(args)
+    if args.urls:
+        state["video_urls"] = args.urls
+        return nodes, state
+    from agents.search_agent import search_video_node
+    return [("search", search_video_node)] + nodes, state
+
+def cmd_run(args: argparse.Namespace) -> int:
+    import graph.workflow  # noqa: F401  loaded here so --imports-only covers it
+    import graph.checkpoint  # noqa: F401
+    if args.imports_only:
+        return 0
+    options = dict(
+        streaming=args.streaming, run_id=args.run_id, resume=not args.no_resume, initial_state=_state_from_args(args)
+    )
+    if args.use_async:
+        import asyncio
+        final_state = asyncio.run(arun_youtube_research(**options))
+    else:
+        final_state = run_youtube_research(**options)
+    return 0 if final_state is not None else 1
+
+def cmd_search(args: argparse.Namespace) -> int:
+    from agents.search_agent import search_video_node
+    if args.imports_only:
+        return 0
+    state = run_nodes([("search", search_video_node)], _state_from_args(args))
+    print(json.dumps(state["video_metadata"] or state["video_urls"], indent=2))
+    return 0 if state["video_urls"] else 1
 
-    
\ No newline at end of file
+def cmd_transcripts(args: argparse.Namespace) -> int:
+    from agents.extract_transcript_agent import extract_transcripts_node
+    if args.imports_only:
+        return 0
+    nodes, state = _search_or_urls(args, [("extract_transcript", extract_transcripts_node)])
+    state = run_nodes(nodes, state)
+    print(json.dumps({
+        video_id: {"language": t.get("language"), "word_count": t.get("word_count")}
+        for video_id, t in state["transcripts"].items()
+    }, indent=2))
+    return 0 if state["transcripts"] else 1
+
+def cmd_summarize(args: argparse.Namespace) -> int:
+    from agents.extract_transcript_agent import extract_transcripts_node
+    from agents.summary_agent import create_summary_node
+    from agents.store_agents import storage_node
+    if args.imports_only:
+        return 0
+    nodes, state = _search_or_urls(args, [
+        ("extract_transcript", extract_transcripts_node),
+        ("summarize", create_summary_node),
+        ("store", storage_node),
+    ])
+    state = run_nodes(nodes, state)
+    print(f"Stored summaries: {state['storage_results'].get('stored_count', 0)}")
+    return 0 if state["summaries"] else 1
+
+def cmd_report(args: argparse.Namespace) -> int:
+    from agents.final_report_agent import final_report_node
+    if args.imports_only:
+        return 0
+    state = run_nodes([("final_report", final_report_node)], _state_from_args(args))
+    if not state["final_report"]:
+        print(f"No report generated: {state['errors']}")
+        return 1
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(state["final_report"])
+        print(f"Report written to {args.output}")
+    else:
+        print(state["final_report"])
+    return 0
+
+def cmd_train_dictionary(args: argparse.Namespace) -> int:
+    from tools.compression import train_dictionary, decode_text
+    from tools.database import get_connection
+    if args.imports_only:
+        return 0
+    conn = get_connection()
+    samples = [decode_text(row[0]) for table in ("summaries", "summary_cache") for row in conn.execute(
+        f"SELECT summary FROM {table} ORDER BY created_at DESC LIMIT ?", (args.samples,)
+    )]
+    try:
+        dict_id = train_dictionary(samples)
+    except Exception as e:
+        print(f"Could not train a dictionary from {len(samples)} summaries: {str(e)}")
+        return 1
+    print(f"Trained compression dictionary {dict_id} from {len(samples)} summaries; new values are compressed with it")
+    return 0
+
+def cmd_batch(args: argparse.Namespace) -> int:
+    from graph.batch import load_specs, run_batch
+    from tools.metrics import summarize_metrics, export_metrics
+    if args.imports_only:
+        return 0
+    specs = load_specs(args.specs)
+    print(f"Running {len(specs)} research specs in one batch...")
+    outcome = run_batch(specs, max_concurrency=args.max_concurrency, output_dir=args.output_dir)
+    for name, result in outcome["results"].items():
+        print(f"{name}: {len(result['video_ids'])} videos, report from {result.get('sources_used', 0)} summaries")
+    print(f"Unique videos processed: {outcome['unique_videos']}")
+    for error in outcome["errors"]:
+        print(f"  error: {error}")
+    print(f"Run metrics: {json.dumps(summarize_metrics(outcome['metrics']), indent=2)}")
+    export_metrics(outcome["metrics"], run_id=f"batch:{os.path.basename(args.specs)}")
+    return 0 if all(result.get("report") for result in outcome["results"].values()) else 1
+
+def build_parser() -> argparse.ArgumentParser:
+    inputs = argparse.ArgumentParser(add_help=False)
+    inputs.add_argument("--query", default=DEFAULT_QUERY, help="search query (default: %(default)s)")
+    inputs.add_argument("--channels", nargs="*", default=None, help="channel handles to search (default: @LangChain)")
+    inputs.add_argument("--max-results", type=int, default=1, help="videos per query and channel")
+    inputs.add_argument("--language", default="en", help="preferred transcript language")
+    inputs.add_argument("--topic-focus", help="topic the summaries and report focus on")
+    inputs.add_argument("--use-agent", action="store_true", help="route search/transcript calls through an LLM agent")
+    inputs.add_argument("--incremental-sync", action="store_true", help="only process uploads newer than the last run")
+    inputs.add_argument("--imports-only", action="store_true", help=argparse.SUPPRESS)
+
+    urls = argparse.ArgumentParser(add_help=False)
+    urls.add_argument("urls", nargs="*", help="video URLs; searches with the query options when omitted")
+
+    parser = argparse.ArgumentParser(description="YouTube research pipeline")
+    commands = parser.add_subparsers(dest="command")
+
+    run = commands.add_parser("run", parents=[inputs], help="run the full workflow (the default)")
+    run.add_argument("--streaming", action="store_true", help="pipeline transcripts, summaries and storage per video")
+    run.add_argument("--run-id", help="checkpoint id to resume; derived from the inputs when omitted")
+    run.add_argument("--no-resume", action="store_true", help="start over instead of resuming an interrupted run")
+    run.add_argument("--async", dest="use_async", action="store_true",
+                     help="run every node on one event loop with app.ainvoke")
+    run.set_defaults(handler=cmd_run)
+
+    commands.add_parser("search", parents=[inputs], help="search only and print the videos found") \
+        .set_defaults(handler=cmd_search)
+    commands.add_parser("transcripts", parents=[inputs, urls], help="fetch and store transcripts only") \
+        .set_defaults(handler=cmd_transcripts)
+    commands.add_parser("summarize", parents=[inputs, urls], help="fetch transcripts, summarize and store them") \
+        .set_defaults(handler=cmd_summarize)
+    report = commands.add_parser("report", parents=[inputs], help="regenerate the report from stored summaries")
+    report.add_argument("--output", help="write the report to this file instead of printing it")
+    report.set_defaults(handler=cmd_report)
+
+    batch = commands.add_parser("batch", help="run many query specs in one process, sharing videos between them")
+    batch.add_argument("specs", help="JSON list or JSON-lines file of specs (query, channels, max_results_per_query, "
+                                     "language, topic_focus, name)")
+    batch.add_argument("--max-concurrency", type=int, default=None,
+                       help="global cap on concurrent fetches and LLM requests (default: BATCH_MAX_CONCURRENCY or 8)")
+    batch.add_argument("--output-dir", help="also write each report to <dir>/<name>.md")
+    batch.add_argument("--imports-only", action="store_true", help=argparse.SUPPRESS)
+    batch.set_defaults(handler=cmd_batch)
+
+    train = commands.add_parser("train-dictionary",
+                                help="train a shared zstd dictionary on stored summaries (needs zstandard)")
+    train.add_argument("--samples", type=int, default=2000, help="most recent summaries to sample from each table")
+    train.add_argument("--imports-only", action="store_true", help=argparse.SUPPRESS)
+    train.set_defaults(handler=cmd_train_dictionary)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    argv = sys.argv[1:] if argv is None else argv
+    # Bare `python main.py [options]` keeps running the full workflow.
+    if not argv or argv[0] not in ("run", "search", "transcripts", "summarize", "report", "batch", "train-dictionary",
+                                 "-h", "--help"):
+        argv = ["run", *argv]
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
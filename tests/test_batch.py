@@ -0,0 +1,46 @@
+"""
+Batch search against the fake YouTube Data API from benchmarks.fakes.
+
+Run from the repository root: python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+
+from benchmarks.fakes import FakeYouTubeDataAPI
+
+
+class ChannelOnlySpecTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.api = FakeYouTubeDataAPI(latency=0).start()
+        cls.workdir = tempfile.TemporaryDirectory()
+        from tools.config import disable_dotenv
+        disable_dotenv()
+        # Modules read their configuration at import time, so set it before importing them.
+        os.environ["YOUTUBE_API_BASE_URL"] = cls.api.base_url
+        os.environ["YOUTUBE_API_KEY"] = "test"
+        os.environ["YOUTUBE_RESEARCH_DB"] = os.path.join(cls.workdir.name, "research.db")
+
+        from tools import channel_index
+        channel_index.save_channel("@LangChain", "UCLangChain")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.stop()
+        cls.workdir.cleanup()
+
+    def test_channel_only_spec_makes_no_search_call(self):
+        from graph.batch import normalize_specs, search_phase
+
+        specs = normalize_specs([{"channels": ["@LangChain"], "max_results_per_query": 3}])
+        state = search_phase({"specs": specs, "max_concurrency": 2, "errors": []})
+
+        self.assertEqual(self.api.calls.get("search", 0), 0)
+        self.assertEqual(len(state["results"]["@LangChain"]["video_ids"]), 3)
+        self.assertEqual(state["errors"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
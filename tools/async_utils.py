@@ -0,0 +1,28 @@
+"""
+Helpers for running the async pipeline from synchronous code.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+def run_sync(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code and return its result.
+
+    Outside an event loop this is asyncio.run. When the caller is itself running
+    inside an event loop (a sync node or tool called from async code), the
+    coroutine runs on a private loop in a worker thread instead, since a loop
+    cannot be re-entered; the caller blocks until it finishes. Context variables
+    such as the run's metrics follow the coroutine either way.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="run_sync") as executor:
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coroutine).result()
@@ -0,0 +1,169 @@
+"""
+Persistent channel index.
+Maps channel handles/names to channel ids and uploads playlist ids so they are resolved once, not every run,
+and keeps a per-channel high-water mark for incremental upload syncs.
+"""
+
+import os
+import time
+from typing import Dict, Any, Iterable, List, Optional, Set
+from tools.database import get_connection, transaction
+from tools.config import load_config
+
+load_config()
+
+# Channel ids never change and uploads playlists practically never do.
+CHANNEL_INDEX_TTL_SECONDS = float(os.getenv("CHANNEL_INDEX_TTL_SECONDS", str(90 * 24 * 3600)))
+# Syncs an upload may fail (e.g. it has no transcript) before the mark moves past it anyway.
+SYNC_MAX_ATTEMPTS = int(os.getenv("CHANNEL_SYNC_MAX_ATTEMPTS", "3"))
+
+
+def _normalize(handle: str) -> str:
+    return handle.strip().lower()
+
+
+def lookup_channel(handle: str) -> Optional[Dict[str, Any]]:
+    """Return {'channel_id', 'uploads_playlist_id'} for a handle, or None if unknown or expired."""
+    row = get_connection().execute("""
+        SELECT channel_id, uploads_playlist_id FROM channel_index
+        WHERE handle = ? AND resolved_at > ?
+    """, (_normalize(handle), time.time() - CHANNEL_INDEX_TTL_SECONDS)).fetchone()
+    if not row:
+        return None
+    return {'channel_id': row[0], 'uploads_playlist_id': row[1]}
+
+
+def lookup_uploads_playlist(channel_id: str) -> Optional[str]:
+    """Return the cached uploads playlist id for a channel id, if known."""
+    row = get_connection().execute("""
+        SELECT uploads_playlist_id FROM channel_index
+        WHERE channel_id = ? AND uploads_playlist_id IS NOT NULL AND resolved_at > ?
+        LIMIT 1
+    """, (channel_id, time.time() - CHANNEL_INDEX_TTL_SECONDS)).fetchone()
+    return row[0] if row else None
+
+
+def save_channel(handle: str, channel_id: str, uploads_playlist_id: Optional[str] = None) -> None:
+    """Record a handle -> channel id mapping, keeping any known uploads playlist id."""
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO channel_index (handle, channel_id, uploads_playlist_id, resolved_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(handle) DO UPDATE SET
+                channel_id = excluded.channel_id,
+                uploads_playlist_id = CASE
+                    WHEN excluded.channel_id = channel_index.channel_id
+                    THEN COALESCE(excluded.uploads_playlist_id, channel_index.uploads_playlist_id)
+                    ELSE excluded.uploads_playlist_id
+                END,
+                resolved_at = excluded.resolved_at
+        """, (_normalize(handle), channel_id, uploads_playlist_id, time.time()))
+
+
+def save_uploads_playlist(channel_id: str, uploads_playlist_id: str) -> None:
+    """Record the uploads playlist for a channel id under every handle that maps to it."""
+    with transaction() as conn:
+        updated = conn.execute("""
+            UPDATE channel_index SET uploads_playlist_id = ? WHERE channel_id = ?
+        """, (uploads_playlist_id, channel_id)).rowcount
+        if not updated:
+            # Channel ids are valid handles for themselves, so the mapping is still reusable.
+            conn.execute("""
+                INSERT OR REPLACE INTO channel_index (handle, channel_id, uploads_playlist_id, resolved_at)
+                VALUES (?, ?, ?, ?)
+            """, (_normalize(channel_id), channel_id, uploads_playlist_id, time.time()))
+
+
+def get_sync_state(channel_id: str) -> Optional[Dict[str, str]]:
+    """Return the channel's high-water mark {'last_video_id', 'last_published_at'}, if it was synced before."""
+    row = get_connection().execute("""
+        SELECT last_video_id, last_published_at FROM channel_sync_state WHERE channel_id = ?
+    """, (channel_id,)).fetchone()
+    if not row:
+        return None
+    return {'last_video_id': row[0], 'last_published_at': row[1]}
+
+
+def save_sync_state(channel_id: str, last_video_id: str, last_published_at: str) -> None:
+    """Move the channel's high-water mark forward (it never moves back)."""
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO channel_sync_state (channel_id, last_video_id, last_published_at, synced_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(channel_id) DO UPDATE SET
+                last_video_id = excluded.last_video_id,
+                last_published_at = excluded.last_published_at,
+                synced_at = excluded.synced_at
+            WHERE excluded.last_published_at >= channel_sync_state.last_published_at
+        """, (channel_id, last_video_id, last_published_at, time.time()))
+
+
+def pending_sync_mark(channel_id: str, new_videos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Describe the mark a sync would move to, without saving it.
+
+    `videos` lists the uploads that must be processed before the mark may pass
+    them; callers drop the ones they deliberately skip.
+    """
+    newest = max(new_videos, key=lambda v: v["published_at"])
+    return {
+        'channel_id': channel_id,
+        'last_video_id': newest["video_id"],
+        'last_published_at': newest["published_at"],
+        'videos': [{'video_id': v["video_id"], 'published_at': v["published_at"]} for v in new_videos],
+    }
+
+
+def _record_attempts(channel_id: str, video_ids: List[str], processed: Set[str]) -> Set[str]:
+    """Count another failed sync for the unprocessed uploads; return those that reached SYNC_MAX_ATTEMPTS."""
+    failed = [video_id for video_id in video_ids if video_id not in processed]
+    with transaction() as conn:
+        conn.executemany(
+            "DELETE FROM channel_sync_attempts WHERE channel_id = ? AND video_id = ?",
+            [(channel_id, video_id) for video_id in video_ids if video_id in processed]
+        )
+        conn.executemany("""
+            INSERT INTO channel_sync_attempts (channel_id, video_id, attempts) VALUES (?, ?, 1)
+            ON CONFLICT(channel_id, video_id) DO UPDATE SET attempts = attempts + 1
+        """, [(channel_id, video_id) for video_id in failed])
+        given_up = set()
+        for video_id in failed:
+            attempts = conn.execute(
+                "SELECT attempts FROM channel_sync_attempts WHERE channel_id = ? AND video_id = ?",
+                (channel_id, video_id)
+            ).fetchone()[0]
+            if attempts >= SYNC_MAX_ATTEMPTS:
+                given_up.add(video_id)
+        conn.executemany(
+            "DELETE FROM channel_sync_attempts WHERE channel_id = ? AND video_id = ?",
+            [(channel_id, video_id) for video_id in given_up]
+        )
+    for video_id in given_up:
+        print(f"Giving up on upload {video_id} of channel {channel_id} after {SYNC_MAX_ATTEMPTS} syncs")
+    return given_up
+
+
+def commit_sync_marks(marks: List[Dict[str, Any]], processed_video_ids: Iterable[str]) -> None:
+    """
+    Move channel marks forward over the uploads that were processed.
+
+    A channel whose videos were all processed moves to its pending mark. Otherwise
+    it moves only up to the newest processed upload older than the first one that
+    was not, so the unprocessed uploads are listed again by the next sync. An
+    upload that SYNC_MAX_ATTEMPTS syncs could not process (one that never gets a
+    transcript, say) is given up on and counts as processed, so it cannot hold
+    the mark back for good.
+    """
+    processed = set(processed_video_ids)
+    for mark in marks or []:
+        processed |= _record_attempts(mark['channel_id'], [v['video_id'] for v in mark['videos']], processed)
+        if all(v['video_id'] in processed for v in mark['videos']):
+            save_sync_state(mark['channel_id'], mark['last_video_id'], mark['last_published_at'])
+            continue
+        done = None
+        for video in sorted(mark['videos'], key=lambda v: v['published_at']):
+            if video['video_id'] not in processed:
+                break
+            done = video
+        if done:
+            save_sync_state(mark['channel_id'], done['video_id'], done['published_at'])
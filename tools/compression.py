@@ -0,0 +1,136 @@
+"""
+Transparent compression for large text columns.
+Values are stored as a one-byte codec tag followed by the compressed bytes; short
+values stay plain TEXT. zstd (with an optional shared dictionary) is used when the
+zstandard package is installed, zlib otherwise. decode_text reads every format.
+"""
+
+import os
+import zlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Union
+from tools.config import load_config
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+load_config()
+
+# Values shorter than this many bytes are not worth a compression frame.
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "512"))
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") != "0"
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+DICTIONARY_SIZE = 112 * 1024
+
+_ZLIB = b"z"
+_ZSTD = b"s"
+_ZSTD_DICT = b"d"  # followed by the 4-byte big-endian dictionary id
+
+_dictionaries: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+_active_dictionary_id: Optional[int] = None
+_dictionaries_loaded = False
+_lock = threading.Lock()
+
+
+def _db_connect() -> sqlite3.Connection:
+    # Imported here because tools.database registers this module's functions on its connections.
+    from tools.database import connect
+    return connect()
+
+
+def _load_dictionaries(reload: bool = False) -> None:
+    """Load the shared dictionaries from compression_dicts once per process; the newest one is used to compress."""
+    global _dictionaries_loaded, _active_dictionary_id
+    if (_dictionaries_loaded and not reload) or zstandard is None:
+        return
+    with _lock:
+        if _dictionaries_loaded and not reload:
+            return
+        conn = _db_connect()
+        try:
+            rows = conn.execute("SELECT dict_id, data FROM compression_dicts ORDER BY dict_id").fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # schema not migrated yet
+        finally:
+            conn.close()
+        for dict_id, data in rows:
+            _dictionaries[dict_id] = zstandard.ZstdCompressionDict(data)
+            _active_dictionary_id = dict_id
+        _dictionaries_loaded = True
+
+
+def encode_text(text: Optional[str]) -> Union[str, bytes, None]:
+    """Compress text for storage. Short text (and None) is returned unchanged."""
+    if text is None or not COMPRESSION_ENABLED:
+        return text
+    raw = text.encode("utf-8")
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        return text
+    if zstandard is None:
+        return _ZLIB + zlib.compress(raw, ZLIB_LEVEL)
+    _load_dictionaries()
+    if _active_dictionary_id is not None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=_dictionaries[_active_dictionary_id])
+        return _ZSTD_DICT + _active_dictionary_id.to_bytes(4, "big") + compressor.compress(raw)
+    return _ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+
+
+def decode_text(value: Union[str, bytes, None]) -> Optional[str]:
+    """Return the text of a stored value, whichever format it was written in."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    tag, payload = value[:1], value[1:]
+    if tag == _ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if zstandard is None:
+        raise RuntimeError("This value is zstd-compressed; install the zstandard package to read it")
+    if tag == _ZSTD:
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    if tag == _ZSTD_DICT:
+        dict_id = int.from_bytes(payload[:4], "big")
+        _load_dictionaries()
+        if dict_id not in _dictionaries:
+            # Trained by another process after this one loaded the dictionaries.
+            _load_dictionaries(reload=True)
+        if dict_id not in _dictionaries:
+            raise RuntimeError(f"Compression dictionary {dict_id} is missing from compression_dicts")
+        decompressor = zstandard.ZstdDecompressor(dict_data=_dictionaries[dict_id])
+        return decompressor.decompress(payload[4:]).decode("utf-8")
+    raise ValueError(f"Unknown compression tag {tag!r}")
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    """Expose yt_compress/yt_decompress to SQL, for migrations and the full-text index triggers."""
+    conn.create_function("yt_compress", 1, encode_text)
+    conn.create_function("yt_decompress", 1, decode_text, deterministic=True)
+
+
+def train_dictionary(samples: Iterable[str], size: int = DICTIONARY_SIZE) -> int:
+    """
+    Train a shared zstd dictionary on sample texts and make it the one new values are compressed with.
+
+    Short summaries compress much better against a dictionary of the phrasing
+    they share. Values written earlier keep decoding with their own dictionary.
+    Returns the new dictionary id.
+    """
+    global _active_dictionary_id
+    if zstandard is None:
+        raise RuntimeError("Training a compression dictionary requires the zstandard package")
+    data = zstandard.train_dictionary(size, [text.encode("utf-8") for text in samples if text])
+    conn = _db_connect()
+    try:
+        dict_id = conn.execute(
+            "INSERT INTO compression_dicts (data) VALUES (?)", (data.as_bytes(),)
+        ).lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+    with _lock:
+        _dictionaries[dict_id] = data
+        _active_dictionary_id = dict_id
+    return dict_id
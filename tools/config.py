@@ -0,0 +1,40 @@
+"""
+Process configuration.
+Settings come from the environment; a .env file is read once per process by the
+first module that calls load_config, before any module reads its settings.
+"""
+
+import threading
+from typing import Optional
+from dotenv import load_dotenv
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_config(dotenv_path: Optional[str] = None) -> None:
+    """
+    Load .env into os.environ (overriding existing values), once per process.
+
+    Modules call this before reading settings at import time, so their values
+    do not depend on which module happened to be imported first.
+    """
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            load_dotenv(dotenv_path, override=True)
+            _loaded = True
+
+
+def disable_dotenv() -> None:
+    """
+    Never read .env in this process; settings come from os.environ alone.
+
+    For hermetic runs (benchmarks, tests), whose settings a developer's .env
+    would otherwise override. Call it before importing any module that reads settings.
+    """
+    global _loaded
+    with _lock:
+        _loaded = True
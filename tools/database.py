@@ -0,0 +1,501 @@
+"""
+SQLite storage layer for youtube_research.db.
+Owns the connections (one long-lived connection per thread, in WAL mode) and the
+schema, which is brought up to date by numbered migrations once per process.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List, Tuple
+from tools.compression import register_functions, decode_text
+from tools.config import load_config
+
+load_config()
+
+DB_PATH = os.getenv("YOUTUBE_RESEARCH_DB", "youtube_research.db")
+# How long a writer waits for another writer's transaction before giving up.
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+
+_local = threading.local()
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def connect(path: str = DB_PATH, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Open a new connection with the pragmas every connection to our databases uses.
+
+    WAL lets readers run alongside a writer, and the busy timeout makes writers
+    from other threads or processes queue up instead of failing with
+    "database is locked".
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=check_same_thread)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    # In WAL mode NORMAL only risks the last transactions on power loss, never corruption.
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    register_functions(conn)
+    return conn
+
+
+def get_connection(path: str = DB_PATH) -> sqlite3.Connection:
+    """Return this thread's long-lived connection to the database, migrating the schema on first use."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = connect(path)
+        if path not in _migrated:
+            with _migrate_lock:
+                if path not in _migrated:
+                    migrate(conn)
+                    _migrated.add(path)
+    return conn
+
+
+@contextmanager
+def transaction(path: str = DB_PATH) -> Iterator[sqlite3.Connection]:
+    """
+    Run a block of writes as one transaction on this thread's connection.
+
+    BEGIN IMMEDIATE takes the write lock up front, so two writers never both
+    hold read locks and deadlock on the upgrade. Commits on success, rolls back
+    on error.
+    """
+    conn = get_connection(path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def _create_summaries_fts(conn: sqlite3.Connection, content: str = "summaries", summary: str = "{row}.summary") -> None:
+    """
+    Create the summaries_fts full-text index over the summaries table.
+
+    The index stores no text of its own (it reads `content`); triggers keep it
+    in sync on insert, update and delete, indexing the `summary` expression.
+    Rows stored before the index existed are indexed once when it is created.
+    Skipped when this SQLite build has no FTS5, in which case retrieval falls
+    back to LIKE matching.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'summaries_fts'"
+    ).fetchone()
+    try:
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+                video_title, summary, query, topic_focus,
+                content='{content}', content_rowid='id',
+                tokenize='porter unicode61'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable: {str(e)}")
+        return
+
+    new_summary, old_summary = summary.format(row="new"), summary.format(row="old")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS summaries_fts_insert AFTER INSERT ON summaries BEGIN
+            INSERT INTO summaries_fts (rowid, video_title, summary, query, topic_focus)
+            VALUES (new.id, new.video_title, {new_summary}, new.query, new.topic_focus);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS summaries_fts_delete AFTER DELETE ON summaries BEGIN
+            INSERT INTO summaries_fts (summaries_fts, rowid, video_title, summary, query, topic_focus)
+            VALUES ('delete', old.id, old.video_title, {old_summary}, old.query, old.topic_focus);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS summaries_fts_update AFTER UPDATE ON summaries BEGIN
+            INSERT INTO summaries_fts (summaries_fts, rowid, video_title, summary, query, topic_focus)
+            VALUES ('delete', old.id, old.video_title, {old_summary}, old.query, old.topic_focus);
+            INSERT INTO summaries_fts (rowid, video_title, summary, query, topic_focus)
+            VALUES (new.id, new.video_title, {new_summary}, new.query, new.topic_focus);
+        END
+    """)
+    if not exists:
+        conn.execute("INSERT INTO summaries_fts (summaries_fts) VALUES ('rebuild')")
+
+
+def _migration_1(conn: sqlite3.Connection) -> None:
+    """Tables that modules used to create on every connection. IF NOT EXISTS keeps older databases intact."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS summaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            video_url TEXT UNIQUE NOT NULL,
+            video_title TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            topic_focus TEXT NOT NULL,
+            query TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            original_length INTEGER,
+            summary_length INTEGER
+        )
+    """)
+    _create_summaries_fts(conn)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS final_report (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_name TEXT UNIQUE NOT NULL,
+            report TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # summary_cache table: memoized LLM summaries keyed by a hash of
+    # (transcript, topic_focus, prompt version, model deployment)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS summary_cache (
+            cache_key TEXT PRIMARY KEY,
+            video_url TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS channel_index (
+            handle TEXT PRIMARY KEY,
+            channel_id TEXT NOT NULL,
+            uploads_playlist_id TEXT,
+            resolved_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_channel_index_channel_id ON channel_index(channel_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS channel_sync_state (
+            channel_id TEXT PRIMARY KEY,
+            last_video_id TEXT NOT NULL,
+            last_published_at TEXT NOT NULL,
+            synced_at REAL NOT NULL
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS api_quota_usage (
+            day TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            calls INTEGER NOT NULL DEFAULT 0,
+            units INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, endpoint)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS run_progress (
+            run_id TEXT NOT NULL,
+            video_id TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, stage, video_id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS summary_embeddings (
+            video_url TEXT PRIMARY KEY,
+            row INTEGER NOT NULL,
+            dim INTEGER NOT NULL,
+            text_hash TEXT NOT NULL
+        )
+    """)
+
+
+def video_id_from_url(value: str) -> str:
+    """Return the video id in a YouTube URL, or the value itself when it already is an id."""
+    match = re.search(r"(?:v=|youtu\.be/|shorts/|embed/)([\w-]{11})", value)
+    return match.group(1) if match else value
+
+
+def watch_url(value: str) -> str:
+    """Return the canonical watch URL for a video id or any YouTube URL; stored summaries are keyed by it."""
+    return f"https://www.youtube.com/watch?v={video_id_from_url(value)}"
+
+
+def _migration_2(conn: sqlite3.Connection) -> None:
+    """Persist video metadata and transcripts, link summaries to videos, and index the report queries."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS videos (
+            video_id TEXT PRIMARY KEY,
+            url TEXT,
+            title TEXT,
+            channel_name TEXT,
+            published_at TEXT,
+            description TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_channel_published ON videos(channel_name, published_at)")
+
+    # Keyed by the requested language: the transcript actually returned may be a fallback.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS transcripts (
+            video_id TEXT NOT NULL REFERENCES videos(video_id),
+            requested_language TEXT NOT NULL,
+            language TEXT NOT NULL,
+            is_generated INTEGER NOT NULL,
+            transcript TEXT NOT NULL,
+            word_count INTEGER NOT NULL,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (video_id, requested_language)
+        )
+    """)
+
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(summaries)")}
+    if "video_id" not in columns:
+        conn.execute("ALTER TABLE summaries ADD COLUMN video_id TEXT REFERENCES videos(video_id)")
+    rows = conn.execute("SELECT id, video_url, video_title FROM summaries WHERE video_id IS NULL").fetchall()
+    conn.executemany(
+        "INSERT OR IGNORE INTO videos (video_id, title) VALUES (?, NULLIF(?, 'Unknown Title'))",
+        [(video_id_from_url(video_url), title) for _, video_url, title in rows]
+    )
+    conn.executemany(
+        "UPDATE summaries SET video_id = ? WHERE id = ?",
+        [(video_id_from_url(video_url), row_id) for row_id, video_url, _ in rows]
+    )
+
+    # Covering indexes for the report's filters and ordering (the summary text is read by rowid).
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_query_created ON summaries(query, created_at DESC, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_topic_created ON summaries(topic_focus, created_at DESC, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_created ON summaries(created_at DESC, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_video_id ON summaries(video_id)")
+
+
+def _migration_3(conn: sqlite3.Connection) -> None:
+    """
+    Compress the large text columns (see tools/compression.py).
+
+    The full-text index now reads through the summaries_text view, which
+    decompresses, and its triggers index the decompressed summary.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+            dict_id INTEGER PRIMARY KEY,
+            data BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'summaries_fts'"
+    ).fetchone()
+    for trigger in ("summaries_fts_insert", "summaries_fts_delete", "summaries_fts_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    if has_fts:
+        conn.execute("DROP TABLE summaries_fts")
+
+    conn.execute("UPDATE summaries SET summary = yt_compress(summary) WHERE typeof(summary) = 'text'")
+    conn.execute("UPDATE summary_cache SET summary = yt_compress(summary) WHERE typeof(summary) = 'text'")
+    conn.execute("UPDATE transcripts SET transcript = yt_compress(transcript) WHERE typeof(transcript) = 'text'")
+
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS summaries_text AS
+        SELECT id, video_title, yt_decompress(summary) AS summary, query, topic_focus FROM summaries
+    """)
+    _create_summaries_fts(conn, content="summaries_text", summary="yt_decompress({row}.summary)")
+
+
+def _migration_4(conn: sqlite3.Connection) -> None:
+    """
+    Key stored summaries and their embeddings by canonical watch URL.
+
+    Earlier runs stored some summaries under the bare video id; where a video
+    has rows under both keys, the newer row is kept.
+    """
+    conn.execute("""
+        DELETE FROM summaries WHERE id IN (
+            SELECT old.id FROM summaries old JOIN summaries new
+            ON new.video_id = old.video_id AND new.id != old.id
+            WHERE (new.created_at, new.id) > (old.created_at, old.id)
+        )
+    """)
+    conn.execute("""
+        UPDATE summaries SET video_url = 'https://www.youtube.com/watch?v=' || video_id
+        WHERE video_id IS NOT NULL AND video_url != 'https://www.youtube.com/watch?v=' || video_id
+    """)
+    # A leftover id-keyed vector (its URL was already indexed) matches no summary, so retrieval skips it.
+    conn.execute("""
+        UPDATE OR IGNORE summary_embeddings SET video_url = 'https://www.youtube.com/watch?v=' || video_url
+        WHERE video_url NOT LIKE 'http%'
+    """)
+
+
+def _migration_5(conn: sqlite3.Connection) -> None:
+    """
+    Make the full-text index independent of application SQL functions.
+
+    The summaries_text view and the index triggers called yt_decompress, which
+    only this application's connections define, so any other SQLite client
+    failed on writes to summaries. summaries_fts now keeps its own plain-text
+    copy, which store_summaries maintains through update_summaries_fts.
+    """
+    for trigger in ("summaries_fts_insert", "summaries_fts_delete", "summaries_fts_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP VIEW IF EXISTS summaries_text")
+    conn.execute("DROP TABLE IF EXISTS summaries_fts")
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE summaries_fts USING fts5(
+                video_title, summary, query, topic_focus,
+                tokenize='porter unicode61'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable: {str(e)}")
+        return
+    rows = conn.execute("SELECT id, video_title, summary, query, topic_focus FROM summaries").fetchall()
+    _insert_fts_entries(conn, [(row[0], row[1], decode_text(row[2]), row[3], row[4]) for row in rows])
+
+
+def _migration_6(conn: sqlite3.Connection) -> None:
+    """Count how many syncs tried an upload without processing it, so the channel's mark can give up on it."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS channel_sync_attempts (
+            channel_id TEXT NOT NULL,
+            video_id TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            PRIMARY KEY (channel_id, video_id)
+        )
+    """)
+
+
+def _migration_7(conn: sqlite3.Connection) -> None:
+    """
+    Make summaries_fts contentless, so it no longer keeps an uncompressed copy of every summary.
+
+    Results are read from summaries (and decompressed) by rowid. SQLite 3.43+
+    gets contentless_delete=1; older builds remove entries with FTS5's
+    'delete' command, which needs the indexed values (see update_summaries_fts).
+    """
+    conn.execute("DROP TABLE IF EXISTS summaries_fts")
+    columns = "video_title, summary, query, topic_focus, content='', tokenize='porter unicode61'"
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE summaries_fts USING fts5({columns}, contentless_delete=1)")
+    except sqlite3.OperationalError:
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE summaries_fts USING fts5({columns})")
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable: {str(e)}")
+            return
+    rows = conn.execute("SELECT id, video_title, summary, query, topic_focus FROM summaries").fetchall()
+    _insert_fts_entries(conn, [(row[0], row[1], decode_text(row[2]), row[3], row[4]) for row in rows])
+
+
+def _migration_8(conn: sqlite3.Connection) -> None:
+    """
+    Drop the per-query and per-topic summary indexes.
+
+    The report ranks with full-text search; only its LIKE fallback filters on
+    query or topic_focus, and its OR with a leading-wildcard LIKE scans anyway.
+    """
+    conn.execute("DROP INDEX IF EXISTS idx_summaries_query_created")
+    conn.execute("DROP INDEX IF EXISTS idx_summaries_topic_created")
+
+
+FtsEntry = Tuple[int, str, str, str, str]
+
+
+def _fts_table_sql(conn: sqlite3.Connection) -> str:
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'summaries_fts'").fetchone()
+    return row[0] if row else ""
+
+
+def _insert_fts_entries(conn: sqlite3.Connection, entries: Iterable[FtsEntry]) -> None:
+    conn.executemany(
+        "INSERT INTO summaries_fts (rowid, video_title, summary, query, topic_focus) VALUES (?, ?, ?, ?, ?)",
+        list(entries)
+    )
+
+
+def summary_fts_entries(conn: sqlite3.Connection, column: str, values: Iterable[str]) -> List[FtsEntry]:
+    """
+    Return the full-text entries of the summaries whose `column` (video_url or video_id) is in `values`.
+
+    Entries are (summary id, video_title, plain summary text, query, topic_focus).
+    """
+    if column not in ("video_url", "video_id"):
+        raise ValueError(f"Cannot look up summaries by {column}")
+    values = list(values)
+    entries = []
+    # Stay well below SQLite's bound-parameter limit
+    for i in range(0, len(values), 500):
+        batch = values[i:i + 500]
+        rows = conn.execute(f"""
+            SELECT id, video_title, summary, query, topic_focus FROM summaries
+            WHERE {column} IN ({",".join("?" * len(batch))})
+        """, batch).fetchall()
+        entries.extend((row[0], row[1], decode_text(row[2]), row[3], row[4]) for row in rows)
+    return entries
+
+
+def update_summaries_fts(conn: sqlite3.Connection, old_entries: Iterable[FtsEntry],
+                         new_entries: Iterable[FtsEntry]) -> None:
+    """
+    Replace summaries' entries in the contentless summaries_fts index.
+
+    `old_entries` are the values the rows were indexed with (read them with
+    summary_fts_entries before changing the rows), `new_entries` the values to
+    index now. Call it in the transaction that writes the summaries. Does
+    nothing when this SQLite build has no FTS5; retrieval then falls back to
+    LIKE matching.
+    """
+    table_sql = _fts_table_sql(conn)
+    if not table_sql:
+        return
+    old_entries = list(old_entries)
+    if "contentless_delete" in table_sql:
+        conn.executemany("DELETE FROM summaries_fts WHERE rowid = ?", [(entry[0],) for entry in old_entries])
+    else:
+        conn.executemany("""
+            INSERT INTO summaries_fts (summaries_fts, rowid, video_title, summary, query, topic_focus)
+            VALUES ('delete', ?, ?, ?, ?, ?)
+        """, old_entries)
+    _insert_fts_entries(conn, new_entries)
+
+
+# (version, migration) pairs, applied in order. Append new migrations; never edit applied ones.
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _migration_1),
+    (2, _migration_2),
+    (3, _migration_3),
+    (4, _migration_4),
+    (5, _migration_5),
+    (6, _migration_6),
+    (7, _migration_7),
+    (8, _migration_8),
+]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply pending migrations, tracked in PRAGMA user_version. Returns the schema version.
+
+    Each migration runs in its own write transaction, and the version is
+    re-read inside it, so processes starting at the same time apply it once.
+    """
+    for version, migration in MIGRATIONS:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        print(f"Database schema migrated to version {version}")
+    return conn.execute("PRAGMA user_version").fetchone()[0]
@@ -0,0 +1,188 @@
+"""
+Local embedding index for semantic retrieval of stored summaries.
+Vectors live in a flat float32 file next to youtube_research.db; the row of each
+summary's current vector is tracked in the summary_embeddings table.
+"""
+
+import os
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from tools.config import load_config
+from tools.llm import get_embedding_model
+from tools.text_chunking import chunk_text
+from tools.database import DB_PATH, get_connection, transaction, watch_url
+from tools import metrics
+
+load_config()
+
+EMBEDDINGS_PATH = os.path.splitext(DB_PATH)[0] + ".embeddings.f32"
+EMBEDDING_INDEX_ENABLED = os.getenv("EMBEDDING_INDEX_ENABLED", "1") != "0"
+# Cosine similarity below which a summary is not considered related.
+EMBEDDING_MIN_SCORE = float(os.getenv("EMBEDDING_MIN_SCORE", "0.3"))
+# Embedding models accept about 8k tokens; summaries rarely come close.
+EMBEDDING_MAX_TOKENS = 8000
+
+_write_lock = threading.Lock()
+
+
+def get_embeddings() -> Optional[Any]:
+    """Return the Azure embeddings client, or None when no embedding deployment is configured."""
+    deployment = os.getenv("EMBEDDING_DEPLOYMENT_NAME")
+    if not EMBEDDING_INDEX_ENABLED or not deployment:
+        return None
+    return get_embedding_model(deployment)
+
+
+def _text_hash(text: str) -> str:
+    """Hash the embedded text together with the model, so a new model re-embeds everything."""
+    digest = hashlib.sha256()
+    for part in (text, os.getenv("EMBEDDING_DEPLOYMENT_NAME", "")):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _embedding_text(summary: Dict[str, Any]) -> str:
+    text = f"{summary.get('video_title', '')}\n{summary.get('summary', '')}".strip()
+    chunks = chunk_text(text, EMBEDDING_MAX_TOKENS)
+    return chunks[0] if chunks else ""
+
+
+class EmbeddingIndex:
+    """
+    Append-only store of unit-length float32 vectors keyed by video_url.
+
+    Re-embedding a summary appends a new row and repoints its mapping; the old
+    row stays in the file but is never returned. Cosine similarity is a single
+    matrix-vector product over a memory-mapped array.
+    """
+
+    def __init__(self, vectors_path: str = EMBEDDINGS_PATH, db_path: str = DB_PATH):
+        self.vectors_path = vectors_path
+        self.db_path = db_path
+
+    def _dim(self, conn: Any) -> Optional[int]:
+        row = conn.execute("SELECT dim FROM summary_embeddings LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def known_hashes(self, video_urls: List[str]) -> Dict[str, str]:
+        """Return {video_url: text_hash} for the given urls that already have a vector."""
+        conn = get_connection(self.db_path)
+        found = {}
+        for i in range(0, len(video_urls), 500):
+            batch = video_urls[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(conn.execute(
+                f"SELECT video_url, text_hash FROM summary_embeddings WHERE video_url IN ({placeholders})",
+                batch
+            ).fetchall())
+        return found
+
+    def add(self, items: List[Tuple[str, str, List[float]]]) -> int:
+        """Append (video_url, text_hash, vector) items. Returns the number of vectors written."""
+        if not items:
+            return 0
+        vectors = np.asarray([vector for _, _, vector in items], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        dim = vectors.shape[1]
+
+        with _write_lock, transaction(self.db_path) as conn:
+            if self._dim(conn) not in (None, dim):
+                # A different embedding model; old vectors cannot be compared with new ones.
+                print(f"Embedding size changed to {dim}, rebuilding the embedding index")
+                conn.execute("DELETE FROM summary_embeddings")
+                open(self.vectors_path, "wb").close()
+
+            row_bytes = dim * 4
+            size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+            first_row = size // row_bytes
+            with open(self.vectors_path, "ab") as f:
+                # Drop a partial row left by an interrupted write.
+                f.truncate(first_row * row_bytes)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Only point at the new rows once they are on disk.
+            conn.executemany("""
+                INSERT INTO summary_embeddings (video_url, row, dim, text_hash)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(video_url) DO UPDATE SET
+                    row = excluded.row, dim = excluded.dim, text_hash = excluded.text_hash
+            """, [
+                (video_url, first_row + i, dim, text_hash)
+                for i, (video_url, text_hash, _) in enumerate(items)
+            ])
+        return len(items)
+
+    def search(self, vector: List[float], k: int, min_score: float = EMBEDDING_MIN_SCORE) -> List[Tuple[str, float]]:
+        """Return up to k (video_url, cosine similarity) pairs, most similar first."""
+        conn = get_connection(self.db_path)
+        dim = self._dim(conn)
+        mapping = conn.execute("SELECT row, video_url FROM summary_embeddings").fetchall()
+        if not dim or not mapping or not os.path.exists(self.vectors_path):
+            return []
+
+        rows_on_disk = os.path.getsize(self.vectors_path) // (dim * 4)
+        if rows_on_disk == 0:
+            return []
+        matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows_on_disk, dim))
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+
+        rows = np.fromiter((row for row, _ in mapping), dtype=np.int64, count=len(mapping))
+        urls = [video_url for _, video_url in mapping]
+        live = rows < rows_on_disk
+        scores = (matrix @ query)[rows[live]]
+        urls = [url for url, ok in zip(urls, live) if ok]
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(urls[i], float(scores[i])) for i in top if scores[i] >= min_score]
+
+
+def index_summaries(summaries: Dict[str, Dict[str, Any]], embeddings: Any = None,
+                    index: Optional[EmbeddingIndex] = None) -> int:
+    """
+    Embed successful summaries that have no current vector and append them to the index.
+
+    Returns the number of summaries embedded; 0 when no embedding deployment is configured.
+    """
+    embeddings = embeddings or get_embeddings()
+    if embeddings is None:
+        return 0
+    index = index or EmbeddingIndex()
+
+    candidates = {}
+    for video_url, summary in summaries.items():
+        if summary.get('error'):
+            continue
+        text = _embedding_text(summary)
+        if text:
+            candidates[watch_url(video_url)] = (text, _text_hash(text))
+
+    known = index.known_hashes(list(candidates))
+    pending = [(url, text, text_hash) for url, (text, text_hash) in candidates.items() if known.get(url) != text_hash]
+    if not pending:
+        return 0
+
+    metrics.count("embedding_requests_total", kind="documents")
+    vectors = embeddings.embed_documents([text for _, text, _ in pending])
+    return index.add([(url, text_hash, vector) for (url, _, text_hash), vector in zip(pending, vectors)])
+
+
+def semantic_search(text: str, k: int, embeddings: Any = None,
+                    index: Optional[EmbeddingIndex] = None) -> List[Tuple[str, float]]:
+    """Return up to k (video_url, similarity) pairs for summaries semantically related to `text`."""
+    embeddings = embeddings or get_embeddings()
+    if embeddings is None or not text.strip():
+        return []
+    index = index or EmbeddingIndex()
+    metrics.count("embedding_requests_total", kind="query")
+    return index.search(embeddings.embed_query(text), k)
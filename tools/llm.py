@@ -0,0 +1,119 @@
+"""
+Shared LLM clients and prompts.
+Chat and embedding clients are created on first use and reused by every node, over
+pooled HTTP connections, instead of each node building its own client per run.
+The agent prompt is vendored, so agent mode does not fetch it from the LangChain Hub.
+"""
+
+import os
+import asyncio
+import weakref
+from functools import lru_cache
+from typing import Any, Optional
+import httpx
+from tools.config import load_config
+
+load_config()
+
+# Connections kept open to the Azure endpoint, shared by all calls.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "600"))
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+    )
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport keeping one connection pool per event loop.
+
+    Nodes run their async work under separate asyncio.run calls, and pooled
+    connections cannot outlive the loop that opened them. Calls within a loop
+    share its pool; pools of closed loops are dropped.
+    """
+
+    def __init__(self):
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            for other in [other for other in self._transports if other.is_closed()]:
+                del self._transports[other]
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=_limits())
+        return await transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+@lru_cache(maxsize=None)
+def _http_client() -> httpx.Client:
+    return httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT_SECONDS)
+
+
+@lru_cache(maxsize=None)
+def _async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=_LoopLocalTransport(), timeout=LLM_TIMEOUT_SECONDS)
+
+
+def _azure_settings() -> dict:
+    return {
+        "azure_endpoint": os.getenv("AZURE_API_BASE"),
+        "api_key": os.getenv("AZURE_API_KEY"),
+        "api_version": os.getenv("AZURE_API_VERSION"),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(deployment: Optional[str] = None) -> Any:
+    """Return the process-wide chat model (an AzureChatOpenAI) for a deployment, LLM_DEPLOYMENT_NAME by default."""
+    # langchain_openai takes seconds to import; only load it once a model is needed.
+    from langchain_openai import AzureChatOpenAI
+    return AzureChatOpenAI(
+        **_azure_settings(),
+        azure_deployment=deployment or os.getenv("LLM_DEPLOYMENT_NAME"),
+        http_client=_http_client(),
+        http_async_client=_async_http_client(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_embedding_model(deployment: str) -> Any:
+    """Return the process-wide embeddings client (an AzureOpenAIEmbeddings) for a deployment."""
+    from langchain_openai import AzureOpenAIEmbeddings
+    return AzureOpenAIEmbeddings(
+        **_azure_settings(),
+        azure_deployment=deployment,
+        http_client=_http_client(),
+        http_async_client=_async_http_client(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_agent_prompt() -> Any:
+    """The hwchase17/openai-functions-agent prompt from the LangChain Hub, vendored."""
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    return ChatPromptTemplate.from_messages([
+        ("system", "You are a helpful assistant"),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ])
+
+
+def reset_clients() -> None:
+    """Forget the shared clients, so the next call builds them from the current settings."""
+    get_chat_model.cache_clear()
+    get_embedding_model.cache_clear()
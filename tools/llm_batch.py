@@ -0,0 +1,177 @@
+"""
+Concurrent, rate-limited LLM calls.
+Runs many prompts through a chat model with a cap on in-flight requests and tokens per minute,
+backing off when the provider answers with 429.
+"""
+
+import os
+import time
+import random
+import asyncio
+from typing import List, Any, Optional, Union, Tuple
+from tools import metrics
+from tools.config import load_config
+
+load_config()
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "60000"))
+DEFAULT_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding files unavailable offline
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, otherwise estimate ~4 characters per token."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def token_usage(prompt: Any, response: Any) -> Tuple[int, int]:
+    """
+    Return (prompt_tokens, completion_tokens) for a call.
+
+    Uses the usage the provider reported on the response when present,
+    otherwise counts the prompt and the response content locally.
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("input_tokens") is not None and usage.get("output_tokens") is not None:
+        return usage["input_tokens"], usage["output_tokens"]
+    content = getattr(response, "content", response)
+    return (
+        count_tokens(prompt if isinstance(prompt, str) else str(prompt)),
+        count_tokens(content if isinstance(content, str) else str(content)),
+    )
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Return True for provider errors that mean 'too many requests'."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    if type(error).__name__ == "RateLimitError":
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read a Retry-After hint from the provider response when there is one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            continue
+        return seconds / 1000 if header == "retry-after-ms" else seconds
+    return None
+
+
+class LLMRateLimiter:
+    """
+    Shared limits for LLM calls: a concurrency cap, a tokens-per-minute budget
+    and a cooldown that every caller honours after a 429.
+
+    One limiter can be shared across batches so that several nodes, or several
+    research queries in one process, stay under the same deployment quota.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE):
+        self.max_concurrency = max(1, max_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._budget = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._cooldown_until = 0.0
+        self._budget_lock: Optional[asyncio.Lock] = None
+
+    def _bind_loop(self) -> None:
+        # asyncio primitives belong to one event loop; recreate them if the loop changed.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._budget_lock = asyncio.Lock()
+
+    async def _acquire_tokens(self, tokens: int) -> None:
+        if self.tokens_per_minute <= 0:
+            return
+        # A single prompt larger than the whole budget waits for a full minute's worth.
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._budget_lock:
+            while True:
+                now = time.monotonic()
+                self._budget = min(
+                    float(self.tokens_per_minute),
+                    self._budget + (now - self._last_refill) * self.tokens_per_minute / 60.0,
+                )
+                self._last_refill = now
+                if self._budget >= tokens:
+                    self._budget -= tokens
+                    return
+                await asyncio.sleep((tokens - self._budget) * 60.0 / self.tokens_per_minute)
+
+    async def _wait_for_cooldown(self) -> None:
+        delay = self._cooldown_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _start_cooldown(self, seconds: float) -> None:
+        self._cooldown_until = max(self._cooldown_until, time.monotonic() + seconds)
+
+    async def call(self, llm: Any, prompt: Any, max_retries: int = DEFAULT_MAX_RETRIES) -> Any:
+        """Run `llm.ainvoke(prompt)` under the limits, retrying 429 responses with backoff."""
+        self._bind_loop()
+        tokens = count_tokens(prompt if isinstance(prompt, str) else str(prompt))
+        attempt = 0
+        while True:
+            await self._wait_for_cooldown()
+            await self._acquire_tokens(tokens)
+            async with self._semaphore:
+                # Another request may have hit a 429 while this one was queued.
+                await self._wait_for_cooldown()
+                started = time.perf_counter()
+                try:
+                    response = await llm.ainvoke(prompt)
+                except Exception as e:
+                    metrics.count("llm_errors_total", kind="rate_limit" if is_rate_limit_error(e) else "error")
+                    if not is_rate_limit_error(e) or attempt >= max_retries:
+                        raise
+                    delay = _retry_after_seconds(e) or min(60.0, 2 ** attempt) * (1 + random.random())
+                    attempt += 1
+                    print(f"Rate limited by LLM provider, backing off {delay:.1f}s (attempt {attempt}/{max_retries})")
+                    self._start_cooldown(delay)
+                    continue
+                metrics.record_llm_call(*token_usage(prompt, response), time.perf_counter() - started)
+                return response
+
+
+async def run_llm_batch(
+    llm: Any,
+    prompts: List[Any],
+    limiter: Optional[LLMRateLimiter] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+) -> List[Union[Any, Exception]]:
+    """
+    Run prompts concurrently and return one result per prompt, in input order.
+
+    A failed prompt yields its exception in place of a response, so one bad
+    video does not affect the others.
+    """
+    limiter = limiter or LLMRateLimiter()
+    return await asyncio.gather(
+        *(limiter.call(llm, prompt, max_retries) for prompt in prompts),
+        return_exceptions=True,
+    )
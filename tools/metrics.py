@@ -0,0 +1,267 @@
+"""
+Run instrumentation.
+Nodes wrapped with instrument_node record wall time, and code running inside them
+(including asyncio tasks and worker threads started with copy_context) records
+network calls, LLM tokens, estimated cost, cache hits and per-video stage times
+into the run's metrics, which travel in state['metrics'].
+"""
+
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional
+from tools.config import load_config
+
+load_config()
+
+# Estimated USD per 1K tokens for the chat deployment; set them to your Azure price sheet.
+LLM_PROMPT_COST_PER_1K = float(os.getenv("LLM_PROMPT_COST_PER_1K_TOKENS", "0.0025"))
+LLM_COMPLETION_COST_PER_1K = float(os.getenv("LLM_COMPLETION_COST_PER_1K_TOKENS", "0.01"))
+METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH", "")
+METRICS_PROMETHEUS_PATH = os.getenv("METRICS_PROMETHEUS_PATH", "")
+
+# Cache names recorded with record_cache; hit rates are derived for each.
+CACHES = ("transcript", "summary")
+
+
+class RunMetrics:
+    """
+    Thread-safe metrics for one workflow run.
+
+    `counters` maps a metric key (name plus sorted labels, Prometheus style) to
+    a number; `nodes` holds wall time per graph node; `videos` holds wall time
+    per video and stage.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.counters: Dict[str, float] = dict(data.get("counters", {}))
+        self.nodes: Dict[str, Dict[str, float]] = {k: dict(v) for k, v in data.get("nodes", {}).items()}
+        self.videos: Dict[str, Dict[str, float]] = {k: dict(v) for k, v in data.get("videos", {}).items()}
+        self.node: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _metric_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe_video(self, video_id: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            stages = self.videos.setdefault(video_id, {})
+            stages[stage] = round(stages.get(stage, 0.0) + seconds, 4)
+
+    def observe_node(self, node: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.nodes.setdefault(node, {"seconds": 0.0, "runs": 0})
+            entry["seconds"] = round(entry["seconds"] + seconds, 4)
+            entry["runs"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "nodes": {k: dict(v) for k, v in self.nodes.items()},
+                "videos": {k: dict(v) for k, v in self.videos.items()},
+            }
+
+
+_current: ContextVar[Optional[RunMetrics]] = ContextVar("run_metrics", default=None)
+
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    inner = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{inner}}}"
+
+
+def current_metrics() -> Optional[RunMetrics]:
+    """Return the metrics of the run in progress, or None outside an instrumented node."""
+    return _current.get()
+
+
+def count(name: str, value: float = 1, **labels: Any) -> None:
+    """Add to a counter of the current run. No-op outside an instrumented node."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, value, **labels)
+
+
+def record_cache(cache: str, hit: bool, source: str = "") -> None:
+    """Record a cache lookup; `source` tells which layer answered a hit."""
+    count("cache_lookups_total", cache=cache, result="hit" if hit else "miss")
+    if hit and source:
+        count("cache_hits_by_source_total", cache=cache, source=source)
+
+
+def record_llm_call(prompt_tokens: int, completion_tokens: int, seconds: float) -> None:
+    """Record one completed LLM call with its token usage and estimated cost, attributed to the current node."""
+    metrics = _current.get()
+    if metrics is None:
+        return
+    node = metrics.node or "unknown"
+    metrics.count("llm_calls_total", node=node)
+    metrics.count("llm_prompt_tokens_total", prompt_tokens, node=node)
+    metrics.count("llm_completion_tokens_total", completion_tokens, node=node)
+    metrics.count("llm_seconds_total", seconds, node=node)
+    metrics.count(
+        "llm_cost_usd_total",
+        prompt_tokens / 1000 * LLM_PROMPT_COST_PER_1K + completion_tokens / 1000 * LLM_COMPLETION_COST_PER_1K,
+        node=node,
+    )
+
+
+@contextmanager
+def timed_video(video_id: str, stage: str) -> Iterator[None]:
+    """Time one video's work in a stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.observe_video(video_id, stage, time.perf_counter() - started)
+
+
+def instrument_node(name: str, node: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Wrap a graph node so everything it does is recorded into state['metrics'].
+
+    Metrics accumulate across nodes: each node starts from the metrics in its
+    input state and returns the updated totals. Async nodes get an async wrapper.
+    """
+    if inspect.iscoroutinefunction(node):
+        @wraps(node)
+        async def async_wrapper(state: Dict[str, Any]) -> Dict[str, Any]:
+            with _recording_node(name, state) as metrics:
+                result = await node(state)
+            return {**result, "metrics": metrics.to_dict()}
+        return async_wrapper
+
+    @wraps(node)
+    def wrapper(state: Dict[str, Any]) -> Dict[str, Any]:
+        with _recording_node(name, state) as metrics:
+            result = node(state)
+        return {**result, "metrics": metrics.to_dict()}
+    return wrapper
+
+
+@contextmanager
+def _recording_node(name: str, state: Dict[str, Any]) -> Iterator[RunMetrics]:
+    """Make the node's metrics (continued from its input state) current and record its wall time."""
+    metrics = RunMetrics(state.get('metrics'))
+    metrics.node = name
+    token = _current.set(metrics)
+    started = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.observe_node(name, time.perf_counter() - started)
+        _current.reset(token)
+
+
+def summarize_metrics(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Derive the headline numbers: node times, LLM tokens and cost, cache hit rates and per-stage video times."""
+    counters = data.get("counters", {})
+
+    def total(name: str, **labels: str) -> float:
+        wanted = [f'{key}="{value}"' for key, value in labels.items()]
+        return sum(
+            value for key, value in counters.items()
+            if key.split("{")[0] == name and all(label in key for label in wanted)
+        )
+
+    hit_rates = {}
+    for cache in CACHES:
+        hits = total("cache_lookups_total", cache=cache, result="hit")
+        lookups = hits + total("cache_lookups_total", cache=cache, result="miss")
+        if lookups:
+            hit_rates[cache] = round(hits / lookups, 3)
+
+    stage_totals: Dict[str, Dict[str, float]] = {}
+    for stages in data.get("videos", {}).values():
+        for stage, seconds in stages.items():
+            entry = stage_totals.setdefault(stage, {"videos": 0, "seconds": 0.0, "max_seconds": 0.0})
+            entry["videos"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    return {
+        "node_seconds": {node: entry["seconds"] for node, entry in data.get("nodes", {}).items()},
+        "llm_calls": int(total("llm_calls_total")),
+        "llm_prompt_tokens": int(total("llm_prompt_tokens_total")),
+        "llm_completion_tokens": int(total("llm_completion_tokens_total")),
+        "llm_cost_usd": round(total("llm_cost_usd_total"), 4),
+        "youtube_api_requests": int(total("youtube_api_requests_total")),
+        "transcript_fetches": int(total("transcript_fetches_total")),
+        "cache_hit_rates": hit_rates,
+        "video_stages": {
+            stage: {
+                "videos": entry["videos"],
+                "mean_seconds": round(entry["seconds"] / entry["videos"], 3),
+                "max_seconds": round(entry["max_seconds"], 3),
+            }
+            for stage, entry in stage_totals.items()
+        },
+    }
+
+
+def to_json_line(data: Dict[str, Any], run_id: Optional[str] = None) -> str:
+    """Serialize one run's metrics (and its summary) as a single JSON line."""
+    return json.dumps({
+        "timestamp": time.time(),
+        "run_id": run_id,
+        "summary": summarize_metrics(data),
+        **data,
+    }, sort_keys=True)
+
+
+def to_prometheus(data: Dict[str, Any], prefix: str = "youtube_research") -> str:
+    """
+    Render metrics in the Prometheus text exposition format.
+
+    Per-video times are exported as per-stage count/sum/max rather than one
+    series per video, to keep cardinality bounded.
+    """
+    lines = []
+    seen = set()
+
+    def emit(name: str, kind: str, key: str, value: float) -> None:
+        if name not in seen:
+            lines.append(f"# TYPE {name} {kind}")
+            seen.add(name)
+        lines.append(f"{key} {value:g}")
+
+    for key, value in sorted(data.get("counters", {}).items()):
+        name = f"{prefix}_{key.split('{')[0]}"
+        emit(name, "counter", f"{prefix}_{key}", value)
+    for node, entry in sorted(data.get("nodes", {}).items()):
+        emit(f"{prefix}_node_seconds", "gauge", f'{prefix}_node_seconds{{node="{node}"}}', entry["seconds"])
+    for stage, entry in sorted(summarize_metrics(data)["video_stages"].items()):
+        emit(f"{prefix}_video_stage_seconds_count", "gauge",
+             f'{prefix}_video_stage_seconds_count{{stage="{stage}"}}', entry["videos"])
+        emit(f"{prefix}_video_stage_seconds_mean", "gauge",
+             f'{prefix}_video_stage_seconds_mean{{stage="{stage}"}}', entry["mean_seconds"])
+        emit(f"{prefix}_video_stage_seconds_max", "gauge",
+             f'{prefix}_video_stage_seconds_max{{stage="{stage}"}}', entry["max_seconds"])
+    return "\n".join(lines) + "\n"
+
+
+def export_metrics(data: Dict[str, Any], run_id: Optional[str] = None,
+                   jsonl_path: str = METRICS_JSONL_PATH, prometheus_path: str = METRICS_PROMETHEUS_PATH) -> None:
+    """Append the run to a JSON-lines file and/or write a Prometheus textfile, when paths are configured."""
+    if jsonl_path:
+        with open(jsonl_path, "a", encoding="utf-8") as f:
+            f.write(to_json_line(data, run_id) + "\n")
+    if prometheus_path:
+        # Write then rename, so a node-exporter textfile collector never reads a partial file.
+        tmp_path = f"{prometheus_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(to_prometheus(data))
+        os.replace(tmp_path, prometheus_path)
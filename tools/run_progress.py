@@ -0,0 +1,45 @@
+"""
+Per-video progress records for workflow runs.
+Lets an interrupted run see which videos already finished each stage.
+"""
+
+from typing import Dict, Iterable, Optional, Set
+from tools.database import get_connection, transaction
+
+
+def mark_completed(run_id: Optional[str], stage: str, video_ids: Iterable[str]) -> None:
+    """Record that a stage finished for these videos in a run. No-op without a run_id."""
+    video_ids = list(video_ids)
+    if not run_id or not video_ids:
+        return
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO run_progress (run_id, video_id, stage) VALUES (?, ?, ?)",
+            [(run_id, video_id, stage) for video_id in video_ids]
+        )
+
+
+def completed_videos(run_id: Optional[str], stage: str) -> Set[str]:
+    """Return the video ids that already finished a stage in a run."""
+    if not run_id:
+        return set()
+    rows = get_connection().execute(
+        "SELECT video_id FROM run_progress WHERE run_id = ? AND stage = ?", (run_id, stage)
+    ).fetchall()
+    return {row[0] for row in rows}
+
+
+def clear_progress(run_id: Optional[str]) -> None:
+    """Forget a run's progress, so a run started over under the same run_id redoes every video."""
+    if not run_id:
+        return
+    with transaction() as conn:
+        conn.execute("DELETE FROM run_progress WHERE run_id = ?", (run_id,))
+
+
+def get_progress(run_id: str) -> Dict[str, int]:
+    """Return how many videos completed each stage of a run."""
+    rows = get_connection().execute(
+        "SELECT stage, COUNT(*) FROM run_progress WHERE run_id = ? GROUP BY stage", (run_id,)
+    ).fetchall()
+    return dict(rows)
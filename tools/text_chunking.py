@@ -0,0 +1,73 @@
+"""
+Token-aware text chunking.
+Splits long transcripts into overlapping chunks that fit an LLM token budget.
+"""
+
+import re
+from typing import List
+from tools.llm_batch import count_tokens
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_units(text: str, max_tokens: int, window_tokens: int) -> List[str]:
+    """Split text into sentences; sentences longer than max_tokens are split into word windows of window_tokens."""
+    units = []
+    for sentence in _SENTENCE_BOUNDARY.split(text.strip()):
+        if not sentence:
+            continue
+        if count_tokens(sentence) <= max_tokens:
+            units.append(sentence)
+            continue
+        # Auto-generated captions often have no punctuation at all.
+        window = []
+        size = 0
+        for word in sentence.split():
+            word_tokens = count_tokens(" " + word)
+            if window and size + word_tokens > window_tokens:
+                units.append(" ".join(window))
+                window, size = [], 0
+            window.append(word)
+            size += word_tokens
+        if window:
+            units.append(" ".join(window))
+    return units
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Split text into chunks of at most `max_tokens` tokens on sentence boundaries.
+
+    Consecutive chunks share up to `overlap_tokens` tokens of trailing sentences
+    so that context spanning a boundary is not lost.
+    """
+    if not text or not text.strip():
+        return []
+    if count_tokens(text) <= max_tokens:
+        return [text.strip()]
+
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    unit_limit = max(1, max_tokens - overlap_tokens)
+    # Pseudo-sentences for unpunctuated text: small enough to pack chunks tightly and to overlap.
+    window_tokens = max(1, min(unit_limit, overlap_tokens or unit_limit, max_tokens // 8))
+    units = [(unit, count_tokens(unit) + 1) for unit in _split_units(text, unit_limit, window_tokens)]
+
+    chunks = []
+    current: List[tuple] = []
+    current_tokens = 0
+    for unit, tokens in units:
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(u for u, _ in current))
+            # Carry trailing units into the next chunk as overlap.
+            carried, carried_tokens = [], 0
+            for prev_unit, prev_tokens in reversed(current):
+                if carried_tokens + prev_tokens > overlap_tokens:
+                    break
+                carried.insert(0, (prev_unit, prev_tokens))
+                carried_tokens += prev_tokens
+            current, current_tokens = carried, carried_tokens
+        current.append((unit, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(u for u, _ in current))
+    return chunks
@@ -0,0 +1,208 @@
+"""
+Persistent transcript cache.
+Stores fetched transcripts on disk so repeated runs over the same videos skip the network.
+"""
+
+import os
+import time
+import zlib
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+from tools.database import connect
+from tools.config import load_config
+
+load_config()
+
+DEFAULT_CACHE_PATH = os.getenv("TRANSCRIPT_CACHE_PATH", "transcript_cache.db")
+DEFAULT_TTL_SECONDS = float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+DEFAULT_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class TranscriptCache:
+    """
+    On-disk transcript cache keyed by (video_id, language, is_generated).
+
+    Transcript text is stored once per content hash in zlib-compressed form,
+    so identical transcripts share one blob. Entries expire after `ttl_seconds`
+    and the least recently used entries are evicted once the compressed blobs
+    exceed `max_bytes`.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+        self._conn = connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                video_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                is_generated INTEGER NOT NULL,
+                digest TEXT NOT NULL REFERENCES blobs(digest),
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (video_id, language, is_generated)
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+            CREATE TABLE IF NOT EXISTS fallbacks (
+                video_id TEXT NOT NULL,
+                requested_language TEXT NOT NULL,
+                language TEXT NOT NULL,
+                is_generated INTEGER NOT NULL,
+                PRIMARY KEY (video_id, requested_language)
+            );
+        """)
+        self._evict()
+        self._conn.commit()
+
+    def get(self, video_id: str, preferred_language: str = "en") -> Optional[Dict[str, Any]]:
+        """
+        Look up a transcript for a video in the preferred language.
+
+        An exact language match is used first (manual before generated). Otherwise
+        the transcript that get_video_transcript fell back to the last time this
+        language was requested is returned.
+        """
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT language, is_generated, digest, created_at FROM entries
+                WHERE video_id = ? AND language = ? ORDER BY is_generated LIMIT 1
+            """, (video_id, preferred_language)).fetchone()
+            if not row:
+                row = self._conn.execute("""
+                    SELECT e.language, e.is_generated, e.digest, e.created_at
+                    FROM fallbacks f JOIN entries e
+                      ON e.video_id = f.video_id AND e.language = f.language AND e.is_generated = f.is_generated
+                    WHERE f.video_id = ? AND f.requested_language = ?
+                """, (video_id, preferred_language)).fetchone()
+
+            if row:
+                language, is_generated, digest, created_at = row
+                now = time.time()
+                blob = None
+                if now - created_at <= self.ttl_seconds:
+                    blob = self._conn.execute("SELECT data FROM blobs WHERE digest = ?", (digest,)).fetchone()
+                if blob:
+                    self._conn.execute(
+                        "UPDATE entries SET last_access = ? WHERE video_id = ? AND language = ? AND is_generated = ?",
+                        (now, video_id, language, is_generated))
+                    self._conn.commit()
+                    self.hits += 1
+                    return {
+                        'text': zlib.decompress(blob[0]).decode("utf-8"),
+                        'language': language,
+                        'is_generated': bool(is_generated),
+                    }
+
+            self.misses += 1
+            return None
+
+    def put(self, video_id: str, transcript: Dict[str, Any], requested_language: Optional[str] = None) -> None:
+        """
+        Store a transcript dict as returned by get_video_transcript.
+
+        When the transcript's language differs from `requested_language`, the
+        fallback is remembered so the next request for that language hits.
+        """
+        text = transcript.get('text') or ''
+        encoded = text.encode("utf-8")
+        digest = hashlib.sha256(encoded).hexdigest()
+        data = zlib.compress(encoded, 6)
+        language = transcript.get('language', '')
+        is_generated = int(bool(transcript.get('is_generated')))
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (digest, data, size) VALUES (?, ?, ?)",
+                (digest, data, len(data)))
+            self._conn.execute("""
+                INSERT OR REPLACE INTO entries (video_id, language, is_generated, digest, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (video_id, language, is_generated, digest, now, now))
+            if requested_language and requested_language != language:
+                self._conn.execute("""
+                    INSERT OR REPLACE INTO fallbacks (video_id, requested_language, language, is_generated)
+                    VALUES (?, ?, ?, ?)
+                """, (video_id, requested_language, language, is_generated))
+            # Eviction scans the whole cache, so only run it every few writes.
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= 32:
+                self._evict()
+                self._puts_since_evict = 0
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        self._conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._delete_orphan_blobs()
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = self._conn.execute("""
+                SELECT video_id, language, is_generated FROM entries
+                ORDER BY last_access LIMIT 64
+            """).fetchall()
+            if not oldest:
+                break
+            self._conn.executemany(
+                "DELETE FROM entries WHERE video_id = ? AND language = ? AND is_generated = ?", oldest)
+            self._delete_orphan_blobs()
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _delete_orphan_blobs(self) -> None:
+        self._conn.execute("DELETE FROM blobs WHERE digest NOT IN (SELECT digest FROM entries)")
+        self._conn.execute("""
+            DELETE FROM fallbacks WHERE NOT EXISTS (
+                SELECT 1 FROM entries e
+                WHERE e.video_id = fallbacks.video_id AND e.language = fallbacks.language
+                  AND e.is_generated = fallbacks.is_generated
+            )
+        """)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size of the cache."""
+        with self._lock:
+            entries, = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            size, = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'size_bytes': size,
+        }
+
+
+_cache: Optional[TranscriptCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_transcript_cache() -> Optional[TranscriptCache]:
+    """Return the process-wide transcript cache, or None when disabled via TRANSCRIPT_CACHE_ENABLED=0."""
+    global _cache
+    if os.getenv("TRANSCRIPT_CACHE_ENABLED", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranscriptCache()
+            # Transcripts stored in youtube_research.db while the cache was disabled.
+            from tools.video_store import move_transcripts_to_cache
+            try:
+                move_transcripts_to_cache(_cache)
+            except Exception as e:
+                print(f"Error moving stored transcripts into the cache: {str(e)}")
+        return _cache
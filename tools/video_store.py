@@ -0,0 +1,122 @@
+"""
+Persistent video metadata and transcripts.
+Search results and fetched transcripts are recorded once in youtube_research.db,
+so later stages and later runs look them up by video_id instead of fetching again.
+Transcripts are only kept here when the on-disk transcript cache is disabled;
+otherwise the cache is their store, and rows stored here earlier are moved into it.
+"""
+
+from typing import Dict, Any, Iterable, Optional
+from tools.database import get_connection, transaction, summary_fts_entries, update_summaries_fts
+from tools.compression import encode_text, decode_text
+
+
+def save_videos(videos: Iterable[Dict[str, Any]]) -> int:
+    """
+    Upsert search metadata (video_id, url, title, channel_name, published_at, description).
+
+    Known fields are never overwritten with missing ones, and summaries stored
+    before their title was known pick it up. Returns the number of videos written.
+    """
+    rows = [
+        (
+            video['video_id'],
+            video.get('url'),
+            video.get('title'),
+            video.get('channel_name'),
+            video.get('published_at'),
+            video.get('description'),
+        )
+        for video in videos
+        if video.get('video_id')
+    ]
+    if not rows:
+        return 0
+    with transaction() as conn:
+        conn.executemany("""
+            INSERT INTO videos (video_id, url, title, channel_name, published_at, description)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(video_id) DO UPDATE SET
+                url = COALESCE(excluded.url, videos.url),
+                title = COALESCE(excluded.title, videos.title),
+                channel_name = COALESCE(excluded.channel_name, videos.channel_name),
+                published_at = COALESCE(excluded.published_at, videos.published_at),
+                description = COALESCE(excluded.description, videos.description),
+                updated_at = CURRENT_TIMESTAMP
+        """, rows)
+        titles = [(row[2], row[0]) for row in rows if row[2]]
+        titled_ids = [video_id for _, video_id in titles]
+        # The full-text index is kept by the app: re-index the summaries whose title changes.
+        untitled = [e for e in summary_fts_entries(conn, "video_id", titled_ids) if e[1] == 'Unknown Title']
+        conn.executemany("""
+            UPDATE summaries SET video_title = ?
+            WHERE video_id = ? AND video_title = 'Unknown Title'
+        """, titles)
+        if untitled:
+            untitled_ids = {entry[0] for entry in untitled}
+            update_summaries_fts(conn, untitled, [
+                e for e in summary_fts_entries(conn, "video_id", titled_ids) if e[0] in untitled_ids
+            ])
+    return len(rows)
+
+
+def get_stored_transcript(video_id: str, requested_language: str) -> Optional[Dict[str, Any]]:
+    """Return a stored transcript in the get_video_transcript format, or None if it was never fetched."""
+    row = get_connection().execute("""
+        SELECT transcript, language, is_generated FROM transcripts
+        WHERE video_id = ? AND requested_language = ?
+    """, (video_id, requested_language)).fetchone()
+    if not row:
+        return None
+    return {'text': decode_text(row[0]), 'language': row[1], 'is_generated': bool(row[2])}
+
+
+def save_transcript(video_id: str, transcript_data: Dict[str, Any], requested_language: str) -> None:
+    """Record a fetched transcript (the get_video_transcript result) for a video and requested language."""
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO videos (video_id) VALUES (?)", (video_id,))
+        conn.execute("""
+            INSERT INTO transcripts (video_id, requested_language, language, is_generated, transcript, word_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(video_id, requested_language) DO UPDATE SET
+                language = excluded.language,
+                is_generated = excluded.is_generated,
+                transcript = excluded.transcript,
+                word_count = excluded.word_count,
+                fetched_at = CURRENT_TIMESTAMP
+        """, (
+            video_id,
+            requested_language,
+            transcript_data['language'],
+            int(transcript_data.get('is_generated', False)),
+            encode_text(transcript_data['text']),
+            len(transcript_data['text'].split()),
+        ))
+
+
+def move_transcripts_to_cache(cache) -> int:
+    """
+    Move every stored transcript into a TranscriptCache and delete it here.
+
+    Called once per process when the cache is enabled, which otherwise never
+    reads this table. Returns the number of transcripts moved.
+    """
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT video_id, requested_language, language, is_generated, transcript FROM transcripts
+    """).fetchall()
+    if not rows:
+        return 0
+    for video_id, requested_language, language, is_generated, transcript in rows:
+        cache.put(video_id, {
+            'text': decode_text(transcript),
+            'language': language,
+            'is_generated': bool(is_generated),
+        }, requested_language)
+    with transaction() as conn:
+        conn.executemany(
+            "DELETE FROM transcripts WHERE video_id = ? AND requested_language = ?",
+            [(row[0], row[1]) for row in rows]
+        )
+    print(f"Moved {len(rows)} stored transcripts into the transcript cache")
+    return len(rows)
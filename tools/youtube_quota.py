@@ -0,0 +1,97 @@
+"""
+YouTube Data API quota accounting.
+Tracks the quota cost of every API call in a run and persists daily totals in youtube_research.db.
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from tools.database import get_connection, transaction
+from tools.config import load_config
+
+load_config()
+
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+# Fraction of the daily quota at which a warning is printed.
+QUOTA_WARNING_RATIO = float(os.getenv("YOUTUBE_QUOTA_WARNING_RATIO", "0.8"))
+
+# Units charged per request, from the YouTube Data API quota calculator.
+ENDPOINT_COSTS = {
+    "search": 100,
+    "videos": 1,
+    "channels": 1,
+    "playlistItems": 1,
+    "playlists": 1,
+}
+
+# The daily quota resets at midnight Pacific time.
+try:
+    _QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except ZoneInfoNotFoundError:  # no tz database installed (e.g. Windows without tzdata)
+    _QUOTA_TIMEZONE = None
+
+
+def quota_day() -> str:
+    """Return the current quota day (Pacific time) as YYYY-MM-DD."""
+    return datetime.now(_QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+
+class QuotaMeter:
+    """Records calls and quota units per endpoint for a single run."""
+
+    def __init__(self, daily_quota: int = DAILY_QUOTA):
+        self.daily_quota = daily_quota
+        self.calls: Dict[str, int] = {}
+        self.units: Dict[str, int] = {}
+        self.units_before_run = get_daily_usage()
+        self._warned = False
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str) -> None:
+        cost = ENDPOINT_COSTS.get(endpoint, 1)
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            self.units[endpoint] = self.units.get(endpoint, 0) + cost
+            used_today = self.units_before_run + self.total_units
+            if not self._warned and used_today >= self.daily_quota * QUOTA_WARNING_RATIO:
+                self._warned = True
+                print(f"Warning: YouTube API quota at {used_today}/{self.daily_quota} units for {quota_day()}")
+
+    @property
+    def total_units(self) -> int:
+        return sum(self.units.values())
+
+    def summary(self, videos_found: int) -> Dict[str, Any]:
+        """Summarize this run's quota use; units per video is the key throughput number."""
+        return {
+            "units_used": self.total_units,
+            "calls_by_endpoint": dict(self.calls),
+            "units_by_endpoint": dict(self.units),
+            "units_per_video": round(self.total_units / videos_found, 2) if videos_found else None,
+            "daily_units_used": self.units_before_run + self.total_units,
+            "daily_quota": self.daily_quota,
+        }
+
+    def persist(self) -> None:
+        """Add this run's usage to the persisted daily totals."""
+        with self._lock:
+            if not self.calls:
+                return
+            rows = [(quota_day(), endpoint, self.calls[endpoint], self.units[endpoint]) for endpoint in self.calls]
+        with transaction() as conn:
+            conn.executemany("""
+                INSERT INTO api_quota_usage (day, endpoint, calls, units) VALUES (?, ?, ?, ?)
+                ON CONFLICT(day, endpoint) DO UPDATE SET
+                    calls = calls + excluded.calls,
+                    units = units + excluded.units
+            """, rows)
+
+
+def get_daily_usage(day: Optional[str] = None) -> int:
+    """Return the persisted quota units used on a quota day (today by default)."""
+    row = get_connection().execute(
+        "SELECT COALESCE(SUM(units), 0) FROM api_quota_usage WHERE day = ?", (day or quota_day(),)
+    ).fetchone()
+    return row[0]
@@ -4,15 +4,19 @@ Search videos by topics, channels, or topics within channels using YouTube Data
 """
 
 import os
+import re
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field
-from langchain.tools import StructuredTool
 import aiohttp
 import asyncio
-from dotenv import load_dotenv
+from tools.config import load_config
+from tools import channel_index
+from tools.youtube_quota import QuotaMeter
+from tools import metrics
+from tools.async_utils import run_sync
 
-load_dotenv(override=True)
+load_config()
 
 class YouTubeSearchInput(BaseModel):
     query: str = Field(description="Main search query/topic")
@@ -21,11 +25,270 @@ class YouTubeSearchInput(BaseModel):
     max_results_per_query: int = Field(default=5, description="Max videos per query")
 
 
+YOUTUBE_API_BASE_URL = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3")
+# Maximum number of Data API requests a single search keeps in flight.
+SEARCH_CONCURRENCY = int(os.getenv("YOUTUBE_SEARCH_CONCURRENCY", "10"))
+# "quota" lists channel uploads (1 unit/page) and filters titles locally instead of
+# calling search.list (100 units); "search" always uses search.list.
+SEARCH_PLANNER = os.getenv("YOUTUBE_SEARCH_PLANNER", "quota")
+# Upload pages (50 videos each) the quota planner scans per channel.
+PLANNER_MAX_PAGES = int(os.getenv("YOUTUBE_PLANNER_MAX_PAGES", "4"))
+# Upper bound on upload pages an incremental sync reads for one channel.
+SYNC_MAX_PAGES = int(os.getenv("YOUTUBE_SYNC_MAX_PAGES", "20"))
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "the", "to", "what", "with", "your", "you",
+}
+
+
+def create_youtube_session(limit: int = 20) -> aiohttp.ClientSession:
+    """Create a pooled aiohttp session with keep-alive and DNS caching for the YouTube Data API."""
+    connector = aiohttp.TCPConnector(limit=limit, ttl_dns_cache=300, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+
+
+class YouTubeDataClient:
+    """
+    Async YouTube Data API client for one search invocation.
+
+    All requests go through a single pooled session, so connections are reused
+    instead of paying a TCP+TLS handshake per call. Identical GET requests are
+    coalesced: concurrent callers share the in-flight request, and a repeated
+    request later in the same invocation reuses its response. Every request
+    that reaches the API is charged to `self.quota`, which is created on entry.
+
+    The channel index and quota totals live in SQLite; those calls run in
+    worker threads so the event loop never waits on a database lock.
+    """
+
+    def __init__(self, api_key: str, session: Optional[aiohttp.ClientSession] = None,
+                 base_url: str = YOUTUBE_API_BASE_URL):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.quota: Optional[QuotaMeter] = None
+        self._session = session
+        self._owns_session = session is None
+        self._requests: Dict[Any, asyncio.Future] = {}
+
+    async def __aenter__(self) -> "YouTubeDataClient":
+        # QuotaMeter reads today's usage so far.
+        self.quota = await asyncio.to_thread(QuotaMeter)
+        if self._session is None:
+            self._session = create_youtube_session()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch_json(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """GET an API endpoint, sharing the request with identical concurrent or earlier calls."""
+        request_key = (endpoint, tuple(sorted(params.items())))
+        request = self._requests.get(request_key)
+        if request is None:
+            request = asyncio.ensure_future(self._get(endpoint, params))
+            self._requests[request_key] = request
+        try:
+            return await asyncio.shield(request)
+        except Exception:
+            # Failed requests are not reused, so a later call can retry them.
+            if self._requests.get(request_key) is request:
+                del self._requests[request_key]
+            raise
+
+    async def _get(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.quota.record(endpoint)
+        metrics.count("youtube_api_requests_total", endpoint=endpoint)
+        async with self._session.get(f"{self.base_url}/{endpoint}", params={**params, 'key': self.api_key}) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def search_videos(self, query_str: str, max_results: int) -> List[Dict[str, Any]]:
+        data = await self.fetch_json("search", {
+            'part': 'id,snippet', 'q': query_str, 'type': 'video',
+            'maxResults': max_results, 'order': 'relevance'
+        })
+        return [_video_from_search_item(item) for item in data.get('items', [])]
+
+    async def get_channel_id(self, channel_name: str) -> Optional[str]:
+        """Resolve a channel name or handle, consulting the persistent channel index first."""
+        known = await asyncio.to_thread(channel_index.lookup_channel, channel_name)
+        if known:
+            return known['channel_id']
+
+        data = await self.fetch_json("search", {
+            'part': 'id', 'q': channel_name, 'type': 'channel', 'maxResults': 1
+        })
+        channel_id = data['items'][0]['id']['channelId'] if data.get('items') else None
+        if channel_id:
+            await asyncio.to_thread(channel_index.save_channel, channel_name, channel_id)
+        return channel_id
+
+    async def get_uploads_playlist(self, channel_id: str) -> Optional[str]:
+        """Return the channel's uploads playlist id, consulting the persistent channel index first."""
+        uploads_playlist = await asyncio.to_thread(channel_index.lookup_uploads_playlist, channel_id)
+        if uploads_playlist:
+            return uploads_playlist
+
+        channel_data = await self.fetch_json("channels", {
+            'part': 'contentDetails', 'id': channel_id
+        })
+        if not channel_data.get('items'):
+            return None
+        uploads_playlist = channel_data['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+        await asyncio.to_thread(channel_index.save_uploads_playlist, channel_id, uploads_playlist)
+        return uploads_playlist
+
+    async def get_channel_videos(self, channel_name: str, max_results: int) -> List[Dict[str, Any]]:
+        channel_id = await self.get_channel_id(channel_name)
+        if not channel_id:
+            return []
+
+        uploads_playlist = await self.get_uploads_playlist(channel_id)
+        if not uploads_playlist:
+            return []
+        playlist_data = await self.fetch_json("playlistItems", {
+            'part': 'snippet', 'playlistId': uploads_playlist, 'maxResults': max_results
+        })
+
+        return [_video_from_playlist_item(item) for item in playlist_data.get('items', [])]
+
+    async def list_uploads(self, channel_id: str, max_pages: int = PLANNER_MAX_PAGES) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        List a channel's newest uploads via playlistItems (1 unit per 50 videos).
+
+        Returns the videos, newest first, and whether the whole playlist was read.
+        """
+        uploads_playlist = await self.get_uploads_playlist(channel_id)
+        if not uploads_playlist:
+            return [], True
+
+        videos = []
+        page_token = None
+        for _ in range(max_pages):
+            params = {'part': 'snippet', 'playlistId': uploads_playlist, 'maxResults': 50}
+            if page_token:
+                params['pageToken'] = page_token
+            data = await self.fetch_json("playlistItems", params)
+            videos.extend(_video_from_playlist_item(item) for item in data.get('items', []))
+            page_token = data.get('nextPageToken')
+            if not page_token:
+                return videos, True
+        return videos, False
+
+    async def list_new_uploads(self, channel_id: str, first_sync_limit: int,
+                               max_pages: int = SYNC_MAX_PAGES) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        List uploads newer than the channel's stored high-water mark, newest first.
+
+        Pages through the uploads playlist only until a known video (or one
+        published before the mark) shows up. A channel with no mark yet returns
+        its newest `first_sync_limit` uploads.
+
+        Also returns the channel's pending mark (see channel_index.commit_sync_marks),
+        which the caller commits once the videos are processed. It is None when
+        there is nothing new, or when `max_pages` ran out before the old mark was
+        reached: moving the mark then would skip the uploads in between.
+        """
+        uploads_playlist = await self.get_uploads_playlist(channel_id)
+        if not uploads_playlist:
+            return [], None
+
+        mark = await asyncio.to_thread(channel_index.get_sync_state, channel_id)
+        new_videos = []
+        page_token = None
+        reached_mark = False
+        for _ in range(max_pages):
+            params = {'part': 'snippet', 'playlistId': uploads_playlist, 'maxResults': 50}
+            if page_token:
+                params['pageToken'] = page_token
+            data = await self.fetch_json("playlistItems", params)
+
+            for item in data.get('items', []):
+                video = _video_from_playlist_item(item)
+                if mark and (video["video_id"] == mark['last_video_id']
+                             or video["published_at"] <= mark['last_published_at']):
+                    reached_mark = True
+                    break
+                new_videos.append(video)
+
+            page_token = data.get('nextPageToken')
+            if reached_mark or not page_token or (not mark and len(new_videos) >= first_sync_limit):
+                break
+
+        if not mark:
+            new_videos = new_videos[:first_sync_limit]
+        if not new_videos or (mark and not reached_mark and page_token):
+            return new_videos, None
+        return new_videos, channel_index.pending_sync_mark(channel_id, new_videos)
+
+    async def search_in_channel(self, topic: str, channel_id: str, max_results: int) -> List[Dict[str, Any]]:
+        data = await self.fetch_json("search", {
+            'part': 'id,snippet', 'q': topic, 'type': 'video',
+            'channelId': channel_id, 'maxResults': max_results,
+            'order': 'relevance'
+        })
+        return [_video_from_search_item(item) for item in data.get('items', [])]
+
+
+def _video_from_search_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "video_id": item["id"]["videoId"],
+        "title": item["snippet"]["title"],
+        "url": f"https://www.youtube.com/watch?v={item['id']['videoId']}",
+        "channel_name": item["snippet"]["channelTitle"],
+        "published_at": item["snippet"]["publishedAt"],
+    }
+
+
+def _video_from_playlist_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    video_id = item["snippet"]["resourceId"]["videoId"]
+    return {
+        "video_id": video_id,
+        "title": item["snippet"]["title"],
+        "url": f"https://www.youtube.com/watch?v={video_id}",
+        "channel_name": item["snippet"]["channelTitle"],
+        "published_at": item["snippet"]["publishedAt"],
+        "description": item["snippet"].get("description", ""),
+    }
+
+
+def _search_terms(text: str) -> List[str]:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return list(dict.fromkeys(w for w in words if w not in _STOPWORDS and len(w) > 1))
+
+
+def filter_videos_by_terms(videos: List[Dict[str, Any]], search_term: str, max_results: int) -> List[Dict[str, Any]]:
+    """
+    Rank listed videos against a search term locally, as a stand-in for search.list.
+
+    Title matches count double description matches; ties keep upload order (newest first).
+    """
+    terms = _search_terms(search_term)
+    if not terms:
+        return videos[:max_results]
+
+    scored = []
+    for position, video in enumerate(videos):
+        title = set(_search_terms(video.get("title", "")))
+        description = set(_search_terms(video.get("description", "")))
+        score = sum(2 if term in title else 1 if term in description else 0 for term in terms)
+        if score:
+            scored.append((-score, position, video))
+    scored.sort(key=lambda entry: entry[:2])
+    return [dict(video) for _, _, video in scored[:max_results]]
+
+
 async def youtube_search_function_async(
     query: str,
     topics: Optional[List[str]] = None,
     channels: Optional[List[str]] = None,
     max_results_per_query: int = 2,
+    session: Optional[aiohttp.ClientSession] = None,
+    planner: str = SEARCH_PLANNER,
+    incremental: bool = False,
 ) -> str:
     """
     Search YouTube for videos by topics, channels, or topics within channels.
@@ -35,6 +298,14 @@ async def youtube_search_function_async(
         topics (list[str], optional): Additional topics to search for.
         channels (list[str], optional): Channels to search in.
         max_results_per_query (int): Maximum videos to retrieve per query (default 2).
+        session (aiohttp.ClientSession, optional): Long-lived session to reuse across
+            searches. A pooled session is created for this call when omitted.
+        planner (str): "quota" to list channel uploads and filter titles locally
+            instead of calling search.list per channel; "search" to always use search.list.
+        incremental (bool): Channel-watch mode. Return only uploads newer than the
+            last sync of each channel instead of searching (requires channels).
+            The result's 'sync_marks' must be committed with
+            channel_index.commit_sync_marks once the videos are stored.
 
     Returns:
         str: JSON string containing video metadata, URLs, and search summary.
@@ -44,136 +315,162 @@ async def youtube_search_function_async(
         if not api_key:
             return json.dumps({"error": "YOUTUBE_API_KEY not set", "videos": []})
 
-        all_videos = []
-        base_url = "https://www.googleapis.com/youtube/v3"
-
-        async def fetch_json(session, url, params):
-            async with session.get(url, params=params) as response:
-                response.raise_for_status()
-                return await response.json()
-
-        async def search_videos(query_str: str, max_results: int) -> List[Dict[str, Any]]:
-            async with aiohttp.ClientSession() as session:
-                data = await fetch_json(session, f"{base_url}/search", {
-                    'part': 'id,snippet', 'q': query_str, 'type': 'video',
-                    'maxResults': max_results, 'order': 'relevance', 'key': api_key
-                })
-            return [
-                {
-                    "video_id": item["id"]["videoId"],
-                    "title": item["snippet"]["title"],
-                    "url": f"https://www.youtube.com/watch?v={item['id']['videoId']}",
-                    "channel_name": item["snippet"]["channelTitle"],
-                    "published_at": item["snippet"]["publishedAt"],
-                }
-                for item in data.get('items', [])
-            ]
-
-        async def get_channel_id(channel_name: str) -> Optional[str]:
-            async with aiohttp.ClientSession() as session:
-                data = await fetch_json(session, f"{base_url}/search", {
-                    'part': 'id', 'q': channel_name, 'type': 'channel', 'maxResults': 1, 'key': api_key
-                })
-            return data['items'][0]['id']['channelId'] if data.get('items') else None
-
-        async def get_channel_videos(channel_name: str, max_results: int) -> List[Dict[str, Any]]:
-            channel_id = await get_channel_id(channel_name)
-            if not channel_id:
-                return []
-
-            async with aiohttp.ClientSession() as session:
-                channel_data = await fetch_json(session, f"{base_url}/channels", {
-                    'part': 'contentDetails', 'id': channel_id, 'key': api_key
-                })
-                uploads_playlist = channel_data['items'][0]['contentDetails']['relatedPlaylists']['uploads']
-                playlist_data = await fetch_json(session, f"{base_url}/playlistItems", {
-                    'part': 'snippet', 'playlistId': uploads_playlist, 'maxResults': max_results, 'key': api_key
-                })
-
-            return [
-                {
-                    "video_id": item["snippet"]["resourceId"]["videoId"],
-                    "title": item["snippet"]["title"],
-                    "url": f"https://www.youtube.com/watch?v={item['snippet']['resourceId']['videoId']}",
-                    "channel_name": item["snippet"]["channelTitle"],
-                    "published_at": item["snippet"]["publishedAt"],
-                }
-                for item in playlist_data.get('items', [])
-            ]
-
-        async def search_in_channel(topic: str, channel_id: str, max_results: int) -> List[Dict[str, Any]]:
-            async with aiohttp.ClientSession() as session:
-                data = await fetch_json(session, f"{base_url}/search", {
-                    'part': 'id,snippet', 'q': topic, 'type': 'video',
-                    'channelId': channel_id, 'maxResults': max_results,
-                    'order': 'relevance', 'key': api_key
-                })
-            return [
-                {
-                    "video_id": item["id"]["videoId"],
-                    "title": item["snippet"]["title"],
-                    "url": f"https://www.youtube.com/watch?v={item['id']['videoId']}",
-                    "channel_name": item["snippet"]["channelTitle"],
-                    "published_at": item["snippet"]["publishedAt"],
-                }
-                for item in data.get('items', [])
-            ]
-
-        # ----- MAIN SEARCH LOGIC -----
-        # Always search the main query first
-        main_videos = await search_videos(query, max_results_per_query)
-        for v in main_videos:
-            v["source_type"] = "main_query"
-            v["source_query"] = query
-        all_videos.extend(main_videos)
-
-        # Then apply additional filters based on what's provided
-        if topics and not channels:
-            # Search additional topics combined with main query
-            for topic in topics:
-                videos = await search_videos(f"{query} {topic}", max_results_per_query)
-                for v in videos:
-                    v["source_type"] = "topic"
-                    v["source_query"] = f"{query} {topic}"
-                all_videos.extend(videos)
-
-        elif channels and not topics:
-            # Search main query in specific channels
-            for channel in channels:
-                channel_id = await get_channel_id(channel)
-                if channel_id:
-                    videos = await search_in_channel(query, channel_id, max_results_per_query)
-                    for v in videos:
-                        v["source_type"] = "channel"
-                        v["source_query"] = f"{query} in {channel}"
-                    all_videos.extend(videos)
-
-        elif topics and channels:
-            # Search topics combined with main query within specific channels
-            for channel in channels:
-                channel_id = await get_channel_id(channel)
-                if not channel_id:
-                    continue
-                for topic in topics:
-                    search_term = f"{query} {topic}"
-                    videos = await search_in_channel(search_term, channel_id, max_results_per_query)
-                    for v in videos:
-                        v["source_type"] = "topic+channel"
-                        v["source_query"] = f"{search_term} in {channel}"
-                    all_videos.extend(videos)
-
-        return json.dumps({
+        async with YouTubeDataClient(api_key, session=session) as client:
+            try:
+                all_videos, source_errors, sync_marks = await _run_search(
+                    client, query, topics, channels, max_results_per_query,
+                    planner=planner, incremental=incremental
+                )
+            finally:
+                await asyncio.to_thread(client.quota.persist)
+
+        result = {
             "main_query": query,
             "topics_searched": topics or [],
             "channels_searched": channels or [],
             "total_results": len(all_videos),
             "video_urls": [v["url"] for v in all_videos],
             "videos": all_videos,
-        }, indent=2)
+            "source_errors": source_errors,
+            "sync_marks": sync_marks,
+            "quota": client.quota.summary(len(all_videos)),
+        }
+        if source_errors and not all_videos:
+            result["error"] = "; ".join(e["error"] for e in source_errors)
+        return json.dumps(result, indent=2)
 
     except Exception as e:
         return json.dumps({"error": str(e), "video_urls": [], "videos": []})
 
+
+async def _run_search(
+    client: YouTubeDataClient,
+    query: str,
+    topics: Optional[List[str]],
+    channels: Optional[List[str]],
+    max_results_per_query: int,
+    concurrency: int = SEARCH_CONCURRENCY,
+    planner: str = SEARCH_PLANNER,
+    incremental: bool = False,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]], List[Dict[str, Any]]]:
+    """
+    Run the main query (when there is one) plus any topic/channel searches concurrently.
+
+    Channel lookups and every topic x channel search run as separate tasks,
+    at most `concurrency` API requests at a time. A failing source is reported
+    in the returned error list instead of aborting the other searches.
+    Videos keep the order of the sources they came from.
+
+    With the "quota" planner, channel-scoped searches list the channel's uploads
+    once and match titles locally, falling back to search.list only when nothing
+    matches and older uploads were left unread.
+
+    With `incremental` and channels given, only uploads newer than each channel's
+    high-water mark are returned (filtered by topic when topics are given), and
+    the main query is not searched. The channels' pending marks are returned
+    for the caller to commit once those videos are stored.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    source_errors: List[Dict[str, str]] = []
+    sync_marks: List[Dict[str, Any]] = []
+
+    async def run_source(source_type: str, source_query: str, make_request) -> List[Dict[str, Any]]:
+        try:
+            async with semaphore:
+                videos = await make_request()
+        except Exception as e:
+            source_errors.append({"source_type": source_type, "source_query": source_query, "error": str(e)})
+            return []
+        for v in videos:
+            v["source_type"] = source_type
+            v["source_query"] = source_query
+        return videos
+
+    async def run_channel(channel: str, search_terms: List[str], source_type: str) -> List[Dict[str, Any]]:
+        try:
+            async with semaphore:
+                channel_id = await client.get_channel_id(channel)
+        except Exception as e:
+            source_errors.append({"source_type": "channel_lookup", "source_query": channel, "error": str(e)})
+            return []
+        if not channel_id:
+            return []
+
+        async def search_term_in_channel(term: str) -> List[Dict[str, Any]]:
+            if not term.strip():
+                # Nothing to search for: take the newest uploads (one playlistItems page).
+                uploads, _ = await client.list_uploads(channel_id, max_pages=1)
+                return uploads[:max_results_per_query]
+            if planner == "quota":
+                uploads, complete = await client.list_uploads(channel_id)
+                matches = filter_videos_by_terms(uploads, term, max_results_per_query)
+                if matches or complete:
+                    return matches
+            return await client.search_in_channel(term, channel_id, max_results_per_query)
+
+        results = await asyncio.gather(*(
+            run_source(source_type, f"{term} in {channel}", lambda term=term: search_term_in_channel(term))
+            for term in search_terms
+        ))
+        return [v for videos in results for v in videos]
+
+    async def sync_channel(channel: str) -> List[Dict[str, Any]]:
+        try:
+            async with semaphore:
+                channel_id = await client.get_channel_id(channel)
+                new_videos, sync_mark = (
+                    await client.list_new_uploads(channel_id, max_results_per_query) if channel_id else ([], None)
+                )
+        except Exception as e:
+            source_errors.append({"source_type": "channel_sync", "source_query": channel, "error": str(e)})
+            return []
+
+        if topics:
+            matched = {}
+            for topic in topics:
+                for v in filter_videos_by_terms(new_videos, topic, len(new_videos)):
+                    matched.setdefault(v["video_id"], v)
+            new_videos = [v for v in new_videos if v["video_id"] in matched]
+        if sync_mark:
+            # Uploads filtered out by topic need no processing before the mark moves past them.
+            sync_mark["videos"] = [v for v in sync_mark["videos"] if v["video_id"] in {n["video_id"] for n in new_videos}]
+            sync_marks.append(sync_mark)
+        for v in new_videos:
+            v["source_type"] = "channel_sync"
+            v["source_query"] = f"new uploads in {channel}"
+        return new_videos
+
+    if incremental and channels:
+        results = await asyncio.gather(*(sync_channel(channel) for channel in channels))
+        return [v for videos in results for v in videos], source_errors, sync_marks
+
+    # Search the main query, unless there is none (e.g. a channel-only request)
+    tasks = []
+    if query.strip():
+        tasks.append(run_source("main_query", query, lambda: client.search_videos(query, max_results_per_query)))
+
+    # Then apply additional filters based on what's provided
+    if topics and not channels:
+        # Search additional topics combined with main query
+        for topic in topics:
+            search_term = f"{query} {topic}"
+            tasks.append(run_source(
+                "topic", search_term,
+                lambda search_term=search_term: client.search_videos(search_term, max_results_per_query)))
+
+    elif channels and not topics:
+        # Search main query in specific channels
+        for channel in channels:
+            tasks.append(run_channel(channel, [query], "channel"))
+
+    elif topics and channels:
+        # Search topics combined with main query within specific channels
+        for channel in channels:
+            tasks.append(run_channel(channel, [f"{query} {topic}" for topic in topics], "topic+channel"))
+
+    results = await asyncio.gather(*tasks)
+    return [v for videos in results for v in videos], source_errors, sync_marks
+
 # sync wrapper for the async function
 def youtube_search_function_sync(
     query: str,
@@ -183,36 +480,35 @@ def youtube_search_function_sync(
 ) -> str:
     """
     Synchronous wrapper for YouTube search that can be used with LangChain agents.
+
+    Safe to call from inside a running event loop; async callers should await
+    youtube_search_function_async directly.
     """
     try:
-        # Run the async function in a new event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            result = loop.run_until_complete(
-                youtube_search_function_async(query, topics, channels, max_results_per_query)
-            )
-            return result
-        finally:
-            loop.close()
+        return run_sync(youtube_search_function_async(query, topics, channels, max_results_per_query))
     except Exception as e:
         return json.dumps({"error": str(e), "video_urls": [], "videos": []})
 
 
 # ----- LANGCHAIN TOOL CREATION -----
+# langchain.tools is imported only here; the search node does not need it.
 def create_youtube_tool_async():
+    from langchain.tools import StructuredTool
     return StructuredTool.from_function(
         name="youtube_search_async",
         description="Search YouTube for videos by main query with optional topics and channels filters",
-        func=youtube_search_function_async,
+        func=youtube_search_function_sync,
+        coroutine=youtube_search_function_async,
         args_schema=YouTubeSearchInput,
     )
 
 def create_youtube_tool_sync():
-    """Create a synchronous YouTube search tool for LangChain agents."""
+    """Create a YouTube search tool for LangChain agents; agents run with ainvoke use the async search."""
+    from langchain.tools import StructuredTool
     return StructuredTool.from_function(
         name="youtube_search",
         description="Search YouTube for videos by main query with optional topics and channels filters",
         func=youtube_search_function_sync,
+        coroutine=youtube_search_function_async,
         args_schema=YouTubeSearchInput
     )
\ No newline at end of file
@@ -1,26 +1,48 @@
 import os
 from typing import Dict, Any, List, Union
-from langchain_openai import AzureChatOpenAI
-from langchain.agents import create_openai_functions_agent, AgentExecutor
-from langchain import hub
 from pydantic import BaseModel, Field
-from langchain.tools import StructuredTool
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api.proxies import WebshareProxyConfig
 import json
 import re
+import time
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from dotenv import load_dotenv
+from tools.config import load_config
+from tools.transcript_cache import get_transcript_cache
+from tools.video_store import get_stored_transcript, save_transcript
+from tools import metrics
 
-load_dotenv(override=True)
+load_config()
+
+# Defaults for concurrent extraction; both can be overridden per call.
+DEFAULT_MAX_WORKERS = int(os.getenv("TRANSCRIPT_MAX_WORKERS", "8"))
+DEFAULT_TIMEOUT = float(os.getenv("TRANSCRIPT_TIMEOUT_SECONDS", "60"))
+# Timeout of each HTTP request to YouTube, so a stalled connection frees its worker thread.
+HTTP_TIMEOUT = float(os.getenv("TRANSCRIPT_HTTP_TIMEOUT_SECONDS", "20"))
+# One requests session per thread (requests.Session is not thread-safe).
+_http_local = threading.local()
 
 class YouTubeTranscriptInput(BaseModel):
     """Input schema for YouTube Transcript Tool."""
     video_urls: Union[List[str], str] = Field(..., description="List of video urls to transcipt, it can also a single url")
     language: str = Field(default="en", description="Preferred transcript language")
 
-def youtube_transcript_function(video_urls: Union[List[str], str], language: str = "en") -> str:
-    """Extract transcripts from YouTube video URLs."""
+def youtube_transcript_function(
+    video_urls: Union[List[str], str],
+    language: str = "en",
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> str:
+    """
+    Extract transcripts from YouTube video URLs.
+
+    Cached transcripts are served from the on-disk transcript cache; the rest
+    are fetched concurrently by a pool of at most `max_workers` threads.
+    A video that takes longer than `timeout` seconds is reported as an error
+    without holding up the rest of the batch. Results keep the input order.
+    """
     try:
         # Handle string input 
         if isinstance(video_urls, str):
@@ -51,34 +73,20 @@ def youtube_transcript_function(video_urls: Union[List[str], str], language: str
         
         results = {}
         errors = []
-        
-        for url in video_urls:
-            try:
-                video_id = extract_video_id(url)
-                if not video_id:
-                    errors.append(f"Invalid URL format: {url}")
-                    continue
-                    
-                transcript_data = get_video_transcript(video_id, language)
-                if transcript_data:
-                    results[video_id] = {
-                        'video_id': video_id,
-                        'url': url,
-                        'transcript': transcript_data['text'],
-                        'language': transcript_data['language'],
-                        'word_count': len(transcript_data['text'].split()),
-                        'is_generated': transcript_data.get('is_generated', False)
-                    }
-                else:
-                    errors.append(f"No transcript available for: {url}")
-                    
-            except Exception as e:
-                errors.append(f"Error processing {url}: {str(e)}")
-        
+        cache_hits = 0
+
+        for outcome in fetch_transcripts_concurrently(video_urls, language, max_workers, timeout):
+            if 'error' in outcome:
+                errors.append(outcome['error'])
+            else:
+                cache_hits += outcome.pop('from_cache', False)
+                results[outcome['video_id']] = outcome
+
         return json.dumps({
             'total_videos_processed': len(video_urls),
             'successful_transcripts': len(results),
             'failed_extractions': len(errors),
+            'cache_hits': cache_hits,
             'transcripts': results,
             'errors': errors,
             'processing_date': datetime.now().isoformat()
@@ -93,6 +101,109 @@ def youtube_transcript_function(video_urls: Union[List[str], str], language: str
             'processing_date': datetime.now().isoformat()
         })
 
+def fetch_transcript_for_url(url: str, language: str) -> Dict[str, Any]:
+    """Fetch the transcript for one URL and return a result or error entry."""
+    try:
+        video_id = extract_video_id(url)
+        if not video_id:
+            return {'error': f"Invalid URL format: {url}"}
+
+        # Transcripts live in one store: the on-disk cache, whose TTL and size limit
+        # decide how long they are kept, or the transcripts table when the cache is disabled.
+        # Only transcripts fetched from the network are written.
+        with metrics.timed_video(video_id, "transcript"):
+            cache = get_transcript_cache()
+            if cache:
+                transcript_data, source = cache.get(video_id, language), "cache"
+            else:
+                transcript_data, source = get_stored_transcript(video_id, language), "database"
+            if transcript_data is None:
+                metrics.count("transcript_fetches_total")
+                transcript_data = get_video_transcript(video_id, language)
+                if not transcript_data:
+                    metrics.count("transcript_fetch_failures_total")
+                    return {'error': f"No transcript available for: {url}"}
+                source = "network"
+                if cache:
+                    cache.put(video_id, transcript_data, requested_language=language)
+                else:
+                    save_transcript(video_id, transcript_data, language)
+        from_cache = source != "network"
+        metrics.record_cache("transcript", from_cache, source)
+
+        return {
+            'video_id': video_id,
+            'url': url,
+            'transcript': transcript_data['text'],
+            'language': transcript_data['language'],
+            'word_count': len(transcript_data['text'].split()),
+            'is_generated': transcript_data.get('is_generated', False),
+            'from_cache': from_cache
+        }
+    except Exception as e:
+        return {'error': f"Error processing {url}: {str(e)}"}
+
+def fetch_transcripts_concurrently(
+    video_urls: List[str],
+    language: str = "en",
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> List[Dict[str, Any]]:
+    """
+    Fetch transcripts for many URLs with a bounded thread pool.
+
+    Returns one entry per input URL, in input order. Each entry is either a
+    transcript result or a dict with an 'error' key. The timeout is measured
+    from the moment a worker starts on a video, so queued videos are not
+    penalised for waiting behind slow ones. Workers stuck past their timeout
+    still hold their thread, so the batch as a whole gets the time it would
+    take if every worker used its full timeout; videos still queued or running
+    then are reported as timed out too.
+    """
+    if not video_urls:
+        return []
+
+    max_workers = max(1, min(max_workers, len(video_urls)))
+    outcomes: List[Dict[str, Any]] = [None] * len(video_urls)
+    started: Dict[int, float] = {}
+
+    def run(index: int, url: str) -> Dict[str, Any]:
+        started[index] = time.monotonic()
+        return fetch_transcript_for_url(url, language)
+
+    rounds = -(-len(video_urls) // max_workers)
+    deadline = time.monotonic() + rounds * timeout
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcript")
+    try:
+        # Worker threads do not inherit context variables; copy them so the run's metrics follow.
+        pending = {
+            executor.submit(contextvars.copy_context().run, run, i, url): i
+            for i, url in enumerate(video_urls)
+        }
+        while pending:
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                outcomes[index] = future.result()
+
+            now = time.monotonic()
+            for future, index in list(pending.items()):
+                start = started.get(index)
+                if start is not None and now - start > timeout:
+                    # The worker thread cannot be interrupted; its result is dropped.
+                    pending.pop(future)
+                    outcomes[index] = {'error': f"Timed out after {timeout:.0f}s: {video_urls[index]}"}
+
+            if pending and now > deadline:
+                for future, index in pending.items():
+                    future.cancel()
+                    outcomes[index] = {'error': f"Batch timed out before finishing: {video_urls[index]}"}
+                pending = {}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return outcomes
+
 def extract_video_id(url: str) -> str:
     """Extract video ID from YouTube URL."""
     if not url or not isinstance(url, str):
@@ -111,15 +222,39 @@ def extract_video_id(url: str) -> str:
             return match.group(1)
     return None
 
+@functools.lru_cache(maxsize=None)
+def _timeout_session_class() -> type:
+    # requests is imported on first fetch, like youtube_transcript_api; videos served from storage never need it.
+    import requests
+
+    class TimeoutSession(requests.Session):
+        """A session whose requests time out after HTTP_TIMEOUT seconds unless told otherwise."""
+
+        def request(self, *args, **kwargs):
+            kwargs.setdefault("timeout", HTTP_TIMEOUT)
+            return super().request(*args, **kwargs)
+
+    return TimeoutSession
+
+
+def _http_client():
+    """Return this thread's requests session, so fetches on a worker thread reuse its connections."""
+    session = getattr(_http_local, "session", None)
+    if session is None:
+        session = _http_local.session = _timeout_session_class()()
+    return session
+
 def get_video_transcript(video_id: str, preferred_language: str = "en") -> Dict[str, Any]:
     """Get transcript for a single video."""
     try:
-
+        # Imported on first fetch; videos served from storage never need it.
+        from youtube_transcript_api import YouTubeTranscriptApi
+        # from youtube_transcript_api.proxies import WebshareProxyConfig
         # proxy_config = WebshareProxyConfig(
         #     proxy_host="195.85.23.92",
         #     proxy_port=80
         # )
-        ytt_api = YouTubeTranscriptApi()
+        ytt_api = YouTubeTranscriptApi(http_client=_http_client())
 
         transcript_list = ytt_api.list(video_id)
         transcript = None
@@ -178,6 +313,7 @@ def clean_transcript_text(text: str) -> str:
 
 def create_youtube_transcript_tool():
     """Create YouTube transcript tool for LangChain agents."""
+    from langchain.tools import StructuredTool
     return StructuredTool.from_function(
         name="youtube_transcript",
         description="Extract transcripts from YouTube video URLs",